@@ -0,0 +1,121 @@
+"""Opt-in read-through cache of `BaseModel` objects by primary key.
+
+A model opts in with `cache_enabled = True` in its `ExtraMeta`; `cache_timeout` and `cache_version` (bump
+it when the model changes shape) are optional. Objects are stored in the `settings.OBJECT_CACHE_ALIAS`
+cache under a key made of the model, its version and the primary key.
+
+Writes through `BaseModel.save`/`delete`, `BaseModelManager.bulk_update` and
+`BaseModelQuerySet.soft_delete`/`restore` invalidate the keys right away and again once the transaction
+commits. Every invalidation is also recorded in the process, so a load that raced with a write never
+writes its (possibly stale) result back, and nothing is cached from inside a transaction, which may see
+uncommitted rows. Misses are loaded from the primary database, never from a lagging read replica.
+"""
+
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models import Model
+from prometheus_client import Counter
+
+object_cache_requests_total = Counter(
+    "object_cache_requests_total",
+    "Number of object cache lookups by result.",
+    ["model", "result"],
+)
+
+# Monotonic time of the last invalidation of every key in this process.
+_invalidated_at: dict[str, float] = {}
+_MAX_INVALIDATION_MARKS = 10000
+
+
+def is_cached(model: type[Model]) -> bool:
+    """Check whether a model opted in to the object cache."""
+    return getattr(getattr(model, "ExtraMeta", None), "cache_enabled", False)
+
+
+def cache_key(model: type[Model], pk: Any) -> str:  # noqa: ANN401
+    """Get the cache key of an object."""
+    version = getattr(model.ExtraMeta, "cache_version", 1)
+    return f"object:{model._meta.label_lower}:v{version}:{pk}"
+
+
+def get_cached(model: type[Model], pk: Any) -> Model:  # noqa: ANN401
+    """Get an object by primary key through the object cache.
+
+    On a miss one caller loads the object while concurrent callers wait up to
+    `settings.OBJECT_CACHE_STAMPEDE_WAIT` seconds for it to show up in the cache (stampede protection).
+
+    Args:
+        model (type[Model]): The model of the object.
+        pk (Any): The primary key of the object.
+
+    Raises:
+        model.DoesNotExist: The object does not exist.
+
+    Returns:
+        Model: The object.
+    """
+    if not is_cached(model):
+        return model.objects.get(pk=pk)
+
+    cache = caches[settings.OBJECT_CACHE_ALIAS]
+    key = cache_key(model, pk)
+    if (obj := cache.get(key)) is not None:
+        object_cache_requests_total.labels(model=model._meta.label, result="hit").inc()
+        return obj
+    if connection.in_atomic_block:
+        object_cache_requests_total.labels(model=model._meta.label, result="bypass").inc()
+        return model.objects.get(pk=pk)
+
+    lock_key = f"{key}:lock"
+    if not cache.add(lock_key, 1, timeout=settings.OBJECT_CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + settings.OBJECT_CACHE_STAMPEDE_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            if (obj := cache.get(key)) is not None:
+                object_cache_requests_total.labels(model=model._meta.label, result="hit").inc()
+                return obj
+
+    object_cache_requests_total.labels(model=model._meta.label, result="miss").inc()
+    started = time.monotonic()
+    try:
+        # From the primary: a lagging read replica could put a stale row in the shared cache.
+        obj = model.objects.db_manager(DEFAULT_DB_ALIAS).get(pk=pk)
+        if _invalidated_at.get(key, float("-inf")) < started:
+            cache.set(key, obj, timeout=getattr(model.ExtraMeta, "cache_timeout", settings.OBJECT_CACHE_TIMEOUT))
+    finally:
+        cache.delete(lock_key)
+    return obj
+
+
+def invalidate(model: type[Model], pks: Iterable[Any]) -> None:
+    """Drop objects from the object cache, now and once the current transaction commits.
+
+    Args:
+        model (type[Model]): The model of the objects.
+        pks (Iterable[Any]): The primary keys of the objects.
+    """
+    if not is_cached(model):
+        return
+    keys = [cache_key(model, pk) for pk in pks]
+    if not keys:
+        return
+    _drop(keys)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _drop(keys))
+
+
+def _drop(keys: list[str]) -> None:
+    now = time.monotonic()
+    if len(_invalidated_at) > _MAX_INVALIDATION_MARKS:
+        # Forget marks older than the stampede lock: no load is expected to last that long.
+        for key, marked in list(_invalidated_at.items()):
+            if marked < now - settings.OBJECT_CACHE_LOCK_TIMEOUT:
+                del _invalidated_at[key]
+    for key in keys:
+        _invalidated_at[key] = now
+    caches[settings.OBJECT_CACHE_ALIAS].delete_many(keys)
@@ -1,12 +1,112 @@
-from collections.abc import Iterable, Sequence
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import islice
 from typing import Any
-from uuid import UUID
+from uuid import UUID, uuid4
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser
-from django.db.models import Manager, QuerySet
+from django.db import connections, router, transaction
+from django.db.models import Manager, Model, QuerySet
+from django.utils import timezone
 
+from common.cache import get_cached, invalidate, is_cached
+from utils.pgcopy import copy_rows, get_copy_fields, prepare_copy_row
 
-class BaseModelManager(Manager):
+
+class BaseModelQuerySet(QuerySet):
+    """Base queryset for all models, with bulk soft delete and restore."""
+
+    def soft_delete(self, user: AbstractBaseUser | UUID | str | None = None, batch_size: int | None = None) -> int:
+        """Soft delete every object of the queryset with chunked UPDATE statements.
+
+        Each chunk is one `UPDATE ... WHERE pk IN (SELECT pk ... LIMIT batch_size)`, so outside a transaction
+        the row locks of a chunk are released before the next one. Model overrides of `delete` and `save`
+        are not called.
+
+        Args:
+            user (AbstractBaseUser | UUID | str | None): The user who is marking the records as deleted.
+            batch_size (int | None): The number of rows per UPDATE. Defaults to `settings.SOFT_DELETE_BATCH_SIZE`.
+
+        Returns:
+            int: The number of deleted objects.
+        """
+        now = timezone.now()
+        values = {"is_deleted": True, "deleted_at": now, "updated_at": now}
+        if (user_id := _get_user_id(user)) is not None:
+            values |= {"deleted_by_user_id": user_id, "updated_by_user_id": user_id}
+        return self.filter(is_deleted=False)._update_in_chunks(values, batch_size)
+
+    def restore(self, user: AbstractBaseUser | UUID | str | None = None, batch_size: int | None = None) -> int:
+        """Restore every soft-deleted object of the queryset with chunked UPDATE statements.
+
+        Use it on `Model.objects.deleted_only()` or `Model.objects.with_deleted()`: the default manager
+        hides soft-deleted objects.
+
+        Args:
+            user (AbstractBaseUser | UUID | str | None): The user who is restoring the records.
+            batch_size (int | None): The number of rows per UPDATE. Defaults to `settings.SOFT_DELETE_BATCH_SIZE`.
+
+        Returns:
+            int: The number of restored objects.
+        """
+        values = {"is_deleted": False, "deleted_at": None, "deleted_by_user_id": None, "updated_at": timezone.now()}
+        if (user_id := _get_user_id(user)) is not None:
+            values["updated_by_user_id"] = user_id
+        return self.filter(is_deleted=True)._update_in_chunks(values, batch_size)
+
+    def delete(self, user: AbstractBaseUser | UUID | str | None = None) -> tuple[int, dict[str, int]]:
+        """Overwritten delete method for soft delete. Use `hard_delete` to remove the rows.
+
+        Returns:
+            tuple[int, dict[str, int]]: The number of deleted objects, in total and by model label.
+        """
+        deleted = self.soft_delete(user)
+        return deleted, {self.model._meta.label: deleted}
+
+    def for_tenant(self, company: Model | UUID | str) -> QuerySet:
+        """Filter the queryset on a tenant in SQL, served by the `(company_id, ...)` indexes of `BaseModel`.
+
+        Args:
+            company (Model | UUID | str): The company, or its id.
+
+        Raises:
+            ValueError: No company is given. Rows of no company belong to no tenant, so they are never shared.
+
+        Returns:
+            QuerySet: The rows of the company.
+        """
+        if company is None:
+            raise ValueError("for_tenant() needs a company")
+        if isinstance(company, Model):
+            company = company.pk
+        elif isinstance(company, str):
+            company = UUID(company)
+        return self.filter(company_id=company)
+
+    def hard_delete(self) -> tuple[int, dict[str, int]]:
+        """Delete the rows of the queryset from the database (Django's `QuerySet.delete`)."""
+        return super().delete()
+
+    def _update_in_chunks(self, values: dict[str, Any], batch_size: int | None) -> int:
+        batch_size = batch_size or settings.SOFT_DELETE_BATCH_SIZE
+        # `self.db` is the read alias, a replica inside `read_from_replicas()`.
+        db = self._db or router.db_for_write(self.model, **self._hints)
+        base = self.model._base_manager.using(db)
+        total = 0
+        while True:
+            chunk = self.using(db).order_by().values("pk")[:batch_size]
+            if is_cached(self.model):
+                chunk = list(chunk.values_list("pk", flat=True))
+            updated = base.filter(pk__in=chunk).update(**values)
+            if isinstance(chunk, list):
+                invalidate(self.model, chunk)
+            total += updated
+            if updated < batch_size:
+                return total
+
+
+class BaseModelManager(Manager.from_queryset(BaseModelQuerySet)):
     """Base model manager for all models."""
 
     def get_queryset(self) -> QuerySet:
@@ -17,6 +117,34 @@ class BaseModelManager(Manager):
         """
         return super().get_queryset().exclude(is_deleted=True)
 
+    def with_deleted(self) -> QuerySet:
+        """Get a queryset of every object, soft-deleted ones included."""
+        return super().get_queryset()
+
+    def deleted_only(self) -> QuerySet:
+        """Get a queryset of the soft-deleted objects."""
+        return super().get_queryset().filter(is_deleted=True)
+
+    def get_cached(self, pk: Any) -> Model:  # noqa: ANN401
+        """Get an object by primary key through the object cache of `common.cache`.
+
+        Models that did not opt in with `ExtraMeta.cache_enabled` are read from the database.
+
+        Args:
+            pk (Any): The primary key of the object.
+
+        Raises:
+            DoesNotExist: The object does not exist.
+
+        Returns:
+            Model: The object.
+        """
+        return get_cached(self.model, pk)
+
+    async def aget_cached(self, pk: Any) -> Model:  # noqa: ANN401
+        """Async version of `get_cached`."""
+        return await sync_to_async(get_cached)(self.model, pk)
+
     def bulk_create(  # noqa: PLR0913
         self,
         objs: Iterable,
@@ -27,19 +155,49 @@ class BaseModelManager(Manager):
         unique_fields: Sequence[str] | None = None,
         user: AbstractBaseUser | UUID | str | None = None,
     ) -> list:
-        """Overwritten bulk_create method for setting created_by and updated_by fields."""
-        if user is not None:
-            if isinstance(user, AbstractBaseUser):
-                for obj in objs:
-                    obj.created_by_user = user
-                    obj.updated_by_user = user
-            else:
-                if isinstance(user, str):
-                    user = UUID(user)
-                for obj in objs:
-                    obj.created_by_user_id = user
-                    obj.updated_by_user_id = user
-        return super().bulk_create(objs, batch_size, ignore_conflicts, update_conflicts, update_fields, unique_fields)
+        """Overwritten bulk_create method for setting created_by and updated_by fields.
+
+        `objs` may be any iterable, a generator included: it is read once, `batch_size` objects at a time
+        (default `settings.BULK_WRITE_CHUNK_SIZE`), and every chunk is stamped and inserted before the next
+        one is read. All chunks are written in one transaction. Use `stream_create` to not keep the created
+        objects in memory.
+        """
+        created = []
+        with transaction.atomic(using=self._write_db(), savepoint=False):
+            for chunk in self._create_chunks(
+                objs,
+                batch_size,
+                user,
+                ignore_conflicts=ignore_conflicts,
+                update_conflicts=update_conflicts,
+                update_fields=update_fields,
+                unique_fields=unique_fields,
+            ):
+                created.extend(chunk)
+        return created
+
+    def stream_create(
+        self,
+        objs: Iterable,
+        chunk_size: int | None = None,
+        user: AbstractBaseUser | UUID | str | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> int:
+        """Insert the objects of an iterable in constant memory: stamp, insert and drop one chunk at a time.
+
+        Every chunk is written in its own transaction, unless the call is already inside one, so an import
+        of millions of rows neither holds them in memory nor keeps a transaction open for its whole run.
+
+        Args:
+            objs (Iterable): The unsaved objects, e.g. a generator reading a file.
+            chunk_size (int | None): The number of objects per INSERT. Defaults to `settings.BULK_WRITE_CHUNK_SIZE`.
+            user (AbstractBaseUser | UUID | str | None): The user creating the objects.
+            **kwargs (Any): The conflict options of `bulk_create`.
+
+        Returns:
+            int: The number of objects passed to INSERT statements.
+        """
+        return sum(len(chunk) for chunk in self._create_chunks(objs, chunk_size, user, **kwargs))
 
     def bulk_update(
         self,
@@ -48,17 +206,147 @@ class BaseModelManager(Manager):
         batch_size: int | None = None,
         user: AbstractBaseUser | UUID | str | None = None,
     ) -> int:
-        """Overwritten bulk_update method for setting updated_by field."""
+        """Overwritten bulk_update method for setting updated_at and updated_by fields and invalidating the object cache.
+
+        `objs` may be any iterable, a generator included: it is read `batch_size` objects at a time (default
+        `settings.BULK_WRITE_CHUNK_SIZE`), and every chunk is stamped and written before the next one is read.
+        All chunks are written in one transaction.
+        """
+        fields = [*fields, "updated_at"]
         if user is not None:
-            if isinstance(user, AbstractBaseUser):
-                for obj in objs:
-                    obj.updated_by_user = user
-            else:
-                if isinstance(user, str):
-                    user = UUID(user)
-                for obj in objs:
-                    obj.updated_by_user_id = user
-        return super().bulk_update(objs, fields, batch_size)
+            fields.append("updated_by_user")
+        updated = 0
+        with transaction.atomic(using=self._write_db(), savepoint=False):
+            for chunk in _chunks(objs, batch_size or settings.BULK_WRITE_CHUNK_SIZE):
+                now = timezone.now()
+                for obj in chunk:
+                    obj.updated_at = now
+                _stamp(chunk, user, "updated_by_user")
+                updated += super().bulk_update(chunk, fields)
+                invalidate(self.model, [obj.pk for obj in chunk])
+        return updated
+
+    def bulk_upsert(
+        self,
+        objs: Iterable,
+        unique_fields: Sequence[str],
+        update_fields: Sequence[str] | None = None,
+        user: AbstractBaseUser | UUID | str | None = None,
+    ) -> int:
+        """Insert objects, or update the existing rows they conflict with, in one statement.
+
+        On PostgreSQL the objects are streamed with `COPY` into a temporary table, which is then merged
+        into the model table with `INSERT ... SELECT ... ON CONFLICT DO UPDATE`. Both statements run in
+        one transaction and `objs` is read lazily, so memory does not grow with the number of objects.
+        If several objects share the unique values, the last one wins. Other databases fall back to
+        `stream_create` with `update_conflicts=True`.
+
+        New rows are stamped with `created_by_user` and `updated_by_user`; updated rows keep their id,
+        `created_at` and `created_by_user` and get a new `updated_at` and `updated_by_user`.
+
+        Args:
+            objs (Iterable): The objects to write.
+            unique_fields (Sequence[str]): The fields of the unique constraint the conflicts are detected on.
+            update_fields (Sequence[str] | None): The fields written on conflict. Defaults to every field but
+                the primary key, the unique fields and the creation fields.
+            user (AbstractBaseUser | UUID | str | None): The user writing the objects.
+
+        Returns:
+            int: The number of inserted or updated rows.
+        """
+        meta = self.model._meta
+        if update_fields is None:
+            skipped = {meta.pk.name, "created_at", "created_by_user", *unique_fields}
+            update_fields = [field.name for field in meta.concrete_fields if field.name not in skipped]
+        update_fields = list(dict.fromkeys([*update_fields, "updated_at", "updated_by_user"]))
+
+        db = self._write_db()
+        connection = connections[db]
+        if connection.vendor != "postgresql":
+            return self.stream_create(
+                objs,
+                user=user,
+                update_conflicts=True,
+                unique_fields=unique_fields,
+                update_fields=update_fields,
+            )
+
+        quote_name = connection.ops.quote_name
+        fields = get_copy_fields(self.model)
+        columns = ", ".join(quote_name(field.column) for field in fields)
+        conflict = ", ".join(quote_name(meta.get_field(name).column) for name in unique_fields)
+        assignments = ", ".join(
+            f"{quote_name(column)} = EXCLUDED.{quote_name(column)}"
+            for column in (meta.get_field(name).column for name in update_fields)
+        )
+        table = quote_name(meta.db_table)
+        staging = f"upsert_{uuid4().hex}"
+
+        def rows() -> Iterator[tuple]:
+            for chunk in _chunks(objs, settings.BULK_WRITE_CHUNK_SIZE):
+                _stamp(chunk, user, "created_by_user", "updated_by_user")
+                for obj in chunk:
+                    yield prepare_copy_row(obj, fields, db)
+
+        with transaction.atomic(using=db, savepoint=False), connection.cursor() as cursor:
+            cursor.execute(f"CREATE TEMPORARY TABLE {quote_name(staging)} (LIKE {table}) ON COMMIT DROP")
+            copy_rows(staging, [field.column for field in fields], rows(), db)
+            # DISTINCT ON keeps the last copied row of every key: ON CONFLICT may not touch a row twice.
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) "  # noqa: S608
+                f"SELECT DISTINCT ON ({conflict}) {columns} FROM {quote_name(staging)} "
+                f"ORDER BY {conflict}, ctid DESC "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {assignments}"
+                + (f" RETURNING {quote_name(meta.pk.column)}" if is_cached(self.model) else ""),
+            )
+            upserted = cursor.rowcount
+            if is_cached(self.model):
+                invalidate(self.model, [row[0] for row in cursor.fetchall()])
+            cursor.execute(f"DROP TABLE {quote_name(staging)}")
+        return upserted
+
+    def _write_db(self) -> str:
+        """Get the alias the writes of the manager go to. `self.db` is the read one, a replica in a replica scope."""
+        return self._db or router.db_for_write(self.model, **self._hints)
+
+    def _create_chunks(
+        self,
+        objs: Iterable,
+        chunk_size: int | None,
+        user: AbstractBaseUser | UUID | str | None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> Iterator[list]:
+        for chunk in _chunks(objs, chunk_size or settings.BULK_WRITE_CHUNK_SIZE):
+            _stamp(chunk, user, "created_by_user", "updated_by_user")
+            yield super().bulk_create(chunk, **kwargs)
+
+    def scoped_update(
+        self,
+        pk: Any,  # noqa: ANN401
+        values: dict[str, Any],
+        user: AbstractBaseUser | UUID | str | None = None,
+        scope: dict[str, Any] | None = None,
+    ) -> int:
+        """Update some fields of one object in one UPDATE statement, without loading it first.
+
+        Only the given fields plus `updated_at` and `updated_by_user` are written. Model overrides of `save`
+        are not called.
+
+        Args:
+            pk (Any): The primary key of the object.
+            values (dict[str, Any]): The new values by field name.
+            user (AbstractBaseUser | UUID | str | None): The user responsible for the update.
+            scope (dict[str, Any] | None): Extra filters the object must match, e.g. `{"company_id": ...}`.
+
+        Returns:
+            int: The number of updated objects: 0 if the object does not exist or is out of the scope.
+        """
+        values = {**values, "updated_at": timezone.now()}
+        if (user_id := _get_user_id(user)) is not None:
+            values["updated_by_user_id"] = user_id
+        updated = self.filter(pk=pk, **(scope or {})).update(**values)
+        invalidate(self.model, [pk])
+        return updated
 
     def create(
         self,
@@ -94,3 +382,31 @@ class BaseModelManager(Manager):
                 defaults.setdefault("created_by_user_id", user)
                 defaults.setdefault("updated_by_user_id", user)
         return super().get_or_create(defaults, **kwargs)
+
+
+def _get_user_id(user: AbstractBaseUser | UUID | str | None) -> UUID | None:
+    if isinstance(user, AbstractBaseUser):
+        return user.pk
+    if isinstance(user, str):
+        return UUID(user)
+    return user
+
+
+def _chunks(objs: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(objs)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _stamp(objs: list, user: AbstractBaseUser | UUID | str | None, *fields: str) -> None:
+    if user is None:
+        return
+    if isinstance(user, AbstractBaseUser):
+        for obj in objs:
+            for field in fields:
+                setattr(obj, field, user)
+    else:
+        user_id = _get_user_id(user)
+        for obj in objs:
+            for field in fields:
+                setattr(obj, f"{field}_id", user_id)
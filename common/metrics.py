@@ -0,0 +1,93 @@
+"""Prometheus metrics of HTTP requests and the `/metrics` endpoint.
+
+With several uvicorn workers, set `PROMETHEUS_MULTIPROC_DIR` to an empty directory shared by the processes
+of a host before they start: every process then writes its samples there and `/metrics` aggregates them,
+whichever worker serves the scrape. Celery workers expose their own metrics on
+`settings.WORKER_METRICS_PORT` (see `config.celery`), the same way with their own directory.
+"""
+
+import hmac
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+from prometheus_client.exposition import generate_latest
+
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time spent processing a request, by method and resolved route pattern.",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "Number of requests being processed, by method.",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+http_responses_total = Counter(
+    "http_responses_total",
+    "Number of responses, by method, resolved route pattern and status code.",
+    ["method", "route", "status"],
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries",
+    "Number of database queries of a sampled request, by method and resolved route pattern.",
+    ["method", "route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+http_request_db_duration_seconds = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries by a sampled request, by method and resolved route pattern.",
+    ["method", "route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+http_request_db_over_budget_total = Counter(
+    "http_request_db_over_budget_total",
+    "Number of sampled requests over the query count or query time budget.",
+    ["method", "route", "budget"],
+)
+
+# Route label of the requests no URL pattern matched, so unknown paths do not add label values.
+UNMATCHED_ROUTE = "<unmatched>"
+# Method label of the requests with a method outside of these, which clients can set to anything.
+_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+def request_method(request: HttpRequest) -> str:
+    """Get the method label of a request, `OTHER` for non-standard methods."""
+    return request.method if request.method in _METHODS else "OTHER"
+
+
+def request_route(request: HttpRequest) -> str:
+    """Get the route label of a request: its resolved URL pattern, e.g. `api/core/<uuid:pk>`."""
+    match = getattr(request, "resolver_match", None)
+    return match.route if match is not None else UNMATCHED_ROUTE
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Expose the metrics of every process (multiprocess mode) or of this process in the Prometheus format.
+
+    The scraper must send `settings.METRICS_TOKEN` as a bearer token. Without a token the endpoint does not
+    exist, except with `DEBUG`.
+    """
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            raise Http404
+    elif not hmac.compare_digest(
+        request.headers.get("Authorization", ""),
+        f"Bearer {settings.METRICS_TOKEN}",
+    ):
+        return HttpResponse(status=401)
+
+    return HttpResponse(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def metrics_registry() -> CollectorRegistry:
+    """Get the registry to expose: the samples of every process in multiprocess mode, else of this process."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
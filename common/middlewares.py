@@ -1,41 +1,231 @@
 import logging
+import random
+import threading
 import time
+from collections.abc import Awaitable, Callable
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.http import HttpRequest, HttpResponse
-from django.utils.deprecation import MiddlewareMixin
 
-logger = logging.getLogger("uvicorn")
+from common.metrics import (
+    http_request_db_duration_seconds,
+    http_request_db_over_budget_total,
+    http_request_db_queries,
+    http_request_duration_seconds,
+    http_requests_in_flight,
+    http_responses_total,
+    request_method,
+    request_route,
+)
+from common.profiling import PROFILE_HEADER, SamplingProfiler, profile_name, profile_requested, save_profile
+from common.queries import QueryStats, collect_queries, normalize
+from common.routers import read_from_replicas
 
+logger = logging.getLogger(__name__)
 
-class APITimingMiddleware(MiddlewareMixin):
-    """Middleware that calculates and logs the time taken to process each HTTP request."""
 
-    def process_request(self, request: HttpRequest):
-        """Records the start time of a request processing.
+class PrometheusMiddleware:
+    """Middleware that records the latency, in-flight count and status of every request as Prometheus metrics.
 
-        Args:
-            request (HttpRequest): The incoming HTTP request.
-        """
-        request.start_time = time.time()
+    Requests are labelled by their resolved route pattern, not their path, to keep the number of label values
+    bounded. See `common.metrics`.
+    """
 
-    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
-        """Logs the time taken to process the request upon sending the response.
+    sync_capable = True
+    async_capable = True
 
-        Args:
-            request (HttpRequest): The request being processed.
-            response (HttpResponse): The response being sent back.
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse | Awaitable[HttpResponse]]) -> None:  # noqa: D107
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
-        Returns:
-            HttpResponse: The response object to be sent back.
-        """
-        if hasattr(request, "start_time"):
-            elapsed_time = time.time() - request.start_time
-            logger.info(
-                "Request to API",
-                extra={
-                    "path": request.path,
-                    "response_time": f"{elapsed_time:.2f}",
-                    "ip": request.META.get("REMOTE_ADDR", "Unknown"),
-                },
+    def __call__(self, request: HttpRequest) -> HttpResponse | Awaitable[HttpResponse]:  # noqa: D102
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        in_flight = http_requests_in_flight.labels(method=request_method(request))
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            in_flight.dec()
+        self._observe(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:  # noqa: D105
+        in_flight = http_requests_in_flight.labels(method=request_method(request))
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            in_flight.dec()
+        self._observe(request, response, time.perf_counter() - start)
+        return response
+
+    def _observe(self, request: HttpRequest, response: HttpResponse, elapsed: float) -> None:
+        method = request_method(request)
+        route = request_route(request)
+        http_request_duration_seconds.labels(method=method, route=route).observe(elapsed)
+        http_responses_total.labels(method=method, route=route, status=response.status_code).inc()
+
+
+class QueryInstrumentationMiddleware:
+    """Middleware that counts and times the database queries of a sampled fraction of requests.
+
+    The query count and query time of a sampled request are recorded as Prometheus metrics by route and sent
+    in its `Server-Timing` header with the fingerprint of its slowest statement, and a request over
+    `settings.DB_QUERY_BUDGET` queries or `settings.DB_QUERY_TIME_BUDGET` seconds is logged with its slowest
+    statement. Fingerprints are not metric labels: every distinct statement would add a time series.
+    See `common.queries`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse | Awaitable[HttpResponse]]) -> None:  # noqa: D107
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse | Awaitable[HttpResponse]:  # noqa: D102
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not _sampled(settings.DB_INSTRUMENTATION_SAMPLE_RATE):
+            return self.get_response(request)
+        with collect_queries() as stats:
+            response = self.get_response(request)
+        self._report(request, response, stats)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:  # noqa: D105
+        if not _sampled(settings.DB_INSTRUMENTATION_SAMPLE_RATE):
+            return await self.get_response(request)
+        with collect_queries() as stats:
+            response = await self.get_response(request)
+        self._report(request, response, stats)
+        return response
+
+    def _report(self, request: HttpRequest, response: HttpResponse, stats: QueryStats) -> None:
+        method = request_method(request)
+        route = request_route(request)
+        http_request_db_queries.labels(method=method, route=route).observe(stats.count)
+        http_request_db_duration_seconds.labels(method=method, route=route).observe(stats.duration)
+        timings = [f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"']
+        if stats.count:
+            timings.append(f'db-slowest;dur={stats.slowest_duration * 1000:.1f};desc="{stats.slowest_fingerprint}"')
+        if settings.DB_INSTRUMENTATION_SERVER_TIMING:
+            if existing := response.get("Server-Timing"):
+                timings.insert(0, existing)
+            response["Server-Timing"] = ", ".join(timings)
+
+        over_budget = [
+            budget
+            for budget, exceeded in (
+                ("count", stats.count > settings.DB_QUERY_BUDGET),
+                ("time", stats.duration > settings.DB_QUERY_TIME_BUDGET),
             )
+            if exceeded
+        ]
+        for budget in over_budget:
+            http_request_db_over_budget_total.labels(method=method, route=route, budget=budget).inc()
+        if over_budget:
+            logger.warning(
+                "%s %s ran %d queries in %.3fs, over its budget; slowest %.3fs [%s]: %s",
+                request.method,
+                route,
+                stats.count,
+                stats.duration,
+                stats.slowest_duration,
+                stats.slowest_fingerprint,
+                normalize(stats.slowest_sql),
+                extra={"path": request.path, "status": response.status_code},
+            )
+
+
+class ProfilingMiddleware:
+    """Middleware that profiles a sampled fraction of requests, and the requests with a signed `X-Profile` header.
+
+    The profiles of the requests slower than `settings.PROFILER_THRESHOLD` seconds, and of every request with
+    the header, are kept in the `profiles` storage; the response of a request with the header names its profile
+    in its own `X-Profile` header. Under ASGI the event loop thread and the thread running the sync code of the
+    request are sampled, so the coroutines of concurrent requests show up in the profile too. See
+    `common.profiling`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse | Awaitable[HttpResponse]]) -> None:  # noqa: D107
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse | Awaitable[HttpResponse]:  # noqa: D102
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        requested = profile_requested(request)
+        if not requested and not _sampled(settings.PROFILER_SAMPLE_RATE):
+            return self.get_response(request)
+        start = time.perf_counter()
+        with SamplingProfiler({threading.get_ident()}, settings.PROFILER_INTERVAL) as profiler:
+            response = self.get_response(request)
+        self._keep(request, response, profiler, time.perf_counter() - start, requested)
         return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:  # noqa: D105
+        requested = profile_requested(request)
+        if not requested and not _sampled(settings.PROFILER_SAMPLE_RATE):
+            return await self.get_response(request)
+        start = time.perf_counter()
+        # Django runs the sync views and ORM calls of a request in one thread (its `ThreadSensitiveContext`).
+        thread_ids = {threading.get_ident(), await sync_to_async(threading.get_ident)()}
+        with SamplingProfiler(thread_ids, settings.PROFILER_INTERVAL) as profiler:
+            response = await self.get_response(request)
+        self._keep(request, response, profiler, time.perf_counter() - start, requested)
+        return response
+
+    def _keep(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        profiler: SamplingProfiler,
+        elapsed: float,
+        requested: bool,
+    ) -> None:
+        if not requested and elapsed < settings.PROFILER_THRESHOLD:
+            return
+        name = profile_name(request_method(request), request_route(request), elapsed)
+        save_profile(name, profiler.collapsed())
+        if requested:
+            response[PROFILE_HEADER] = name
+
+
+def _sampled(rate: float) -> bool:
+    return rate >= 1 or (rate > 0 and random.random() < rate)  # noqa: S311
+
+
+class ReplicaPinningMiddleware:
+    """Middleware that lets the reads of a request go to the read replicas until its first write.
+
+    See `common.routers.ReplicaRouter`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse | Awaitable[HttpResponse]]) -> None:  # noqa: D107
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse | Awaitable[HttpResponse]:  # noqa: D102
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with read_from_replicas():
+            return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:  # noqa: D105
+        with read_from_replicas():
+            return await self.get_response(request)
@@ -1,12 +1,18 @@
+import copy
 from typing import Any, ClassVar
-from uuid import UUID, uuid4
+from uuid import UUID
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser
 from django.db import models
+from django.db.backends.utils import names_digest
+from django.db.models.signals import class_prepared
 from django.utils import timezone
 
+from common.cache import invalidate
 from common.managers import BaseModelManager
+from utils.identifiers import uuid7
 
 
 class BaseModel(models.Model):
@@ -17,7 +23,7 @@ class BaseModel(models.Model):
     and soft deletion status. The model is tied to a company.
 
     Attributes:
-        id (UUIDField): The unique identifier for the record.
+        id (UUIDField): The unique identifier for the record, a time-ordered UUIDv7.
         created_at (DateTimeField): The timestamp when the record was created.
         created_by_user (ForeignKey): The user who created the record.
         updated_at (DateTimeField): The timestamp when the record was last updated.
@@ -29,15 +35,22 @@ class BaseModel(models.Model):
     Methods:
         save(self, user: AbstractBaseUser, *args: list[Any], **kwargs: dict[Any, Any]):
             Saves the model instance, updating the modified timestamp and associating the user who updated it.
+            Only writes the fields changed since the instance was loaded. Drops the instance from the object cache.
+
+        get_dirty_fields(self) -> list[str]:
+            Returns the names of the fields changed since the instance was loaded or saved.
 
         create(self, user: AbstractBaseUser, *args: list[Any], **kwargs: dict[Any, Any]):
             Creates and saves a new model instance, associating the user who created it.
 
         delete(self, user: AbstractBaseUser) -> None:
             Marks the model instance as deleted, associating the user who marked it as deleted.
+
+        adelete(self, user: AbstractBaseUser) -> None:
+            Async version of `delete`.
     """
 
-    id = models.UUIDField(primary_key=True, unique=True, default=uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, unique=True, default=uuid7, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     created_by_user = models.ForeignKey(
@@ -65,6 +78,15 @@ class BaseModel(models.Model):
         related_name="%(class)s_deleted_by_user",
     )
 
+    company = models.ForeignKey(
+        settings.TENANT_MODEL,
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        # Served by the (company_id, ...) indexes of `add_soft_delete_indexes`.
+        db_index=False,
+    )
+
     objects = BaseModelManager()
 
     class Meta:
@@ -72,6 +94,15 @@ class BaseModel(models.Model):
 
     class ExtraMeta:
         date_filter_fields: ClassVar[list[str]] = []
+        # Fields (or tuples of fields) the model is looked up by. They get a `WHERE NOT is_deleted` partial
+        # index led by `company`, like `date_filter_fields`. The default one serves the tenant-scoped routes
+        # of generated CRUD controllers.
+        lookup_fields: ClassVar[list[str | tuple[str, ...]]] = ["id"]
+        # Opt in to the read-through object cache of `common.cache`.
+        cache_enabled = False
+        cache_version = 1
+        # Save only the fields changed since the object was loaded, and skip saves that change nothing.
+        track_changes = True
 
     DEFAULT_EXCLUDE_FIELDS: ClassVar = [
         "created_at",
@@ -83,8 +114,8 @@ class BaseModel(models.Model):
         "deleted_by_user",
     ]
     DEFAULT_GET_EXCLUDE_FIELDS = DEFAULT_EXCLUDE_FIELDS
-    DEFAULT_UPDATE_EXCLUDE_FIELDS: ClassVar = [*DEFAULT_EXCLUDE_FIELDS, "id"]
-    DEFAULT_CREATE_EXCLUDE_FIELDS: ClassVar = [*DEFAULT_EXCLUDE_FIELDS, "id"]
+    DEFAULT_UPDATE_EXCLUDE_FIELDS: ClassVar = [*DEFAULT_EXCLUDE_FIELDS, "id", "company"]
+    DEFAULT_CREATE_EXCLUDE_FIELDS: ClassVar = [*DEFAULT_EXCLUDE_FIELDS, "id", "company"]
 
     def save(self, user: AbstractBaseUser | UUID | str | None = None, *args: list[Any], **kwargs: dict[Any, Any]):
         """Save and update the object with user information.
@@ -100,7 +131,17 @@ class BaseModel(models.Model):
         Returns:
             None
 
+        Note:
+            When the object was loaded from the database and `update_fields` is not given, only the changed
+            fields and the audit columns are written; nothing is written (and no signal is sent) if no field
+            changed. Set `ExtraMeta.track_changes = False` on a model to always write every column.
         """
+        if self._track_changes() and not self._state.adding and "update_fields" not in kwargs:
+            dirty_fields = self.get_dirty_fields()
+            if not dirty_fields:
+                return
+            kwargs["update_fields"] = [*dirty_fields, "updated_at", "updated_by_user"]
+
         if user is not None:
             if isinstance(user, AbstractBaseUser):
                 if self._state.adding:
@@ -113,6 +154,65 @@ class BaseModel(models.Model):
                     self.created_by_user_id = UUID(user)
                 self.updated_by_user_id = UUID(user)
         super().save(*args, **kwargs)  # type: ignore
+        invalidate(type(self), [self.pk])
+        self._snapshot(kwargs.get("update_fields"))
+
+    @classmethod
+    def from_db(cls, db: str, field_names: list[str], values: list[Any]) -> "BaseModel":
+        """Overwritten from_db method for taking the snapshot the changed fields are computed from."""
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def refresh_from_db(self, *args: Any, **kwargs: Any) -> None:  # noqa: ANN401
+        """Overwritten refresh_from_db method for taking a new snapshot of the reloaded fields."""
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot(kwargs.get("fields"))
+
+    def get_dirty_fields(self) -> list[str]:
+        """Get the names of the fields changed since the object was loaded or saved.
+
+        Returns:
+            list[str]: The changed field names, excluding the audit columns `updated_at` and `updated_by_user`.
+        """
+        loaded = getattr(self, "_loaded_values", {})
+        dirty_fields = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.name in {"updated_at", "updated_by_user"}:
+                continue
+            if field.attname in loaded:
+                if self.__dict__.get(field.attname) != loaded[field.attname]:
+                    dirty_fields.append(field.name)
+            elif field.attname in self.__dict__:
+                # Deferred when loaded and assigned since.
+                dirty_fields.append(field.name)
+        return dirty_fields
+
+    def _track_changes(self) -> bool:
+        return getattr(self.ExtraMeta, "track_changes", True) and hasattr(self, "_loaded_values")
+
+    def _snapshot(self, fields: list[str] | None = None) -> None:
+        """Record the current value of the loaded fields (all of them, or only `fields`)."""
+        if not hasattr(self, "_loaded_values") or fields is None:
+            self._loaded_values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (fields is None or field.name in fields or field.attname in fields):
+                value = self.__dict__[field.attname]
+                # Only containers (e.g. JSON fields) can be changed in place.
+                self._loaded_values[field.attname] = copy.deepcopy(value) if isinstance(value, dict | list) else value
+
+    async def asave(self, user: AbstractBaseUser | UUID | str | None = None, *args: Any, **kwargs: Any) -> None:  # noqa: ANN401
+        """Async version of `save`.
+
+        Args:
+            user (AbstractBaseUser | UUID | str | None): The user who is saving the record.
+            *args (Any): Positional arguments of `save`.
+            **kwargs (Any): Keyword arguments of `save`.
+
+        Returns:
+            None
+        """
+        await sync_to_async(self.save)(user, *args, **kwargs)
 
     def delete(self, user: AbstractBaseUser | UUID | str | None = None) -> None:
         """Marks this object as deleted and assigns the user responsible for the deletion. (soft delete).
@@ -140,3 +240,61 @@ class BaseModel(models.Model):
         self.is_deleted = True
         self.deleted_at = timezone.now()
         self.save(user)
+
+    async def adelete(self, user: AbstractBaseUser | UUID | str | None = None) -> None:
+        """Async version of `delete`. (soft delete).
+
+        Args:
+            user (AbstractBaseUser | UUID | str | None): The user who is marking the record as deleted.
+
+        Returns:
+            None
+        """
+        await sync_to_async(self.delete)(user)
+
+
+def add_soft_delete_indexes(sender: type[models.Model], **kwargs: Any) -> None:  # noqa: ANN401, ARG001
+    """Give every concrete `BaseModel` partial indexes that skip soft-deleted rows.
+
+    The default manager always filters on `is_deleted = false`, so indexes restricted to live rows stay as
+    small and fast as on a table without soft-deleted rows. An index is added for every
+    `ExtraMeta.lookup_fields` and `ExtraMeta.date_filter_fields` entry, led by `company` when the model has
+    one since queries are scoped to a tenant (`for_tenant`), and for every unique field, unique constraint and
+    `unique_together` entry. The uniqueness itself stays enforced across all rows. The indexes go through the
+    migration autodetector like `Meta.indexes` entries.
+    """
+    if not issubclass(sender, BaseModel) or sender._meta.abstract or sender._meta.proxy:
+        return
+
+    extra_meta = getattr(sender, "ExtraMeta", None)
+    tenant = ("company",) if any(field.name == "company" for field in sender._meta.concrete_fields) else ()
+    field_sets = [
+        tuple(dict.fromkeys((*tenant, *((fields,) if isinstance(fields, str) else fields))))
+        for fields in [*getattr(extra_meta, "lookup_fields", []), *getattr(extra_meta, "date_filter_fields", [])]
+    ]
+    # The primary key alone is already indexed.
+    field_sets = [fields for fields in field_sets if fields != (sender._meta.pk.name,)]
+    field_sets += [(field.name,) for field in sender._meta.concrete_fields if field.unique and not field.primary_key]
+    field_sets += [
+        tuple(constraint.fields)
+        for constraint in sender._meta.constraints
+        if isinstance(constraint, models.UniqueConstraint) and constraint.fields and constraint.condition is None
+    ]
+    field_sets += [tuple(fields) for fields in sender._meta.unique_together]
+
+    indexes = list(sender._meta.indexes)
+    names = {index.name for index in indexes}
+    for fields in dict.fromkeys(field_sets):
+        columns = [sender._meta.get_field(name).column for name in fields]
+        name = (
+            f"{sender._meta.db_table[:11]}_{columns[0][:7]}_"
+            f"{names_digest(sender._meta.db_table, *columns, 'is_deleted', length=6)}_nd"
+        )
+        if name not in names:
+            indexes.append(models.Index(fields=list(fields), condition=models.Q(is_deleted=False), name=name))
+            names.add(name)
+    sender._meta.indexes = indexes
+    sender._meta.original_attrs["indexes"] = indexes
+
+
+class_prepared.connect(add_soft_delete_indexes)
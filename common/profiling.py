@@ -0,0 +1,133 @@
+"""Sampling profiler of slow requests.
+
+`ProfilingMiddleware` profiles a `settings.PROFILER_SAMPLE_RATE` fraction of requests, and every request with
+a valid signed `X-Profile` header (see the `sign_profile_header` command). While a request is profiled, a
+background thread samples its stack every `settings.PROFILER_INTERVAL` seconds; other requests only pay for
+the sampling decision. The profile of a request slower than `settings.PROFILER_THRESHOLD` seconds, or of a
+request with the header, is written to the `profiles` storage in the collapsed stack format (one
+`root;...;leaf count` line per distinct stack), which flamegraph.pl and speedscope open as is.
+
+The storage keeps at most `settings.PROFILER_MAX_PROFILES` profiles, none older than
+`settings.PROFILER_RETENTION_DAYS` days.
+"""
+
+import logging
+import re
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from types import FrameType, TracebackType
+from typing import Self
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.http import HttpRequest
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+_SIGNING_SALT = "common.profiling"
+_TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S%fZ"
+_UNSAFE = re.compile(r"[^A-Za-z0-9]+")
+
+# Profiles are written one at a time, off the request.
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+
+
+class SamplingProfiler:
+    """Sample the stacks of threads from a background thread while in the `with` block.
+
+    Args:
+        thread_ids (set[int]): The threads to sample.
+        interval (float): Seconds between two samples.
+    """
+
+    def __init__(self, thread_ids: set[int], interval: float) -> None:  # noqa: D107
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def __enter__(self) -> Self:  # noqa: D105
+        self._sampler.start()
+        return self
+
+    def __exit__(  # noqa: D105
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._stopped.set()
+        self._sampler.join()
+
+    def collapsed(self) -> str:
+        """Get the samples in the collapsed stack format, the most frequent stacks first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in self.thread_ids:
+                    self.samples[";".join(_stack(frame))] += 1
+
+
+def _stack(frame: FrameType | None) -> list[str]:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{frame.f_globals.get('__name__', code.co_filename)}.{code.co_qualname}")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def sign_profile_header() -> str:
+    """Make a value of the `X-Profile` header, valid for `settings.PROFILER_HEADER_MAX_AGE` seconds."""
+    return signing.TimestampSigner(salt=_SIGNING_SALT).sign("profile")
+
+
+def profile_requested(request: HttpRequest) -> bool:
+    """Check whether a request carries a valid signed `X-Profile` header."""
+    value = request.META.get("HTTP_X_PROFILE")
+    if not value:
+        return False
+    try:
+        signing.TimestampSigner(salt=_SIGNING_SALT).unsign(value, max_age=settings.PROFILER_HEADER_MAX_AGE)
+    except signing.BadSignature:
+        logger.info("Ignored an invalid or expired %s header", PROFILE_HEADER)
+        return False
+    return True
+
+
+def profile_name(method: str, route: str, elapsed: float) -> str:
+    """Get the storage name of a new profile, which sorts by creation time."""
+    timestamp = datetime.now(tz=UTC).strftime(_TIMESTAMP_FORMAT)
+    return f"{timestamp}_{method}_{_UNSAFE.sub('-', route).strip('-') or 'root'}_{elapsed * 1000:.0f}ms.txt"
+
+
+def save_profile(name: str, profile: str) -> None:
+    """Write a profile to the `profiles` storage in the background, then apply the retention limits."""
+    _writer.submit(_save, name, profile)
+
+
+def _save(name: str, profile: str) -> None:
+    try:
+        storage = storages["profiles"]
+        storage.save(name, ContentFile(profile.encode()))
+        _, names = storage.listdir("")
+        profiles = sorted(stored for stored in names if stored.endswith(".txt"))
+        oldest = (datetime.now(tz=UTC) - timedelta(days=settings.PROFILER_RETENTION_DAYS)).strftime(
+            _TIMESTAMP_FORMAT,
+        )
+        expired = max(len(profiles) - settings.PROFILER_MAX_PROFILES, 0)
+        for index, stored in enumerate(profiles):
+            if index < expired or stored < oldest:
+                storage.delete(stored)
+    except Exception:
+        logger.exception("Could not save the profile %s", name)
@@ -0,0 +1,110 @@
+"""Sampled instrumentation of the database queries of requests.
+
+`QueryInstrumentationMiddleware` opens a `QueryStats` for a sampled fraction of requests
+(`settings.DB_INSTRUMENTATION_SAMPLE_RATE`). Every connection gets `record_queries` as its first execute
+wrapper when it connects, and the wrapper adds the queries run in the context of an open `QueryStats` (the
+context follows the request into `sync_to_async` threads) and calls `execute` right away otherwise, so
+requests that are not sampled only pay for a context variable lookup per query.
+
+Only the queries run until the view returns its response are counted, not the ones of a streaming response.
+"""
+
+import hashlib
+import re
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.signals import connection_created
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_VALUES = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+_SPACES = re.compile(r"\s+")
+
+
+@dataclass
+class QueryStats:
+    """The queries of one request."""
+
+    count: int = 0
+    duration: float = 0.0
+    slowest_duration: float = 0.0
+    slowest_sql: str = ""
+
+    @property
+    def slowest_fingerprint(self) -> str:
+        """Get the fingerprint of the slowest statement, empty when no query ran."""
+        return fingerprint(self.slowest_sql) if self.slowest_sql else ""
+
+
+_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def normalize(sql: str) -> str:
+    """Strip the values out of a statement, so the runs of a query with different parameters look the same.
+
+    Literals become `?` and lists of values, e.g. of `IN` or multi-row `VALUES`, become `(...)`.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDERS.sub("(...)", sql)
+    sql = _VALUES.sub(r"\1", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def fingerprint(sql: str) -> str:
+    """Get a short, stable identifier of a statement whatever its values, e.g. for logs and `Server-Timing`."""
+    return hashlib.blake2b(normalize(sql).encode(), digest_size=6).hexdigest()
+
+
+@contextmanager
+def collect_queries() -> Iterator[QueryStats]:
+    """Count and time the queries of all connections run in this context, and its `sync_to_async` calls."""
+    stats = QueryStats()
+    token = _stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats.reset(token)
+
+
+def record_queries(
+    execute: Callable[..., Any],
+    sql: str,
+    params: Any,  # noqa: ANN401
+    many: bool,
+    context: dict[str, Any],
+) -> Any:  # noqa: ANN401
+    """Execute wrapper adding the query to the `QueryStats` of the context, if any."""
+    stats = _stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.count += 1
+        stats.duration += elapsed
+        if elapsed > stats.slowest_duration:
+            stats.slowest_duration = elapsed
+            stats.slowest_sql = sql
+
+
+def install_query_recorder(connection: BaseDatabaseWrapper, **kwargs: Any) -> None:  # noqa: ANN401, ARG001
+    """Add `record_queries` to the execute wrappers of a connection when it connects."""
+    # First, so the wrappers pushed and popped by `connection.execute_wrapper()` blocks stay last.
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_queries)
+
+
+connection_created.connect(install_query_recorder)
+for _connection in connections.all(initialized_only=True):
+    install_query_recorder(_connection)
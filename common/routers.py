@@ -0,0 +1,106 @@
+"""Database router sending reads to the read replicas of `settings.DATABASE_REPLICAS`.
+
+Replicas are only used inside a `read_from_replicas` scope, which `ReplicaPinningMiddleware` opens for every
+request; celery tasks and management commands keep reading from the primary. Inside a scope:
+
+- writes go to the primary and pin the scope to it, so the rest of the request reads its own writes;
+- reads inside a transaction of the primary stay on the primary;
+- a replica lagging more than `settings.DATABASE_REPLICA_MAX_LAG` seconds behind, or unreachable, is skipped
+  until its next check, and reads fall back to the primary when no replica is left.
+"""
+
+import logging
+import random
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models import Model
+
+logger = logging.getLogger(__name__)
+
+# Replication lag in seconds, 0 when the replica replayed everything it received (an idle primary does not
+# move `pg_last_xact_replay_timestamp`) or when the database is not a standby.
+_LAG_SQL = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+@dataclass
+class _Scope:
+    pinned: bool = False
+
+
+_scope: ContextVar[_Scope | None] = ContextVar("replica_scope", default=None)
+# Monotonic time of the last lag check of every replica in this process, and whether it was fresh.
+_checked: dict[str, tuple[float, bool]] = {}
+
+
+@contextmanager
+def read_from_replicas() -> Iterator[None]:
+    """Let reads go to the replicas until the first write of the block (read-your-writes stickiness)."""
+    token = _scope.set(_Scope())
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def pin_to_primary() -> None:
+    """Send the remaining reads of the current scope to the primary, e.g. after a write done in raw SQL."""
+    if (scope := _scope.get()) is not None:
+        scope.pinned = True
+
+
+class ReplicaRouter:
+    """Route reads to a fresh read replica and writes to the primary."""
+
+    def db_for_read(self, model: type[Model], **hints: Any) -> str | None:  # noqa: ANN401, ARG002, D102
+        scope = _scope.get()
+        if scope is None or scope.pinned or not settings.DATABASE_REPLICAS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if _is_fresh(alias)]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS  # noqa: S311
+
+    def db_for_write(self, model: type[Model], **hints: Any) -> str:  # noqa: ANN401, ARG002, D102
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints: Any) -> bool | None:  # noqa: ANN401, ARG002, D102
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, model_name: str | None = None, **hints: Any) -> bool | None:  # noqa: ANN401, ARG002, D102
+        # Replicas get their schema through replication.
+        return False if db in settings.DATABASE_REPLICAS else None
+
+
+def _is_fresh(alias: str) -> bool:
+    now = time.monotonic()
+    checked = _checked.get(alias)
+    if checked is not None and now - checked[0] < settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(_LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        logger.warning("Read replica %s is unreachable, reading from the primary", alias, exc_info=True)
+        fresh = False
+    else:
+        fresh = lag is not None and lag <= settings.DATABASE_REPLICA_MAX_LAG
+        if not fresh:
+            logger.warning("Read replica %s lags %s seconds behind, reading from the primary", alias, lag)
+    _checked[alias] = (now, fresh)
+    return fresh
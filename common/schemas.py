@@ -1,5 +1,10 @@
+from typing import Generic, TypeVar
+from uuid import UUID
+
 from ninja import Schema
 
+T = TypeVar("T")
+
 
 class Http400BadRequestSchema(Schema):
     """Base schema for 400 response."""
@@ -29,3 +34,33 @@ class BaseResponseSchema(Schema):
     """Base schema for response."""
 
     msg: str = "OK"
+
+
+class CursorPageSchema(Schema, Generic[T]):  # noqa: UP046
+    """Base schema for a keyset-paginated list response."""
+
+    items: list[T]
+    next_cursor: str | None = None
+
+
+class BatchItemResultSchema(Schema):
+    """Base schema for the result of one item of a batch request."""
+
+    index: int
+    id: UUID | None = None
+    status: str
+    errors: list[str] | None = None
+
+
+class BatchResponseSchema(Schema):
+    """Base schema for a batch response."""
+
+    succeeded: int
+    failed: int
+    results: list[BatchItemResultSchema]
+
+
+class BatchDeleteSchema(Schema):
+    """Base schema for a batch delete request."""
+
+    ids: list[UUID]
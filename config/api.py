@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.core.handlers.wsgi import WSGIRequest
 from ninja.openapi.docs import Redoc
 from ninja_extra import NinjaExtraAPI
@@ -25,4 +26,4 @@ def health_check(request: WSGIRequest):  # noqa: ARG001
     return {"status": "healthy"}
 
 
-api.register_controllers(bot_apis.BotAPI)
+api.register_controllers(bot_apis.AsyncBotAPI if settings.BOT_API_ASYNC else bot_apis.BotAPI)
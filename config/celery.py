@@ -3,6 +3,8 @@ import warnings
 
 import django
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
+from django.conf import settings
 
 warnings.filterwarnings("ignore")
 
@@ -17,3 +19,29 @@ app = Celery("config")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks(related_name="tasks")
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs) -> None:  # noqa: ANN003, ARG001
+    """Expose the metrics of the worker (e.g. the conversation buffer ones) on `settings.WORKER_METRICS_PORT`.
+
+    The metrics are recorded in the pool processes: with the prefork pool, `PROMETHEUS_MULTIPROC_DIR` must be
+    set so the main process serves their samples.
+    """
+    # Imported once the settings loaded the environment: prometheus_client reads PROMETHEUS_MULTIPROC_DIR
+    # on import.
+    from prometheus_client import start_http_server  # noqa: PLC0415
+
+    from common.metrics import metrics_registry  # noqa: PLC0415
+
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT, registry=metrics_registry())
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid: int, **kwargs) -> None:  # noqa: ANN003, ARG001
+    """Drop the live gauges of a pool process that exited."""
+    from prometheus_client import multiprocess  # noqa: PLC0415
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -7,6 +7,7 @@ from pathlib import Path
 import boto3
 import environ
 from botocore.exceptions import ClientError
+from celery.schedules import crontab
 
 from utils.logging import JsonFormatter
 
@@ -23,6 +24,9 @@ else:
 env = environ.Env()
 if not DISABLE_DOT_ENV:
     env.read_env(DOT_ENV_PATH)
+# prometheus_client switches to multiprocess mode when the variable is set, even to an empty value.
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
 
 # General
 # ------------------------------------------------------------------------------
@@ -103,6 +107,36 @@ DATABASES = {
         "NAME": ROOT_DIR / "sql" / "db.sqlite3",
     },
 }
+# PostgreSQL is used when DATABASE_HOST is set.
+if env("DATABASE_HOST", default=None):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "HOST": env("DATABASE_HOST"),
+        "PORT": env.int("DATABASE_PORT", default=5432),
+        "NAME": env("DATABASE_DB"),
+        # Check a connection before reusing it (persistent or from the pool) so a dropped one is replaced.
+        "CONN_HEALTH_CHECKS": env.bool("DATABASE_CONN_HEALTH_CHECKS", default=True),
+        "OPTIONS": {},
+    }
+    # https://docs.djangoproject.com/en/5.1/ref/databases/#connection-pool
+    # Every process (uvicorn worker, celery worker) has its own pool, so keep
+    # processes * DATABASE_POOL_MAX_SIZE below the max_connections of the server minus some headroom for
+    # migrations and admin sessions. A process needs one connection per thread running queries at the same
+    # time: under ASGI, sync views and `sync_to_async` ORM calls share one thread per worker unless marked
+    # `thread_sensitive=False`; under celery, the worker concurrency.
+    if env.bool("DATABASE_POOL", default=True):
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": env.int("DATABASE_POOL_MIN_SIZE", default=2),
+            "max_size": env.int("DATABASE_POOL_MAX_SIZE", default=10),
+            # Seconds to wait for a free connection before raising.
+            "timeout": env.float("DATABASE_POOL_TIMEOUT", default=10.0),
+            # Seconds an idle connection above min_size is kept, and the max lifetime of any connection.
+            "max_idle": env.float("DATABASE_POOL_MAX_IDLE", default=300.0),
+            "max_lifetime": env.float("DATABASE_POOL_MAX_LIFETIME", default=3600.0),
+        }
+    else:
+        # Without the pool, keep the connection of a process open between requests for this many seconds.
+        DATABASES["default"]["CONN_MAX_AGE"] = env.int("DATABASE_CONN_MAX_AGE", default=60)
 db_secret_name = env("DATABASE_SECRET_NAME", default=None)
 if db_secret_name is not None:
     session = boto3.session.Session()  # type: ignore
@@ -123,18 +157,66 @@ if db_secret_name is not None:
 else:
     DATABASES["default"]["USER"] = env("DATABASE_USER")
     DATABASES["default"]["PASSWORD"] = env("DATABASE_PASSWORD")
+# Hosts (host or host:port) of the read replicas of the PostgreSQL primary. They share its credentials
+# and settings and are used by `common.routers.ReplicaRouter` for the reads of requests.
+DATABASE_REPLICAS = []
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    for i, replica_host in enumerate(env.list("DATABASE_REPLICA_HOSTS", default=[])):
+        host, _, port = replica_host.partition(":")
+        DATABASES[f"replica_{i}"] = {
+            **DATABASES["default"],
+            "HOST": host,
+            "PORT": int(port) if port else DATABASES["default"]["PORT"],
+            "TEST": {"MIRROR": "default"},
+        }
+        DATABASE_REPLICAS.append(f"replica_{i}")
+DATABASE_ROUTERS = ["common.routers.ReplicaRouter"]
+# Max replication lag in seconds of a replica still used for reads.
+DATABASE_REPLICA_MAX_LAG = env.float("DATABASE_REPLICA_MAX_LAG", default=5.0)
+# Seconds between two lag checks of a replica by a process.
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = env.float("DATABASE_REPLICA_LAG_CHECK_INTERVAL", default=10.0)
 
 # Cache
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#caches
+REDIS_URL = env("REDIS_URL", default="redis://127.0.0.1:6379/0")
 CACHES = {
-    "BACKEND": "django_redis.cache.RedisCache",
-    "LOCATION": env("REDIS_URL", default="redis://127.0.0.1:6379/0"),
-    "OPTIONS": {
-        "CLIENT_CLASS": "django_redis.client.DefaultClient",
-        "PARSER_CLASS": "redis.connection.HiredisParser",
+    "default": {
+        # Redis behind a per-process LRU invalidated over Redis pub/sub (`utils.cache_backends`).
+        "BACKEND": "utils.cache_backends.TwoTierRedisCache",
+        "LOCATION": REDIS_URL,
+        "OPTIONS": {
+            # Max number of entries kept in the memory of every process.
+            "L1_MAX_ENTRIES": env.int("CACHE_L1_MAX_ENTRIES", default=10000),
+            # Max seconds an entry is served from process memory, the staleness bound if an invalidation is lost.
+            "L1_TIMEOUT": env.float("CACHE_L1_TIMEOUT", default=5.0),
+        },
     },
 }
+# Cache alias of the read-through object cache (`common.cache`) of models with `ExtraMeta.cache_enabled`.
+OBJECT_CACHE_ALIAS = env("OBJECT_CACHE_ALIAS", default="default")
+# Default lifetime in seconds of a cached object. A model can override it with `ExtraMeta.cache_timeout`.
+OBJECT_CACHE_TIMEOUT = env.int("OBJECT_CACHE_TIMEOUT", default=300)
+# Lifetime in seconds of the lock taken by the one request that loads a missing object.
+OBJECT_CACHE_LOCK_TIMEOUT = env.int("OBJECT_CACHE_LOCK_TIMEOUT", default=10)
+# Seconds the other requests wait for that object to show up in the cache before reading the database.
+OBJECT_CACHE_STAMPEDE_WAIT = env.float("OBJECT_CACHE_STAMPEDE_WAIT", default=1.0)
+
+# Pagination
+# ------------------------------------------------------------------------------
+# Page size of keyset-paginated list endpoints when the client sends no limit.
+PAGINATION_DEFAULT_LIMIT = env.int("PAGINATION_DEFAULT_LIMIT", default=50)
+# Hard max page size of keyset-paginated list endpoints.
+PAGINATION_MAX_LIMIT = env.int("PAGINATION_MAX_LIMIT", default=500)
+
+# CRUD controllers
+# ------------------------------------------------------------------------------
+# Max number of items of one batch request of generated CRUD controllers.
+CRUD_BATCH_MAX_ITEMS = env.int("CRUD_BATCH_MAX_ITEMS", default=1000)
+# Rows per UPDATE statement of the bulk soft delete and restore of `BaseModelQuerySet`.
+SOFT_DELETE_BATCH_SIZE = env.int("SOFT_DELETE_BATCH_SIZE", default=5000)
+# Objects stamped and written per chunk by `bulk_create`, `bulk_update` and `stream_create` of `BaseModelManager`.
+BULK_WRITE_CHUNK_SIZE = env.int("BULK_WRITE_CHUNK_SIZE", default=1000)
 
 # Urls
 # ------------------------------------------------------------------------------
@@ -182,6 +264,8 @@ AUTHENTICATION_BACKENDS = [
 ]
 # https://docs.djangoproject.com/en/dev/ref/settings/#
 AUTH_USER_MODEL = "core.User"
+# The tenant model of the `company` foreign key of `BaseModel`.
+TENANT_MODEL = "core.Company"
 # https://docs.djangoproject.com/en/dev/ref/settings/#login-redirect-url
 LOGIN_REDIRECT_URL = "admin/"
 # https://docs.djangoproject.com/en/dev/ref/settings/#login-url
@@ -210,7 +294,11 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "common.middlewares.PrometheusMiddleware",
+    "common.middlewares.QueryInstrumentationMiddleware",
+    "common.middlewares.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "common.middlewares.ReplicaPinningMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     # "django.middleware.locale.LocaleMiddleware",
@@ -222,10 +310,42 @@ MIDDLEWARE = [
     "allauth.account.middleware.AccountMiddleware",
 ]
 
-if DEBUG:
-    MIDDLEWARE += [
-        "common.middlewares.APITimingMiddleware",
-    ]
+# Metrics
+# ------------------------------------------------------------------------------
+# Bearer token the Prometheus scraper must send to `/metrics`. When empty the endpoint answers 404, unless DEBUG.
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+# Port of the metrics endpoint of celery workers (`config.celery`), 0 to disable it.
+WORKER_METRICS_PORT = env.int("WORKER_METRICS_PORT", default=9540)
+# Fraction of requests whose database queries are counted and timed, from 0 (none) to 1 (all).
+DB_INSTRUMENTATION_SAMPLE_RATE = env.float("DB_INSTRUMENTATION_SAMPLE_RATE", default=0.05)
+# Whether sampled requests report their query time in a `Server-Timing` response header.
+DB_INSTRUMENTATION_SERVER_TIMING = env.bool("DB_INSTRUMENTATION_SERVER_TIMING", default=True)
+# A sampled request running more queries than this is logged with its slowest statement.
+DB_QUERY_BUDGET = env.int("DB_QUERY_BUDGET", default=50)
+# A sampled request spending more seconds than this in queries is logged with its slowest statement.
+DB_QUERY_TIME_BUDGET = env.float("DB_QUERY_TIME_BUDGET", default=0.5)
+
+# Profiling
+# ------------------------------------------------------------------------------
+# Fraction of requests profiled by `common.middlewares.ProfilingMiddleware`, from 0 (none) to 1 (all).
+PROFILER_SAMPLE_RATE = env.float("PROFILER_SAMPLE_RATE", default=0.01)
+# Seconds between two stack samples of a profiled request.
+PROFILER_INTERVAL = env.float("PROFILER_INTERVAL", default=0.005)
+# A sampled request slower than this many seconds has its profile kept.
+PROFILER_THRESHOLD = env.float("PROFILER_THRESHOLD", default=1.0)
+# Seconds a signed `X-Profile` header (`python manage.py sign_profile_header`) stays valid.
+PROFILER_HEADER_MAX_AGE = env.int("PROFILER_HEADER_MAX_AGE", default=3600)
+# Max number of kept profiles; the oldest ones are deleted first.
+PROFILER_MAX_PROFILES = env.int("PROFILER_MAX_PROFILES", default=500)
+# Days a kept profile is retained.
+PROFILER_RETENTION_DAYS = env.int("PROFILER_RETENTION_DAYS", default=7)
+if AWS_S3_ENABLED and env.bool("PROFILER_USE_AWS_S3_STORAGE", default=False):
+    STORAGES["profiles"] = {"BACKEND": "utils.storage.ProfileS3Storage"}
+else:
+    STORAGES["profiles"] = {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": ROOT_DIR / "profiles"},
+    }
 
 # Static
 # ------------------------------------------------------------------------------
@@ -485,6 +605,8 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_WORKER_CANCEL_LONG_RUNNING_TASKS_ON_CONNECTION_LOSS = False
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# Periodic tasks, synced into the database scheduler on beat startup.
+CELERY_BEAT_SCHEDULE = {}
 
 # Email
 # ------------------------------------------------------------------------------
@@ -500,3 +622,48 @@ EMAIL_PORT = env("DJANGO_EMAIL_PORT", default=587)
 EMAIL_HOST_USER = env("DJANGO_EMAIL_HOST_USER", default=None)
 # https://docs.djangoproject.com/en/dev/ref/settings/#email-host-password
 EMAIL_HOST_PASSWORD = env("DJANGO_EMAIL_HOST_PASSWORD", default=None)
+
+# Bot
+# ------------------------------------------------------------------------------
+# Serve the bot API with native async routes (AsyncBotAPI) instead of sync ones (BotAPI).
+BOT_API_ASYNC = env.bool("BOT_API_ASYNC", default=False)
+# Max number of items accepted by one conversation batch request.
+BOT_CONVERSATION_BATCH_MAX_ITEMS = env.int("BOT_CONVERSATION_BATCH_MAX_ITEMS", default=10000)
+# Number of rows per INSERT when the batch is written with bulk_create.
+BOT_CONVERSATION_BATCH_SIZE = env.int("BOT_CONVERSATION_BATCH_SIZE", default=1000)
+# Use COPY instead of bulk_create for batches on PostgreSQL.
+BOT_CONVERSATION_BATCH_USE_COPY = env.bool("BOT_CONVERSATION_BATCH_USE_COPY", default=True)
+# Number of rows fetched from the database cursor per chunk of a conversation export.
+BOT_CONVERSATION_EXPORT_CHUNK_SIZE = env.int("BOT_CONVERSATION_EXPORT_CHUNK_SIZE", default=2000)
+# Write conversations of POST /api/bot/conversation to a Redis stream and answer 202, instead of writing
+# them to the database in the request. A celery beat task drains the stream.
+BOT_CONVERSATION_WRITE_BEHIND = env.bool("BOT_CONVERSATION_WRITE_BEHIND", default=False)
+BOT_CONVERSATION_BUFFER_STREAM = env("BOT_CONVERSATION_BUFFER_STREAM", default="bot:conversations")
+BOT_CONVERSATION_BUFFER_GROUP = env("BOT_CONVERSATION_BUFFER_GROUP", default="conversation-flush")
+# Seconds between two flushes of the buffer.
+BOT_CONVERSATION_FLUSH_INTERVAL = env.float("BOT_CONVERSATION_FLUSH_INTERVAL", default=5.0)
+# Max number of buffered conversations written per bulk_create batch.
+BOT_CONVERSATION_FLUSH_BATCH_SIZE = env.int("BOT_CONVERSATION_FLUSH_BATCH_SIZE", default=5000)
+# Max seconds one flush keeps draining before leaving the rest to the next one.
+BOT_CONVERSATION_FLUSH_MAX_SECONDS = env.float("BOT_CONVERSATION_FLUSH_MAX_SECONDS", default=30.0)
+# Seconds a flush holds its lock between two batches. A crashed flush releases it after this.
+BOT_CONVERSATION_FLUSH_LOCK_TIMEOUT = env.int("BOT_CONVERSATION_FLUSH_LOCK_TIMEOUT", default=60)
+# Milliseconds an entry stays unacknowledged before another flush claims it again.
+BOT_CONVERSATION_FLUSH_CLAIM_IDLE_MS = env.int("BOT_CONVERSATION_FLUSH_CLAIM_IDLE_MS", default=120000)
+# Seconds before the oldest conversation of a flushed batch that are searched for duplicates. Older
+# conversations are not: a conversation enqueued again after this is written twice.
+BOT_CONVERSATION_DEDUPE_WINDOW = env.int("BOT_CONVERSATION_DEDUPE_WINDOW", default=3600)
+CELERY_BEAT_SCHEDULE["flush-conversation-buffer"] = {
+    "task": "features.bot.tasks.flush_conversation_buffer",
+    "schedule": BOT_CONVERSATION_FLUSH_INTERVAL,
+}
+# Number of future months that always have a conversations partition (PostgreSQL only).
+BOT_CONVERSATION_PARTITION_PREMAKE_MONTHS = env.int("BOT_CONVERSATION_PARTITION_PREMAKE_MONTHS", default=3)
+# Number of past months of conversations to keep. Older partitions are detached. Unset keeps everything.
+BOT_CONVERSATION_RETENTION_MONTHS = env.int("BOT_CONVERSATION_RETENTION_MONTHS", default=None)
+# Drop expired partitions instead of only detaching them.
+BOT_CONVERSATION_PARTITION_DROP_EXPIRED = env.bool("BOT_CONVERSATION_PARTITION_DROP_EXPIRED", default=False)
+CELERY_BEAT_SCHEDULE["maintain-conversation-partitions"] = {
+    "task": "features.bot.tasks.maintain_conversation_partitions",
+    "schedule": crontab(hour=3, minute=0),
+}
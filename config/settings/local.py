@@ -42,14 +42,3 @@ if DEBUG:  # noqa: F405
         "SHOW_TEMPLATE_CONTEXT": True,
     }
     INTERNAL_IPS = ["127.0.0.1", "10.0.2.2"]
-
-
-# Cache
-# ------------------------------------------------------------------------------
-# https://docs.djangoproject.com/en/5.1/topics/cache/#setting-up-the-cache
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": env("REDIS_URL", default="redis://127.0.0.1:6379/0"),
-    },
-}
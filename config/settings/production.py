@@ -61,9 +61,5 @@ if DEBUG:  # noqa: F405
 # Cache
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/5.1/topics/cache/#setting-up-the-cache
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": env("REDIS_URL"),
-    },
-}
+REDIS_URL = env("REDIS_URL")
+CACHES["default"]["LOCATION"] = REDIS_URL  # noqa: F405
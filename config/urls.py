@@ -6,6 +6,7 @@ from django.shortcuts import redirect
 from django.urls import include, path
 from django.views import defaults as default_views
 
+from common.metrics import metrics_view
 from config.api import api
 
 urlpatterns = [
@@ -14,6 +15,7 @@ urlpatterns = [
     *static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT),
     path("sentry-debug/", lambda request: 1 / 0),  # noqa: ARG005
     path("api/", api.urls),  # type: ignore
+    path("metrics", metrics_view, name="metrics"),
     path("", lambda request: redirect("admin/")),  # noqa: ARG005
 ]
 
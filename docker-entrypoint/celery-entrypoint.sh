@@ -1,5 +1,11 @@
 #!/bin/sh
 
+# Metrics of the previous run must not be aggregated with the new ones.
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+   rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+   mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 celery -A config worker -l info -E
 
 exec "$@"
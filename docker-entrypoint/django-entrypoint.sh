@@ -7,6 +7,12 @@ if [ -z "$SERVER_PORT" ]; then
    SERVER_PORT=8000
 fi
 
+# Metrics of the previous run must not be aggregated with the new ones.
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+   rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+   mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 python manage.py collectstatic --noinput
 python -m uvicorn config.asgi:application --host=$SERVER_HOST --port=$SERVER_PORT
 
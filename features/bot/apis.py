@@ -1,12 +1,49 @@
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import QuerySet
 from django.utils import timezone
+from ninja import Query
 from ninja_extra import api_controller, route
 from ninja_extra.controllers import ControllerBase
 from rest_framework import status
 from rest_framework.response import Response
 
+from common.exceptions import Http400BadRequestException
+from common.schemas import CursorPageSchema, Http400BadRequestSchema
+from features.bot.buffer import enqueue_conversation
+from features.bot.exports import EXPORT_FORMATS, export_response
 from features.bot.models import Conversation
+from features.bot.schemas import ConversationBatchResponseSchema, GetConversationResponseSchema
 from features.bot.serializers import ConversationSerializer
+from features.bot.services import parse_conversation_batch, validate_conversation_batch, write_conversations
+from utils.pagination import akeyset_paginate, keyset_paginate, resolve_limit
+
+CONVERSATION_ORDERING = ("-timestamp", "-id")
+
+
+def filter_conversations(user_id: str | None, since: datetime | None, until: datetime | None) -> QuerySet:
+    """Build the conversation queryset of the list routes.
+
+    Args:
+        user_id (str | None): Only keep conversations of this user.
+        since (datetime | None): Only keep conversations at or after this time.
+        until (datetime | None): Only keep conversations before this time.
+
+    Returns:
+        QuerySet: The filtered conversations.
+    """
+    queryset = Conversation.objects.all()
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    if since is not None:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until is not None:
+        queryset = queryset.filter(timestamp__lt=until)
+    return queryset
 
 
 @api_controller(prefix_or_class="bot", tags=["bot"])
@@ -24,7 +61,19 @@ class BotAPI(ControllerBase):
         user_id: str,
         conversation_id: str,
     ):
-        """Create a conversation."""
+        """Create a conversation.
+
+        With `settings.BOT_CONVERSATION_WRITE_BEHIND` the conversation is buffered in Redis and written to
+        the database later by a celery task; the route then answers 202 Accepted.
+        """
+        if settings.BOT_CONVERSATION_WRITE_BEHIND:
+            timestamp = timezone.now()
+            enqueue_conversation(user_id, conversation_id, timestamp)
+            return self.create_response(
+                {"user_id": user_id, "conversation_id": conversation_id, "timestamp": timestamp},
+                status_code=status.HTTP_202_ACCEPTED,
+            )
+
         try:
             conversation = Conversation.objects.create(
                 user_id=user_id,
@@ -47,3 +96,195 @@ class BotAPI(ControllerBase):
                 },
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+    @route.post(
+        "/conversations/batch",
+        tags=["conversation"],
+        response={
+            200: ConversationBatchResponseSchema,
+            400: Http400BadRequestSchema,
+        },
+    )
+    def create_conversations_batch(self, request: WSGIRequest):
+        """Create conversations in batch.
+
+        The body is a JSON array or NDJSON (`Content-Type: application/x-ndjson`) of
+        `{"user_id", "conversation_id", "timestamp"?}` objects. Every item is validated first (see
+        `validate_conversation_batch`), then all valid items are written in one transaction; invalid items
+        are reported by index.
+        """
+        items = parse_conversation_batch(request.body, request.content_type)
+        conversations, results = validate_conversation_batch(items)
+        created = write_conversations(conversations)
+        return {
+            "created": created,
+            "failed": len(results) - created,
+            "results": results,
+        }
+
+    @route.get(
+        "/conversations",
+        tags=["conversation"],
+        response={
+            200: CursorPageSchema[GetConversationResponseSchema],
+            400: Http400BadRequestSchema,
+        },
+    )
+    def list_conversations(
+        self,
+        user_id: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ):
+        """List conversations, newest first.
+
+        Pages are keyset-paginated over `(timestamp, id)`: pass the `next_cursor` of a page as `cursor` to
+        get the next one. `since` is inclusive and `until` is exclusive.
+        """
+        items, next_cursor = keyset_paginate(
+            filter_conversations(user_id, since, until),
+            CONVERSATION_ORDERING,
+            resolve_limit(limit),
+            cursor,
+        )
+        return {"items": items, "next_cursor": next_cursor}
+
+    @route.get(
+        "/conversations/export",
+        tags=["conversation"],
+        response={400: Http400BadRequestSchema},
+    )
+    def export_conversations(  # noqa: PLR0913, PLR0917
+        self,
+        request: WSGIRequest,
+        fmt: str = Query("ndjson", alias="format"),
+        gzip: bool = False,
+        user_id: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ):
+        """Export conversations as a stream of NDJSON (`format=ndjson`) or CSV (`format=csv`).
+
+        Rows are read with a server-side cursor and written out chunk by chunk, optionally gzipped
+        (`gzip=true`), so memory stays flat whatever the number of exported rows.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise Http400BadRequestException(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        return export_response(request, filter_conversations(user_id, since, until), fmt, gzip)
+
+
+@api_controller(prefix_or_class="bot", tags=["bot"])
+class AsyncBotAPI(ControllerBase):
+    """Bot API with native async routes.
+
+    Same routes as `BotAPI`, built on Django's async ORM so that under ASGI they run on the event loop
+    instead of the `sync_to_async` thread pool. Selected with `settings.BOT_API_ASYNC`.
+    """
+
+    @route.get("/", tags=["health_check"])
+    async def api_root_health_check(self, request: ASGIRequest):  # noqa: ARG002
+        """Check api health."""
+        return {"status": "healthy"}
+
+    @route.post("/conversation", tags=["conversation"])
+    async def create_conversation(
+        self,
+        user_id: str,
+        conversation_id: str,
+    ):
+        """Create a conversation. See `BotAPI.create_conversation`."""
+        if settings.BOT_CONVERSATION_WRITE_BEHIND:
+            timestamp = timezone.now()
+            await sync_to_async(enqueue_conversation, thread_sensitive=False)(user_id, conversation_id, timestamp)
+            return self.create_response(
+                {"user_id": user_id, "conversation_id": conversation_id, "timestamp": timestamp},
+                status_code=status.HTTP_202_ACCEPTED,
+            )
+
+        try:
+            conversation = await Conversation.objects.acreate(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                timestamp=timezone.now(),
+            )
+
+            serializer = ConversationSerializer(conversation)
+            return {
+                "user_id": serializer.data["user_id"],
+                "conversation_id": serializer.data["conversation_id"],
+                "timestamp": serializer.data["timestamp"],
+            }
+
+        except Exception as e:
+            return Response(
+                {
+                    "status": "error",
+                    "message": str(e),
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @route.post(
+        "/conversations/batch",
+        tags=["conversation"],
+        response={
+            200: ConversationBatchResponseSchema,
+            400: Http400BadRequestSchema,
+        },
+    )
+    async def create_conversations_batch(self, request: ASGIRequest):
+        """Create conversations in batch. See `BotAPI.create_conversations_batch`."""
+        items = parse_conversation_batch(request.body, request.content_type)
+        conversations, results = validate_conversation_batch(items)
+        created = await sync_to_async(write_conversations)(conversations)
+        return {
+            "created": created,
+            "failed": len(results) - created,
+            "results": results,
+        }
+
+    @route.get(
+        "/conversations",
+        tags=["conversation"],
+        response={
+            200: CursorPageSchema[GetConversationResponseSchema],
+            400: Http400BadRequestSchema,
+        },
+    )
+    async def list_conversations(
+        self,
+        user_id: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ):
+        """List conversations, newest first. See `BotAPI.list_conversations`."""
+        items, next_cursor = await akeyset_paginate(
+            filter_conversations(user_id, since, until),
+            CONVERSATION_ORDERING,
+            resolve_limit(limit),
+            cursor,
+        )
+        return {"items": items, "next_cursor": next_cursor}
+
+    @route.get(
+        "/conversations/export",
+        tags=["conversation"],
+        response={400: Http400BadRequestSchema},
+    )
+    async def export_conversations(  # noqa: PLR0913, PLR0917
+        self,
+        request: ASGIRequest,
+        fmt: str = Query("ndjson", alias="format"),
+        gzip: bool = False,
+        user_id: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ):
+        """Export conversations as a stream of NDJSON or CSV. See `BotAPI.export_conversations`."""
+        if fmt not in EXPORT_FORMATS:
+            raise Http400BadRequestException(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        return export_response(request, filter_conversations(user_id, since, until), fmt, gzip)
@@ -0,0 +1,173 @@
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from redis.exceptions import LockError, ResponseError
+
+from features.bot.metrics import (
+    conversation_buffer_depth,
+    conversation_buffer_pending,
+    conversation_flush_lag_seconds,
+    conversation_flushed_total,
+)
+from features.bot.models import Conversation
+from utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+_FLUSH_LOCK_NAME = "bot:conversations:flush-lock"
+
+
+def enqueue_conversation(user_id: str, conversation_id: str, timestamp: datetime) -> str:
+    """Append a conversation to the write-behind buffer.
+
+    Args:
+        user_id (str): The user id of the conversation.
+        conversation_id (str): The conversation id.
+        timestamp (datetime): The time the conversation started.
+
+    Returns:
+        str: The id of the buffer entry.
+    """
+    entry_id = get_redis_client().xadd(
+        settings.BOT_CONVERSATION_BUFFER_STREAM,
+        {"user_id": user_id, "conversation_id": conversation_id, "timestamp": timestamp.isoformat()},
+    )
+    return entry_id.decode("utf-8")
+
+
+def flush_conversation_buffer() -> int:
+    """Drain the write-behind buffer into the database in `bulk_create` batches.
+
+    Entries are read through a consumer group and only acknowledged once their batch is committed, so a
+    crashed flush leaves them pending and a later flush claims them again (at-least-once). Because an
+    entry can therefore be written twice, conversations whose `(user_id, conversation_id)` already exist
+    with a timestamp at most `settings.BOT_CONVERSATION_DEDUPE_WINDOW` seconds before the oldest conversation
+    of the batch are skipped. That always covers the entries written again, which keep their timestamp;
+    other duplicates of an older conversation are written. Only one flush runs at a time.
+
+    Returns:
+        int: The number of conversations written.
+    """
+    client = get_redis_client()
+    stream = settings.BOT_CONVERSATION_BUFFER_STREAM
+    if not client.exists(stream):
+        return 0
+
+    lock = client.lock(_FLUSH_LOCK_NAME, timeout=settings.BOT_CONVERSATION_FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return 0
+
+    written = 0
+    try:
+        _ensure_consumer_group()
+        deadline = time.monotonic() + settings.BOT_CONVERSATION_FLUSH_MAX_SECONDS
+        while time.monotonic() < deadline:
+            entries = _claim_stale_entries() or _read_new_entries()
+            if not entries:
+                break
+            written += _write_entries(entries)
+            ids = [entry_id for entry_id, _ in entries]
+            client.xack(stream, settings.BOT_CONVERSATION_BUFFER_GROUP, *ids)
+            client.xdel(stream, *ids)
+            lock.extend(settings.BOT_CONVERSATION_FLUSH_LOCK_TIMEOUT, replace_ttl=True)
+    finally:
+        try:
+            _record_buffer_stats()
+        except ResponseError:
+            # E.g. NOGROUP when the consumer group could not be created: keep the original error.
+            logger.warning("Could not record the conversation buffer stats", exc_info=True)
+        try:
+            lock.release()
+        except LockError:
+            # A batch outlasted the lock timeout, so the lock expired; what was written is committed.
+            logger.warning("The conversation flush lock expired before the flush released it")
+    return written
+
+
+def _consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _ensure_consumer_group() -> None:
+    try:
+        get_redis_client().xgroup_create(
+            settings.BOT_CONVERSATION_BUFFER_STREAM,
+            settings.BOT_CONVERSATION_BUFFER_GROUP,
+            id="0",
+            mkstream=True,
+        )
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _claim_stale_entries() -> list[tuple[bytes, dict]]:
+    """Claim entries delivered to a flush that never acknowledged them."""
+    _, entries, *_ = get_redis_client().xautoclaim(
+        settings.BOT_CONVERSATION_BUFFER_STREAM,
+        settings.BOT_CONVERSATION_BUFFER_GROUP,
+        _consumer_name(),
+        min_idle_time=settings.BOT_CONVERSATION_FLUSH_CLAIM_IDLE_MS,
+        count=settings.BOT_CONVERSATION_FLUSH_BATCH_SIZE,
+    )
+    return [(entry_id, fields) for entry_id, fields in entries if fields]
+
+
+def _read_new_entries() -> list[tuple[bytes, dict]]:
+    response = get_redis_client().xreadgroup(
+        settings.BOT_CONVERSATION_BUFFER_GROUP,
+        _consumer_name(),
+        {settings.BOT_CONVERSATION_BUFFER_STREAM: ">"},
+        count=settings.BOT_CONVERSATION_FLUSH_BATCH_SIZE,
+    )
+    return response[0][1] if response else []
+
+
+def _write_entries(entries: list[tuple[bytes, dict]]) -> int:
+    """Write one batch of buffer entries, skipping the `(user_id, conversation_id)` of the dedupe window."""
+    conversations = {}
+    for _, fields in entries:
+        user_id = fields[b"user_id"].decode("utf-8")
+        conversation_id = fields[b"conversation_id"].decode("utf-8")
+        conversations.setdefault(
+            (user_id, conversation_id),
+            Conversation(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                timestamp=datetime.fromisoformat(fields[b"timestamp"].decode("utf-8")),
+            ),
+        )
+
+    oldest = min(conversation.timestamp for conversation in conversations.values())
+    existing = set(
+        Conversation.objects.filter(
+            user_id__in={user_id for user_id, _ in conversations},
+            conversation_id__in={conversation_id for _, conversation_id in conversations},
+            timestamp__gte=oldest - timedelta(seconds=settings.BOT_CONVERSATION_DEDUPE_WINDOW),
+        ).values_list("user_id", "conversation_id"),
+    )
+    new = [conversation for key, conversation in conversations.items() if key not in existing]
+
+    with transaction.atomic():
+        Conversation.objects.bulk_create(new, batch_size=settings.BOT_CONVERSATION_BATCH_SIZE)
+
+    oldest_entry_ms = min(int(entry_id.split(b"-")[0]) for entry_id, _ in entries)
+    conversation_flush_lag_seconds.observe(max(time.time() - oldest_entry_ms / 1000, 0))
+    conversation_flushed_total.labels(result="written").inc(len(new))
+    conversation_flushed_total.labels(result="duplicate").inc(len(entries) - len(new))
+    return len(new)
+
+
+def _record_buffer_stats() -> None:
+    client = get_redis_client()
+    stream = settings.BOT_CONVERSATION_BUFFER_STREAM
+    depth = client.xlen(stream)
+    pending = client.xpending(stream, settings.BOT_CONVERSATION_BUFFER_GROUP)["pending"]
+    conversation_buffer_depth.set(depth)
+    conversation_buffer_pending.set(pending)
+    logger.info("Conversation buffer flushed", extra={"depth": depth, "pending": pending})
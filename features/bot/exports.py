@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import zlib
+from collections.abc import AsyncIterator, Iterable, Iterator
+from datetime import datetime
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import QuerySet
+from django.http import HttpRequest, StreamingHttpResponse
+
+EXPORT_FIELDS = ("id", "user_id", "conversation_id", "timestamp")
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _serialize(row: tuple) -> tuple:
+    return tuple(value.isoformat() if isinstance(value, datetime) else value for value in row)
+
+
+def _format_rows(rows: Iterable[tuple], fmt: str) -> bytes:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(_serialize(row) for row in rows)
+        return buffer.getvalue().encode("utf-8")
+    return "".join(json.dumps(dict(zip(EXPORT_FIELDS, _serialize(row), strict=True))) + "\n" for row in rows).encode(
+        "utf-8",
+    )
+
+
+def _csv_header() -> bytes:
+    return (",".join(EXPORT_FIELDS) + "\r\n").encode("utf-8")
+
+
+def iter_export(queryset: QuerySet, fmt: str, chunk_size: int) -> Iterator[bytes]:
+    """Stream conversations as NDJSON or CSV with a server-side cursor.
+
+    At most `chunk_size` rows are held in memory at once, whatever the size of the export.
+
+    Args:
+        queryset (QuerySet): The conversations to export.
+        fmt (str): `ndjson` or `csv`.
+        chunk_size (int): The number of rows fetched from the cursor and emitted per chunk.
+
+    Yields:
+        bytes: The encoded chunks.
+    """
+    if fmt == "csv":
+        yield _csv_header()
+    chunk = []
+    for row in queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield _format_rows(chunk, fmt)
+            chunk = []
+    if chunk:
+        yield _format_rows(chunk, fmt)
+
+
+async def aiter_export(queryset: QuerySet, fmt: str, chunk_size: int) -> AsyncIterator[bytes]:
+    """Async version of `iter_export`."""
+    if fmt == "csv":
+        yield _csv_header()
+    chunk = []
+    async for row in queryset.values_list(*EXPORT_FIELDS).aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield _format_rows(chunk, fmt)
+            chunk = []
+    if chunk:
+        yield _format_rows(chunk, fmt)
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip a stream of chunks on the fly."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+async def agzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Async version of `gzip_chunks`."""
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(request: HttpRequest, queryset: QuerySet, fmt: str, gzip: bool) -> StreamingHttpResponse:
+    """Build the streaming response of a conversation export.
+
+    Under ASGI the body is an async iterator: Django would otherwise load a sync iterator in full before
+    sending it.
+
+    Args:
+        request (HttpRequest): The request being answered.
+        queryset (QuerySet): The conversations to export.
+        fmt (str): `ndjson` or `csv`.
+        gzip (bool): Compress the export with gzip.
+
+    Returns:
+        StreamingHttpResponse: The response.
+    """
+    queryset = queryset.order_by("timestamp", "id")
+    chunk_size = settings.BOT_CONVERSATION_EXPORT_CHUNK_SIZE
+    if isinstance(request, ASGIRequest):
+        chunks = aiter_export(queryset, fmt, chunk_size)
+        content = agzip_chunks(chunks) if gzip else chunks
+    else:
+        chunks = iter_export(queryset, fmt, chunk_size)
+        content = gzip_chunks(chunks) if gzip else chunks
+
+    filename = f"conversations.{fmt}{'.gz' if gzip else ''}"
+    return StreamingHttpResponse(
+        content,
+        content_type="application/gzip" if gzip else EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
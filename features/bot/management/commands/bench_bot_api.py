@@ -0,0 +1,77 @@
+import asyncio
+import time
+from collections.abc import Callable, Coroutine
+from itertools import count
+from typing import Any
+from uuid import uuid4
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.test import AsyncClient
+
+from features.bot.models import Conversation
+from utils.benchmark import BenchmarkResult
+
+
+class Command(BaseCommand):
+    """Benchmark the bot API under concurrent requests through the ASGI handler."""
+
+    help = (
+        "Measure requests/sec and p99 latency of the bot API at high concurrency. The sync (BotAPI) or async "
+        "(AsyncBotAPI) controller is picked by BOT_API_ASYNC, so run the command once with each value to compare."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument("--requests", type=int, default=5000, help="Number of requests per scenario.")
+        parser.add_argument("--concurrency", type=int, default=200, help="Number of requests in flight.")
+        parser.add_argument("--host", default="localhost", help="Host header sent with the requests.")
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        client = AsyncClient(HTTP_HOST=options["host"])
+        user_id = f"bench-{uuid4()}"
+        conversation_ids = count()
+        Conversation.objects.bulk_create(
+            [Conversation(user_id=user_id, conversation_id=str(next(conversation_ids))) for _ in range(1000)],
+        )
+
+        scenarios = {
+            "list": lambda: client.get("/api/bot/conversations", {"user_id": user_id, "limit": 20}),
+            "create": lambda: client.post(
+                f"/api/bot/conversation?user_id={user_id}&conversation_id={next(conversation_ids)}",
+            ),
+        }
+        mode = "async" if settings.BOT_API_ASYNC else "sync"
+        try:
+            for name, send in scenarios.items():
+                result = async_to_sync(self._run)(
+                    f"{mode} {name}",
+                    send,
+                    options["requests"],
+                    options["concurrency"],
+                )
+                self.stdout.write(result.summary())
+        finally:
+            Conversation.objects.filter(user_id=user_id).delete()
+
+    async def _run(
+        self,
+        name: str,
+        send: Callable[[], Coroutine[Any, Any, Any]],
+        requests: int,
+        concurrency: int,
+    ) -> BenchmarkResult:
+        result = BenchmarkResult(name)
+        remaining = iter(range(requests))
+
+        async def worker() -> None:
+            for _ in remaining:
+                started = time.perf_counter()
+                await send()
+                result.durations.append(time.perf_counter() - started)
+                result.items += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        result.elapsed = time.perf_counter() - started
+        return result
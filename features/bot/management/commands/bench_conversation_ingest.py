@@ -0,0 +1,51 @@
+import json
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.test import Client
+
+from features.bot.models import Conversation
+from utils.benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    """Benchmark the single-row conversation endpoint against the batch endpoint."""
+
+    help = "Compare conversation ingest throughput of POST /api/bot/conversation and /api/bot/conversations/batch."
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument("--rows", type=int, default=10000, help="Number of conversations per path.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of conversations per batch request.")
+        parser.add_argument("--host", default="localhost", help="Host header sent with the requests.")
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        rows = options["rows"]
+        batch_size = options["batch_size"]
+        client = Client(HTTP_HOST=options["host"])
+        user_id = f"bench-{uuid4()}"
+        counter = iter(range(rows * 2))
+
+        def single() -> int:
+            client.post(f"/api/bot/conversation?user_id={user_id}&conversation_id={next(counter)}")
+            return 1
+
+        def batch(content_type: str) -> int:
+            items = [{"user_id": user_id, "conversation_id": str(next(counter))} for _ in range(batch_size)]
+            if content_type == "application/x-ndjson":
+                body = "\n".join(json.dumps(item) for item in items)
+            else:
+                body = json.dumps(items)
+            client.post("/api/bot/conversations/batch", body, content_type)
+            return batch_size
+
+        try:
+            results = [
+                run_benchmark("single-row", single, rows),
+                run_benchmark("batch (JSON array)", lambda: batch("application/json"), max(rows // batch_size // 2, 1)),
+                run_benchmark("batch (NDJSON)", lambda: batch("application/x-ndjson"), max(rows // batch_size // 2, 1)),
+            ]
+        finally:
+            Conversation.objects.filter(user_id=user_id).delete()
+
+        for result in results:
+            self.stdout.write(result.summary())
@@ -0,0 +1,47 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from features.bot.apis import filter_conversations
+from features.bot.exports import EXPORT_FORMATS, gzip_chunks, iter_export
+
+
+class Command(BaseCommand):
+    """Export conversations as NDJSON or CSV without loading them in memory."""
+
+    help = "Stream conversations to a file (or stdout) as NDJSON or CSV, optionally gzipped."
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="ndjson", help="Export format.")
+        parser.add_argument("--output", default="-", help="Output file, or - for stdout.")
+        parser.add_argument("--gzip", action="store_true", help="Compress the export with gzip.")
+        parser.add_argument("--user-id", help="Only export the conversations of this user.")
+        parser.add_argument("--since", type=datetime.fromisoformat, help="Only export conversations from this time.")
+        parser.add_argument("--until", type=datetime.fromisoformat, help="Only export conversations before this time.")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.BOT_CONVERSATION_EXPORT_CHUNK_SIZE,
+            help="Number of rows fetched from the database cursor per chunk.",
+        )
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        queryset = filter_conversations(options["user_id"], options["since"], options["until"])
+        queryset = queryset.order_by("timestamp", "id")
+        chunks = iter_export(queryset, options["format"], options["chunk_size"])
+        if options["gzip"]:
+            chunks = gzip_chunks(chunks)
+
+        if options["output"] == "-":
+            self._write(chunks, sys.stdout.buffer)
+        else:
+            with Path(options["output"]).open("wb") as output:
+                self._write(chunks, output)
+
+    def _write(self, chunks, output) -> None:  # noqa: ANN001
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from features.bot import partitions
+
+
+class Command(BaseCommand):
+    """Create upcoming and detach expired partitions of the conversations table."""
+
+    help = "Create upcoming monthly partitions of the conversations table and detach (or drop) expired ones."
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=settings.BOT_CONVERSATION_PARTITION_PREMAKE_MONTHS,
+            help="Number of future months that must have a partition.",
+        )
+        parser.add_argument(
+            "--retention-months",
+            type=int,
+            default=settings.BOT_CONVERSATION_RETENTION_MONTHS,
+            help="Number of past months to keep. Older partitions are detached.",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            default=settings.BOT_CONVERSATION_PARTITION_DROP_EXPIRED,
+            help="Drop expired partitions instead of only detaching them.",
+        )
+        parser.add_argument("--list", action="store_true", help="Only list the partitions.")
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        if not partitions.is_partitioned():
+            raise CommandError("The conversations table is not partitioned. Run the migrations on PostgreSQL first.")
+
+        if not options["list"]:
+            for name in partitions.ensure_partitions(options["months_ahead"]):
+                self.stdout.write(f"created {name}")
+            if options["retention_months"] is not None:
+                for name in partitions.expire_partitions(options["retention_months"], drop=options["drop"]):
+                    self.stdout.write(f"{'dropped' if options['drop'] else 'detached'} {name}")
+
+        for partition in partitions.list_partitions():
+            self.stdout.write(
+                f"{partition.name:<32} {partition.lower or 'MINVALUE'} -> {partition.upper or 'MAXVALUE'}",
+            )
@@ -0,0 +1,22 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+conversation_buffer_depth = Gauge(
+    "bot_conversation_buffer_depth",
+    "Number of conversations waiting in the write-behind buffer.",
+    multiprocess_mode="mostrecent",
+)
+conversation_buffer_pending = Gauge(
+    "bot_conversation_buffer_pending",
+    "Number of buffered conversations delivered to a flush but not acknowledged yet.",
+    multiprocess_mode="mostrecent",
+)
+conversation_flush_lag_seconds = Histogram(
+    "bot_conversation_flush_lag_seconds",
+    "Time between buffering the oldest conversation of a flushed batch and writing it to the database.",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+conversation_flushed_total = Counter(
+    "bot_conversation_flushed_total",
+    "Number of buffered conversations processed by flushes.",
+    ["result"],
+)
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2025-02-03 09:12
+
+import utils.migrations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('bot', '0001_initial'),
+    ]
+
+    operations = [
+        utils.migrations.AddIndexConcurrentlyIfPostgres(
+            model_name='conversation',
+            index=models.Index(fields=['user_id', 'timestamp', 'id'], name='conversations_user_ts_idx'),
+        ),
+        utils.migrations.AddIndexConcurrentlyIfPostgres(
+            model_name='conversation',
+            index=models.Index(fields=['timestamp', 'id'], name='conversations_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Converts the conversations table into a table range-partitioned by month on "timestamp" (PostgreSQL only).
+#
+# The conversion is online: the existing table is not rewritten but attached as the `conversations_legacy`
+# partition, which holds every row older than the start of the month after next. Only the final swap
+# takes a short ACCESS EXCLUSIVE lock; the bound check and the (id, timestamp) unique index it needs are
+# validated and built beforehand without blocking writes. Later monthly partitions are created by
+# `features.bot.partitions.ensure_partitions`.
+
+from datetime import UTC, datetime
+
+from django.db import migrations, transaction
+
+PREMAKE_MONTHS = 3
+
+
+def month_start(moment, offset=0):
+    month = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=UTC)
+
+
+def partition_conversations(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('conversations')")
+        if cursor.fetchone()[0] == 'p':
+            return
+
+        boundary = month_start(datetime.now(UTC), 2)
+
+        # Prove every current and upcoming legacy row fits the legacy partition, so ATTACH skips its scan.
+        cursor.execute(
+            "ALTER TABLE conversations ADD CONSTRAINT conversations_legacy_bound "
+            "CHECK (\"timestamp\" IS NOT NULL AND \"timestamp\" < %s) NOT VALID",
+            [boundary],
+        )
+        cursor.execute('ALTER TABLE conversations VALIDATE CONSTRAINT conversations_legacy_bound')
+        # The primary key of a partitioned table must contain the partition key.
+        cursor.execute(
+            'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS conversations_legacy_id_ts ON conversations (id, "timestamp")',
+        )
+
+        with transaction.atomic(using=connection.alias):
+            # Fail fast instead of queueing every query behind a lock that waits on a long transaction.
+            cursor.execute("SET LOCAL lock_timeout = '5s'")
+            cursor.execute('LOCK TABLE conversations IN ACCESS EXCLUSIVE MODE')
+
+            # Move the id sequence from the legacy table to the partitioned table.
+            cursor.execute("SELECT pg_get_serial_sequence('conversations', 'id')")
+            (sequence,) = cursor.fetchone()
+            cursor.execute(f'SELECT GREATEST((SELECT last_value FROM {sequence}), (SELECT COALESCE(MAX(id), 0) FROM conversations))')
+            (last_id,) = cursor.fetchone()
+            cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = 'conversations'::regclass AND attname = 'id'")
+            if cursor.fetchone()[0]:
+                cursor.execute('ALTER TABLE conversations ALTER COLUMN id DROP IDENTITY')
+            else:
+                cursor.execute('ALTER TABLE conversations ALTER COLUMN id DROP DEFAULT')
+                cursor.execute(f'DROP SEQUENCE {sequence}')
+
+            cursor.execute('ALTER TABLE conversations RENAME TO conversations_legacy')
+            cursor.execute('ALTER INDEX conversations_pkey RENAME TO conversations_legacy_pkey')
+            cursor.execute('ALTER INDEX conversations_user_ts_idx RENAME TO conversations_legacy_user_ts_idx')
+            cursor.execute('ALTER INDEX conversations_ts_idx RENAME TO conversations_legacy_ts_idx')
+
+            cursor.execute('CREATE SEQUENCE conversations_id_seq AS bigint START WITH %s', [last_id + 1])
+            cursor.execute(
+                """
+                CREATE TABLE conversations (
+                    id bigint NOT NULL DEFAULT nextval('conversations_id_seq'),
+                    user_id varchar(255) NOT NULL,
+                    conversation_id varchar(255) NOT NULL,
+                    "timestamp" timestamp with time zone NOT NULL,
+                    CONSTRAINT conversations_pkey PRIMARY KEY (id, "timestamp")
+                ) PARTITION BY RANGE ("timestamp")
+                """,
+            )
+            cursor.execute('ALTER SEQUENCE conversations_id_seq OWNED BY conversations.id')
+            cursor.execute('CREATE INDEX conversations_user_ts_idx ON conversations (user_id, "timestamp", id)')
+            cursor.execute('CREATE INDEX conversations_ts_idx ON conversations ("timestamp", id)')
+
+            cursor.execute(
+                'ALTER TABLE conversations ATTACH PARTITION conversations_legacy FOR VALUES FROM (MINVALUE) TO (%s)',
+                [boundary],
+            )
+            cursor.execute('ALTER TABLE conversations_legacy DROP CONSTRAINT conversations_legacy_bound')
+
+            for offset in range(PREMAKE_MONTHS):
+                start = month_start(boundary, offset)
+                cursor.execute(
+                    f'CREATE TABLE conversations_p{start:%Y%m} PARTITION OF conversations FOR VALUES FROM (%s) TO (%s)',
+                    [start, month_start(start, 1)],
+                )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('bot', '0002_conversation_indexes'),
+    ]
+
+    operations = [
+        # Reversing keeps the partitioned table: it has the same columns and indexes as the model state.
+        migrations.RunPython(partition_conversations, migrations.RunPython.noop),
+    ]
@@ -4,7 +4,11 @@ from django.utils import timezone
 
 
 class Conversation(models.Model):
-    """Conversation model."""
+    """Conversation model.
+
+    On PostgreSQL the table is range-partitioned by month on `timestamp` (see `features.bot.partitions`),
+    so filter on `timestamp` whenever possible to let the planner skip the other partitions.
+    """
 
     user_id = models.CharField(max_length=255)
     conversation_id = models.CharField(max_length=255)
@@ -12,6 +16,10 @@ class Conversation(models.Model):
 
     class Meta:
         db_table = "conversations"
+        indexes = (
+            models.Index(fields=["user_id", "timestamp", "id"], name="conversations_user_ts_idx"),
+            models.Index(fields=["timestamp", "id"], name="conversations_ts_idx"),
+        )
 
     def __str__(self) -> str:
         """Return the string representation of the model."""
@@ -0,0 +1,151 @@
+"""Lifecycle of the monthly range partitions of the conversations table (PostgreSQL only).
+
+Migration `bot.0003_partition_conversations` turns `conversations` into a table partitioned by
+`timestamp`: the rows that existed before the migration live in the `conversations_legacy` partition and
+every later month gets a `conversations_pYYYYMM` partition. Month bounds are in UTC.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from django.db import connections
+from django.utils import timezone
+
+from features.bot.models import Conversation
+
+logger = logging.getLogger(__name__)
+
+_BOUND_PATTERN = re.compile(r"FROM \((?:MINVALUE|'(?P<lower>[^']+)')\) TO \((?:MAXVALUE|'(?P<upper>[^']+)')\)")
+
+
+@dataclass
+class Partition:
+    """A partition of the conversations table.
+
+    Attributes:
+        name (str): The table name of the partition.
+        lower (datetime | None): The inclusive lower bound, or None for MINVALUE.
+        upper (datetime | None): The exclusive upper bound, or None for MAXVALUE.
+        detach_pending (bool): Whether a concurrent detach of the partition was interrupted.
+    """
+
+    name: str
+    lower: datetime | None
+    upper: datetime | None
+    detach_pending: bool = False
+
+    def covers(self, moment: datetime) -> bool:
+        """Check whether a timestamp falls in the partition."""
+        return (self.lower is None or self.lower <= moment) and (self.upper is None or moment < self.upper)
+
+
+def month_start(moment: datetime, offset: int = 0) -> datetime:
+    """Get the first instant (UTC) of the month of `moment`, moved by `offset` months."""
+    month = moment.astimezone(UTC).year * 12 + moment.astimezone(UTC).month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=UTC)
+
+
+def partition_name(start: datetime) -> str:
+    """Get the table name of the monthly partition starting at `start`."""
+    return f"{Conversation._meta.db_table}_p{start:%Y%m}"
+
+
+def is_partitioned(using: str = "default") -> bool:
+    """Check whether the conversations table is a partitioned table."""
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [Conversation._meta.db_table])
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def list_partitions(using: str = "default") -> list[Partition]:
+    """List the partitions of the conversations table, oldest first."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), inherits.inhdetachpending
+            FROM pg_inherits AS inherits
+            JOIN pg_class AS child ON child.oid = inherits.inhrelid
+            WHERE inherits.inhparent = to_regclass(%s)
+            """,
+            [Conversation._meta.db_table],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound, detach_pending in rows:
+        match = _BOUND_PATTERN.search(bound)
+        if match is None:
+            continue
+        lower, upper = (datetime.fromisoformat(value) if value else None for value in match.group("lower", "upper"))
+        partitions.append(Partition(name, lower, upper, detach_pending))
+    return sorted(partitions, key=lambda partition: partition.lower or datetime.min.replace(tzinfo=UTC))
+
+
+def ensure_partitions(months_ahead: int, using: str = "default") -> list[str]:
+    """Create the monthly partitions of the current month and the next `months_ahead` months.
+
+    Args:
+        months_ahead (int): The number of future months that must have a partition.
+        using (str): The database alias.
+
+    Returns:
+        list[str]: The names of the created partitions.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    partitions = list_partitions(using)
+    now = timezone.now()
+    created = []
+    for offset in range(months_ahead + 1):
+        start = month_start(now, offset)
+        if any(partition.covers(start) for partition in partitions):
+            continue
+        name = partition_name(start)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote_name(name)} PARTITION OF {quote_name(Conversation._meta.db_table)} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                [start, month_start(start, 1)],
+            )
+        logger.info("Created conversation partition %s", name)
+        created.append(name)
+    return created
+
+
+def expire_partitions(retention_months: int, drop: bool = False, using: str = "default") -> list[str]:
+    """Detach (and optionally drop) the partitions older than the retention period.
+
+    A partition expires once all of its rows are older than the first day of the month `retention_months`
+    months ago. Partitions are detached with `DETACH PARTITION ... CONCURRENTLY`, which does not block
+    reads or writes on the other partitions; a detach that was interrupted is finalized.
+
+    Args:
+        retention_months (int): The number of past months to keep.
+        drop (bool): Drop the detached tables instead of keeping them for archiving.
+        using (str): The database alias.
+
+    Returns:
+        list[str]: The names of the detached partitions.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    table = quote_name(Conversation._meta.db_table)
+    cutoff = month_start(timezone.now(), -retention_months)
+    expired = []
+    for partition in list_partitions(using):
+        if partition.upper is None or partition.upper > cutoff:
+            continue
+        with connection.cursor() as cursor:
+            mode = "FINALIZE" if partition.detach_pending else "CONCURRENTLY"
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {quote_name(partition.name)} {mode}")
+            if drop:
+                cursor.execute(f"DROP TABLE {quote_name(partition.name)}")
+        logger.info("Detached conversation partition %s", partition.name)
+        expired.append(partition.name)
+    return expired
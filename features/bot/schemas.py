@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from ninja import Field, Schema
+
+
+class CreateConversationSchema(Schema):
+    """Schema for one item of a conversation batch."""
+
+    user_id: str = Field(max_length=255)
+    conversation_id: str = Field(max_length=255)
+    timestamp: datetime | None = None
+
+
+class GetConversationResponseSchema(Schema):
+    """Schema for conversation response."""
+
+    user_id: str
+    conversation_id: str
+    timestamp: datetime
+
+
+class ConversationBatchItemResultSchema(Schema):
+    """Schema for the result of one item of a conversation batch."""
+
+    index: int
+    status: str
+    errors: list[str] | None = None
+
+
+class ConversationBatchResponseSchema(Schema):
+    """Schema for conversation batch response."""
+
+    created: int
+    failed: int
+    results: list[ConversationBatchItemResultSchema]
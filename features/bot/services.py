@@ -0,0 +1,148 @@
+import json
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from pydantic import ValidationError
+
+from common.exceptions import Http400BadRequestException
+from features.bot.models import Conversation
+from features.bot.partitions import month_start
+from features.bot.schemas import CreateConversationSchema
+from utils.pgcopy import copy_models
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+
+class _InvalidItemError(Exception):
+    """Raised for a batch item that could not be decoded."""
+
+
+def parse_conversation_batch(body: bytes, content_type: str) -> list[Any]:
+    """Decode a conversation batch request body.
+
+    The body is either a JSON array or NDJSON (one JSON object per line). An NDJSON line that
+    cannot be decoded is kept as an `_InvalidItemError` so it is reported for its own index.
+
+    Args:
+        body (bytes): The raw request body.
+        content_type (str): The request content type.
+
+    Raises:
+        Http400BadRequestException: The body is not a JSON array or is larger than allowed.
+
+    Returns:
+        list[Any]: The decoded items.
+    """
+    if content_type in NDJSON_CONTENT_TYPES:
+        items = list(_iter_ndjson(body))
+    else:
+        try:
+            items = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise Http400BadRequestException("request body is not valid JSON") from e
+        if not isinstance(items, list):
+            raise Http400BadRequestException("request body must be a JSON array")
+
+    if len(items) > settings.BOT_CONVERSATION_BATCH_MAX_ITEMS:
+        raise Http400BadRequestException(
+            f"batch is limited to {settings.BOT_CONVERSATION_BATCH_MAX_ITEMS} items",
+        )
+    return items
+
+
+def _iter_ndjson(body: bytes) -> Iterator[Any]:
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield _InvalidItemError(f"invalid JSON: {e.msg}")
+
+
+def timestamp_bounds(now: datetime) -> tuple[datetime | None, datetime]:
+    """Get the range of conversation timestamps the conversations table accepts.
+
+    On PostgreSQL a row must fall in a partition: the last month before the retention period (older
+    partitions are detached) up to the premade months, the current one included. Past that, the insert
+    would fail the whole batch.
+
+    Args:
+        now (datetime): The current time.
+
+    Returns:
+        tuple[datetime | None, datetime]: The inclusive lower bound, None without retention, and the
+            exclusive upper bound.
+    """
+    retention = settings.BOT_CONVERSATION_RETENTION_MONTHS
+    lower = month_start(now, -retention) if retention is not None else None
+    # Until the maintenance task runs in a new month, only the premade months of the last one have a partition.
+    return lower, month_start(now, max(settings.BOT_CONVERSATION_PARTITION_PREMAKE_MONTHS, 1))
+
+
+def validate_conversation_batch(items: list[Any]) -> tuple[list[Conversation], list[dict]]:
+    """Validate decoded batch items in one pass.
+
+    Items with a timestamp outside of `timestamp_bounds` are invalid.
+
+    Args:
+        items (list[Any]): The decoded items.
+
+    Returns:
+        tuple[list[Conversation], list[dict]]: The conversations to write and the per-item results.
+    """
+    now = timezone.now()
+    lower, upper = timestamp_bounds(now)
+    conversations = []
+    results = []
+    for index, item in enumerate(items):
+        if isinstance(item, _InvalidItemError):
+            results.append({"index": index, "status": "invalid", "errors": [str(item)]})
+            continue
+        try:
+            data = CreateConversationSchema.model_validate(item)
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(loc) for loc in error['loc']) or 'item'}: {error['msg']}" for error in e.errors()]
+            results.append({"index": index, "status": "invalid", "errors": errors})
+            continue
+        timestamp = data.timestamp or now
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        if (lower is not None and timestamp < lower) or timestamp >= upper:
+            since = f"from {lower.isoformat()} " if lower is not None else ""
+            error = f"timestamp: must be {since}before {upper.isoformat()}"
+            results.append({"index": index, "status": "invalid", "errors": [error]})
+            continue
+        conversations.append(
+            Conversation(
+                user_id=data.user_id,
+                conversation_id=data.conversation_id,
+                timestamp=timestamp,
+            ),
+        )
+        results.append({"index": index, "status": "created"})
+    return conversations, results
+
+
+def write_conversations(conversations: list[Conversation]) -> int:
+    """Write conversations in one transaction.
+
+    PostgreSQL uses `COPY`, other databases fall back to chunked `bulk_create`.
+
+    Args:
+        conversations (list[Conversation]): The conversations to write.
+
+    Returns:
+        int: The number of rows written.
+    """
+    if not conversations:
+        return 0
+    with transaction.atomic():
+        if connection.vendor == "postgresql" and settings.BOT_CONVERSATION_BATCH_USE_COPY:
+            return copy_models(Conversation, conversations)
+        Conversation.objects.bulk_create(conversations, batch_size=settings.BOT_CONVERSATION_BATCH_SIZE)
+    return len(conversations)
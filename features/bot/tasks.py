@@ -0,0 +1,24 @@
+from celery import shared_task
+from django.conf import settings
+
+from features.bot import partitions
+from features.bot.buffer import flush_conversation_buffer as _flush_conversation_buffer
+
+
+@shared_task(ignore_result=True)
+def flush_conversation_buffer() -> int:
+    """Drain the conversation write-behind buffer into the database. Scheduled by celery beat."""
+    return _flush_conversation_buffer()
+
+
+@shared_task(ignore_result=True)
+def maintain_conversation_partitions() -> None:
+    """Create upcoming conversation partitions and detach expired ones. Scheduled by celery beat."""
+    if not partitions.is_partitioned():
+        return
+    partitions.ensure_partitions(settings.BOT_CONVERSATION_PARTITION_PREMAKE_MONTHS)
+    if settings.BOT_CONVERSATION_RETENTION_MONTHS is not None:
+        partitions.expire_partitions(
+            settings.BOT_CONVERSATION_RETENTION_MONTHS,
+            drop=settings.BOT_CONVERSATION_PARTITION_DROP_EXPIRED,
+        )
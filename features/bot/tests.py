@@ -1,3 +1,145 @@
-from django.test import TestCase
+import gzip
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from redis.exceptions import LockNotOwnedError, ResponseError
+
+from features.bot.buffer import flush_conversation_buffer
+from features.bot.models import Conversation
+from utils.pagination import encode_cursor
+
+
+class ConversationBatchTest(TestCase):
+    """Tests for the conversation batch endpoint."""
+
+    url = "/api/bot/conversations/batch"
+
+    def test_create_json_array(self) -> None:
+        """A JSON array is written in full."""
+        items = [{"user_id": "u1", "conversation_id": str(i)} for i in range(3)]
+        response = self.client.post(self.url, json.dumps(items), "application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 3)
+        self.assertEqual(Conversation.objects.filter(user_id="u1").count(), 3)
+
+    def test_create_ndjson_reports_invalid_items(self) -> None:
+        """Invalid NDJSON lines are reported by index and valid ones are written."""
+        body = "\n".join(
+            [
+                json.dumps({"user_id": "u1", "conversation_id": "1"}),
+                "{not json",
+                json.dumps({"user_id": "u1"}),
+            ],
+        )
+        response = self.client.post(self.url, body, "application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["created"], data["failed"]), (1, 2))
+        self.assertEqual([result["status"] for result in data["results"]], ["created", "invalid", "invalid"])
+
+    @override_settings(BOT_CONVERSATION_RETENTION_MONTHS=1)
+    def test_reject_timestamps_outside_partitions(self) -> None:
+        """Items with a timestamp no partition covers are reported by index and the others are written."""
+        now = timezone.now()
+        items = [
+            {"user_id": "u1", "conversation_id": "0", "timestamp": (now - timedelta(days=90)).isoformat()},
+            {"user_id": "u1", "conversation_id": "1", "timestamp": now.isoformat()},
+            {"user_id": "u1", "conversation_id": "2", "timestamp": (now + timedelta(days=3650)).isoformat()},
+        ]
+        response = self.client.post(self.url, json.dumps(items), "application/json")
+        self.assertEqual(response.status_code, 200)
+        statuses = [result["status"] for result in response.json()["results"]]
+        self.assertEqual(statuses, ["invalid", "created", "invalid"])
+        self.assertEqual(Conversation.objects.filter(user_id="u1").count(), 1)
+
+    def test_reject_non_array(self) -> None:
+        """A JSON body that is not an array is rejected."""
+        response = self.client.post(self.url, json.dumps({"user_id": "u1"}), "application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class ConversationListTest(TestCase):
+    """Tests for the conversation list endpoint."""
+
+    url = "/api/bot/conversations"
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Create conversations of two users."""
+        now = timezone.now()
+        Conversation.objects.bulk_create(
+            [Conversation(user_id="u1", conversation_id=str(i), timestamp=now - timedelta(minutes=i)) for i in range(5)]
+            + [Conversation(user_id="u2", conversation_id="0", timestamp=now)],
+        )
+
+    def test_pages_follow_cursor(self) -> None:
+        """Following the cursor walks every row once, newest first."""
+        seen = []
+        cursor = None
+        while True:
+            params = {"user_id": "u1", "limit": 2} | ({"cursor": cursor} if cursor else {})
+            data = self.client.get(self.url, params).json()
+            seen += [item["conversation_id"] for item in data["items"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, ["0", "1", "2", "3", "4"])
+
+    def test_reject_invalid_cursor(self) -> None:
+        """A malformed cursor is rejected."""
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reject_cursor_with_invalid_values(self) -> None:
+        """A well-formed cursor with values that are not valid for the ordering fields is rejected."""
+        for values in (["not-a-date", 1], [timezone.now(), "not-an-id"], [timezone.now(), [1]], [None, 1]):
+            response = self.client.get(self.url, {"cursor": encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+
+    def test_export_streams_ndjson(self) -> None:
+        """The export streams every matching conversation, oldest first."""
+        response = self.client.get(f"{self.url}/export", {"user_id": "u1"})
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["conversation_id"] for line in lines], ["4", "3", "2", "1", "0"])
+
+    def test_export_gzip_csv(self) -> None:
+        """A gzipped CSV export decompresses to a header and one line per conversation."""
+        response = self.client.get(f"{self.url}/export", {"format": "csv", "gzip": True})
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode("utf-8").splitlines()
+        self.assertEqual(lines[0], "id,user_id,conversation_id,timestamp")
+        self.assertEqual(len(lines), 7)
+
+
+class FlushConversationBufferTest(TestCase):
+    """Tests for the error handling of `flush_conversation_buffer`, over a mocked Redis client."""
+
+    def setUp(self) -> None:
+        """Mock a Redis client whose flush lock expired."""
+        self.client = mock.MagicMock()
+        self.client.lock.return_value.acquire.return_value = True
+        self.client.lock.return_value.release.side_effect = LockNotOwnedError("expired")
+        self.client.xautoclaim.return_value = (b"0-0", [], [])
+        self.client.xreadgroup.return_value = []
+        self.client.xlen.return_value = 0
+        self.client.xpending.return_value = {"pending": 0}
+        patcher = mock.patch("features.bot.buffer.get_redis_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_expired_lock(self) -> None:
+        """A flush whose lock expired still succeeds."""
+        self.assertEqual(flush_conversation_buffer(), 0)
+        self.client.lock.return_value.release.assert_called_once()
+
+    def test_original_error_is_raised(self) -> None:
+        """The error of a failed flush is not hidden by the stats of a missing consumer group."""
+        self.client.xgroup_create.side_effect = ResponseError("READONLY")
+        self.client.xpending.side_effect = ResponseError("NOGROUP")
+        with self.assertRaisesMessage(ResponseError, "READONLY"):
+            flush_conversation_buffer()
+        self.client.lock.return_value.release.assert_called_once()
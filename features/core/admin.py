@@ -4,8 +4,17 @@ from django.contrib import admin
 from django.contrib.auth import admin as auth_admin
 from django.utils.translation import gettext_lazy as _
 
+from common.admin import BaseAdmin
 from features.core.forms import UserAdminChangeForm, UserAdminCreationForm
-from features.core.models import User
+from features.core.models import Company, User
+
+
+@admin.register(Company)
+class CompanyAdmin(BaseAdmin):
+    """Company admin class."""
+
+    list_display: ClassVar = ["name", "created_at"]
+    search_fields: ClassVar = ["name"]
 
 
 @admin.register(User)
@@ -16,7 +25,7 @@ class UserAdmin(auth_admin.UserAdmin):
     add_form = UserAdminCreationForm
     fieldsets = (
         (None, {"fields": ("email", "password")}),
-        (_("Personal info"), {"fields": ("name",)}),
+        (_("Personal info"), {"fields": ("name", "company")}),
         (
             _("Permissions"),
             {
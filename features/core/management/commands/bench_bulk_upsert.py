@@ -0,0 +1,58 @@
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+
+from features.core.models import User
+from utils.benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    """Benchmark `bulk_create(update_conflicts=True)` against the COPY-based `bulk_upsert`."""
+
+    help = (
+        "Compare rows/sec of upserting users (half new, half existing) with `bulk_create(update_conflicts=True)` "
+        "and with `BaseModelManager.bulk_upsert`, which uses COPY on PostgreSQL and falls back to "
+        "`bulk_create` elsewhere."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument("--rows", type=int, default=100000, help="Number of rows per upsert.")
+        parser.add_argument("--repeat", type=int, default=3, help="Number of upserts per path.")
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        rows = options["rows"]
+        repeat = options["repeat"]
+
+        # Every row is written in a transaction that is rolled back at the end.
+        with transaction.atomic():
+            owner = User.objects.create_user(email=f"bench-{uuid4()}@example.com")
+
+            def users() -> list[User]:
+                # Half of the rows already exist, so the upsert inserts one half and updates the other.
+                prefix = uuid4().hex
+                emails = [f"bench-{prefix}-{i}@example.com" for i in range(rows)]
+                User.objects.bulk_create([User(email=email, name="bench") for email in emails[: rows // 2]], user=owner)
+                return [User(email=email, name="updated") for email in emails]
+
+            def bulk_create(objs: list[User]) -> int:
+                User.objects.bulk_create(
+                    objs,
+                    update_conflicts=True,
+                    unique_fields=["email"],
+                    update_fields=["name", "updated_at", "updated_by_user"],
+                    user=owner,
+                )
+                return len(objs)
+
+            def bulk_upsert(objs: list[User]) -> int:
+                return User.objects.bulk_upsert(objs, ["email"], ["name"], user=owner)
+
+            results = []
+            for name, upsert in (("bulk_create(update_conflicts)", bulk_create), ("bulk_upsert", bulk_upsert)):
+                batches = iter([users() for _ in range(repeat)])
+                results.append(run_benchmark(name, lambda upsert=upsert: upsert(next(batches)), repeat))
+            transaction.set_rollback(True)
+
+        for result in results:
+            self.stdout.write(result.summary())
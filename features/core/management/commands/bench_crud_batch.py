@@ -0,0 +1,82 @@
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+
+from features.core.models import User
+from utils.benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    """Benchmark single-object writes against the batch writes of generated CRUD controllers."""
+
+    help = (
+        "Compare the throughput of N single `save`/`delete` calls with one `bulk_create`, `bulk_update` and "
+        "soft-delete UPDATE, the database work of the /batch routes of generated CRUD controllers."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument("--rows", type=int, default=1000, help="Number of objects per batch.")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of batches per measurement.")
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, C901, D102
+        rows = options["rows"]
+        repeat = options["repeat"]
+
+        # Every row is written in a transaction that is rolled back at the end.
+        with transaction.atomic():
+            owner = User.objects.create_user(email=f"bench-{uuid4()}@example.com")
+
+            def new_users() -> list[User]:
+                return [User(email=f"bench-{uuid4()}@example.com") for _ in range(rows)]
+
+            def single_create() -> int:
+                for user in new_users():
+                    with transaction.atomic():
+                        user.save(owner)
+                return rows
+
+            def batch_create() -> int:
+                with transaction.atomic():
+                    User.objects.bulk_create(new_users(), user=owner)
+                return rows
+
+            def single_update() -> int:
+                for user in User.objects.filter(created_by_user=owner)[:rows]:
+                    user.name = "single"
+                    with transaction.atomic():
+                        user.save(owner)
+                return rows
+
+            def batch_update() -> int:
+                users = list(User.objects.filter(created_by_user=owner)[:rows])
+                for user in users:
+                    user.name = "batch"
+                with transaction.atomic():
+                    User.objects.bulk_update(users, ["name"], user=owner)
+                return rows
+
+            def single_delete() -> int:
+                for user in User.objects.filter(created_by_user=owner)[:rows]:
+                    with transaction.atomic():
+                        user.delete(owner)
+                return rows
+
+            def batch_delete() -> int:
+                pks = list(User.objects.filter(created_by_user=owner).values_list("pk", flat=True)[:rows])
+                with transaction.atomic():
+                    User.objects.filter(pk__in=pks).soft_delete(owner)
+                return rows
+
+            results = [
+                run_benchmark(f"single create x{rows}", single_create, repeat),
+                run_benchmark(f"batch create ({rows})", batch_create, repeat),
+                run_benchmark(f"single update x{rows}", single_update, repeat),
+                run_benchmark(f"batch update ({rows})", batch_update, repeat),
+                run_benchmark(f"single delete x{rows}", single_delete, repeat),
+                run_benchmark(f"batch delete ({rows})", batch_delete, repeat),
+            ]
+            transaction.set_rollback(True)
+
+        for result in results:
+            self.stdout.write(result.summary())
@@ -0,0 +1,68 @@
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+
+from features.core.models import Company, User
+from utils.benchmark import run_benchmark
+from utils.pagination import encode_cursor, keyset_paginate
+
+
+class Command(BaseCommand):
+    """Benchmark the unbounded CRUD list query against a keyset-paginated page."""
+
+    help = (
+        "Compare memory and latency of the unbounded `get_all` query of generated CRUD controllers with one "
+        "keyset-paginated page, as the number of rows of a company grows."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument(
+            "--rows",
+            type=lambda value: [int(rows) for rows in value.split(",")],
+            default=[1000, 10000, 50000],
+            help="Comma-separated row counts to measure.",
+        )
+        parser.add_argument("--limit", type=int, default=50, help="Page size.")
+        parser.add_argument("--repeat", type=int, default=20, help="Number of calls per measurement.")
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        limit = options["limit"]
+        repeat = options["repeat"]
+
+        # Every row is written in a transaction that is rolled back at the end.
+        with transaction.atomic():
+            company = Company.objects.create(name="bench")
+            queryset = User.objects.for_tenant(company).values()
+            created = 0
+            for rows in sorted(options["rows"]):
+                User.objects.bulk_create(
+                    [User(email=f"bench-{uuid4()}@example.com", company=company) for _ in range(rows - created)],
+                    batch_size=1000,
+                )
+                created = rows
+                middle = User.objects.for_tenant(company).order_by("id").values_list("id")[rows // 2]
+
+                results = [
+                    run_benchmark(
+                        f"unbounded ({rows} rows)",
+                        lambda: len(list(queryset.all())),
+                        repeat,
+                        trace_memory=True,
+                    ),
+                    run_benchmark(
+                        f"first page ({rows} rows)",
+                        lambda: len(keyset_paginate(queryset, ("id",), limit)[0]),
+                        repeat,
+                        trace_memory=True,
+                    ),
+                    run_benchmark(
+                        f"middle page ({rows} rows)",
+                        lambda cursor=encode_cursor(middle): len(keyset_paginate(queryset, ("id",), limit, cursor)[0]),
+                        repeat,
+                        trace_memory=True,
+                    ),
+                ]
+                for result in results:
+                    self.stdout.write(result.summary())
+            transaction.set_rollback(True)
@@ -0,0 +1,72 @@
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from features.core.models import Company, User
+from utils.benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    """Benchmark the load-then-save writes of generated CRUD controllers against single-statement writes."""
+
+    help = (
+        "Compare round trips and latency of `update`/`delete` of generated CRUD controllers (tenant-scoped "
+        "SELECT, full-row save) with `single_statement_writes` (one tenant-scoped UPDATE)."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument("--rows", type=int, default=1000, help="Number of writes per measurement.")
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        rows = options["rows"]
+
+        # Every row is written in a transaction that is rolled back at the end.
+        with transaction.atomic():
+            company = Company.objects.create(name="bench")
+            owner = User.objects.create_user(email=f"bench-{uuid4()}@example.com", company=company)
+            users = User.objects.bulk_create(
+                [User(email=f"bench-{uuid4()}@example.com", company=company) for _ in range(rows * 2)],
+                user=owner,
+            )
+            pks = iter([user.pk for user in users])
+            scope = {"company_id": company.pk}
+
+            def load_update() -> int:
+                user = User.objects.for_tenant(company).get(pk=next(pks))
+                user.name = "updated"
+                user.save(owner)
+                return 1
+
+            def single_statement_update() -> int:
+                return User.objects.scoped_update(next(pks), {"name": "updated"}, owner, scope)
+
+            def load_delete() -> int:
+                user = User.objects.for_tenant(company).get(pk=next(pks))
+                user.delete(owner)
+                return 1
+
+            def single_statement_delete() -> int:
+                return User.objects.for_tenant(company).filter(pk=next(pks)).soft_delete(owner)
+
+            lines = []
+            for name, func in (
+                ("load-then-save update", load_update),
+                ("single-statement update", single_statement_update),
+            ):
+                with CaptureQueriesContext(connection) as queries:
+                    result = run_benchmark(name, func, rows)
+                lines.append(f"{result.summary()} queries/call={len(queries) / rows:.1f}")
+            pks = iter([user.pk for user in users])
+            for name, func in (
+                ("load-then-save delete", load_delete),
+                ("single-statement delete", single_statement_delete),
+            ):
+                with CaptureQueriesContext(connection) as queries:
+                    result = run_benchmark(name, func, rows)
+                lines.append(f"{result.summary()} queries/call={len(queries) / rows:.1f}")
+            transaction.set_rollback(True)
+
+        for line in lines:
+            self.stdout.write(line)
@@ -0,0 +1,61 @@
+import copy
+
+from django.core import signals
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connections
+
+from utils.benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    """Benchmark the request latency of new, persistent and pooled PostgreSQL connections."""
+
+    help = (
+        "Compare the latency of simulated requests (request_started, one query, request_finished) with a new "
+        "connection per request, persistent connections (CONN_MAX_AGE) and the psycopg pool, against the "
+        "PostgreSQL server of the `default` database."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument("--requests", type=int, default=1000, help="Number of requests per configuration.")
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        default = connections.settings["default"]
+        if default["ENGINE"] != "django.db.backends.postgresql":
+            raise CommandError("Set DATABASE_HOST to benchmark against PostgreSQL.")
+
+        results = []
+        for name, conn_max_age, pool in (
+            ("new connection per request", 0, None),
+            ("persistent (CONN_MAX_AGE)", 600, None),
+            ("psycopg pool", 0, {"min_size": 1, "max_size": 1}),
+        ):
+            alias = f"bench_{conn_max_age}_{bool(pool)}"
+            config = copy.deepcopy(default)
+            config["CONN_MAX_AGE"] = conn_max_age
+            config["OPTIONS"] = {key: value for key, value in config["OPTIONS"].items() if key != "pool"}
+            if pool:
+                config["OPTIONS"]["pool"] = pool
+            connections.settings[alias] = config
+            connection = connections[alias]
+
+            def request(connection=connection) -> int:  # noqa: ANN001
+                # The request cycle of Django: connections are closed, kept or returned to the pool when the
+                # request finishes, depending on CONN_MAX_AGE and the pool.
+                signals.request_started.send(sender=self.__class__)
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                signals.request_finished.send(sender=self.__class__)
+                return 1
+
+            try:
+                request()  # Warm up: open the persistent connection or the pool.
+                results.append(run_benchmark(name, request, options["requests"]))
+            finally:
+                connection.close()
+                if pool:
+                    connection.close_pool()
+
+        for result in results:
+            self.stdout.write(result.summary())
@@ -0,0 +1,61 @@
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from features.core.models import User
+from utils.benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    """Benchmark full-row saves against the dirty-field saves of `BaseModel`."""
+
+    help = (
+        "Compare the UPDATE size and throughput of saving a one-field change to users with every column "
+        "written (ExtraMeta.track_changes = False) and with only the changed fields written."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument("--rows", type=int, default=1000, help="Number of saves per measurement.")
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        rows = options["rows"]
+        track_changes = User.ExtraMeta.track_changes
+
+        # Every row is written in a transaction that is rolled back at the end.
+        with transaction.atomic():
+            owner = User.objects.create_user(email=f"bench-{uuid4()}@example.com")
+            User.objects.bulk_create(
+                [User(email=f"bench-{uuid4()}@example.com", password="x" * 100) for _ in range(rows)],
+                user=owner,
+            )
+            lines = []
+            try:
+                for name, tracked, change in (
+                    ("full-row save", False, True),
+                    ("dirty-field save", True, True),
+                    ("dirty-field save, no change", True, False),
+                ):
+                    User.ExtraMeta.track_changes = tracked
+                    users = iter(list(User.objects.filter(created_by_user=owner)))
+
+                    def save(change: bool = change) -> int:
+                        user = next(users)
+                        if change:
+                            user.name = uuid4().hex
+                        user.save(owner)
+                        return 1
+
+                    with CaptureQueriesContext(connection) as queries:
+                        result = run_benchmark(name, save, rows)
+                    sql_bytes = sum(len(query["sql"]) for query in queries)
+                    lines.append(
+                        f"{result.summary()} updates={len(queries)} bytes/update={sql_bytes / max(len(queries), 1):.0f}",
+                    )
+            finally:
+                User.ExtraMeta.track_changes = track_changes
+            transaction.set_rollback(True)
+
+        for line in lines:
+            self.stdout.write(line)
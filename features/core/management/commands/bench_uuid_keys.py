@@ -0,0 +1,61 @@
+from collections.abc import Callable
+from uuid import UUID, uuid4
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+
+from utils.benchmark import run_benchmark
+from utils.identifiers import uuid7
+
+
+class Command(BaseCommand):
+    """Benchmark uuid4 primary keys against time-ordered uuid7 primary keys on PostgreSQL."""
+
+    help = (
+        "Compare insert throughput and primary key index size of a table keyed by uuid4 (the former "
+        "`BaseModel.id` default) and one keyed by uuid7. The tables are regular (WAL-logged) tables, "
+        "dropped afterwards."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:  # noqa: D102
+        parser.add_argument("--rows", type=int, default=500000, help="Number of rows inserted per key type.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of rows per INSERT.")
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        if connection.vendor != "postgresql":
+            raise CommandError("This benchmark measures PostgreSQL B-tree indexes. Point the settings at PostgreSQL.")
+
+        rows = options["rows"]
+        batch_size = options["batch_size"]
+        lines = []
+        for name, generate in (("uuid4", uuid4), ("uuid7", uuid7)):
+            result, index_size = self._measure(name, generate, rows, batch_size)
+            lines.append(f"{result.summary()} index={index_size / 1024 / 1024:8.2f}MiB")
+
+        for line in lines:
+            self.stdout.write(line)
+
+    def _measure(self, name: str, generate: Callable[[], UUID], rows: int, batch_size: int) -> tuple:
+        table = f"bench_{name}_keys"
+        with connection.cursor() as cursor:
+            # Not TEMPORARY: temporary tables skip the WAL, a large part of the cost of random index inserts.
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(
+                f"CREATE TABLE {table} (id uuid PRIMARY KEY, created_at timestamptz NOT NULL DEFAULT now())",
+            )
+            try:
+                placeholders = ", ".join(["(%s)"] * batch_size)
+
+                def insert() -> int:
+                    cursor.execute(
+                        f"INSERT INTO {table} (id) VALUES {placeholders}",  # noqa: S608
+                        [generate() for _ in range(batch_size)],
+                    )
+                    return batch_size
+
+                result = run_benchmark(f"{name} insert", insert, max(rows // batch_size, 1))
+                cursor.execute("SELECT pg_relation_size(%s)", [f"{table}_pkey"])
+                index_size = cursor.fetchone()[0]
+            finally:
+                cursor.execute(f"DROP TABLE {table}")
+        return result, index_size
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from common.profiling import PROFILE_HEADER, sign_profile_header
+
+
+class Command(BaseCommand):
+    """Print a signed `X-Profile` header that makes the server profile a request."""
+
+    help = (
+        "Print a signed `X-Profile` header, valid for PROFILER_HEADER_MAX_AGE seconds. Requests sending it are "
+        "profiled and their profile is kept whatever their latency; the response names it in `X-Profile`."
+    )
+
+    def handle(self, *args, **options) -> None:  # noqa: ANN002, ANN003, ARG002, D102
+        self.stdout.write(f"{PROFILE_HEADER}: {sign_profile_header()}")
+        self.stderr.write(f"Valid for {settings.PROFILER_HEADER_MAX_AGE} seconds.")
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:08
+
+import utils.migrations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        utils.migrations.AddIndexConcurrentlyIfPostgres(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_by_user', 'id'], name='core_user_created_1c6a81_nd'),
+        ),
+    ]
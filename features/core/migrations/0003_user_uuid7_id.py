@@ -0,0 +1,28 @@
+# Switches the default of User.id to the time-ordered `utils.identifiers.uuid7`.
+#
+# The default is applied by Django, not by the database, so only the migration state changes: the column
+# and the existing uuid4 keys stay as they are and no table is rewritten (SQLite would otherwise rebuild
+# it). New rows get UUIDv7 keys, which sort by creation time and land on a narrow, hot range of leaf
+# pages of the primary key index instead of random ones. Re-keying existing rows is not needed and not done.
+
+import utils.identifiers
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_user_live_rows_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='user',
+                    name='id',
+                    field=models.UUIDField(default=utils.identifiers.uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+            ],
+        ),
+    ]
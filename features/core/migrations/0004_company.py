@@ -0,0 +1,62 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:15
+
+import django.db.models.deletion
+import utils.identifiers
+import utils.migrations
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0003_user_uuid7_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Company',
+            fields=[
+                ('id', models.UUIDField(default=utils.identifiers.uuid7, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('deleted_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='core_user_created_1c6a81_nd',
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='created_by_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='%(class)s_created_by_user', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='deleted_by_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='%(class)s_deleted_by_user', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='updated_by_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='%(class)s_updated_by_user', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='company',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='core.company'),
+        ),
+        utils.migrations.AddIndexConcurrentlyIfPostgres(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['company', 'id'], name='core_user_company_88d346_nd'),
+        ),
+    ]
@@ -10,6 +10,27 @@ from features.core.managers import UserManager
 from utils.storage import get_model_file_path
 
 
+class Company(BaseModel):
+    """Company model representing a tenant of the application.
+
+    Every `BaseModel` row belongs to a company through its `company` foreign key, and tenant-scoped queries
+    go through `BaseModelManager.for_tenant`.
+
+    Attributes:
+        name (CharField): The name of the company.
+    """
+
+    # A company is the tenant itself.
+    company = None
+    name = models.CharField(
+        max_length=255,
+    )
+
+    def __str__(self) -> str:
+        """Get the name of the company."""
+        return self.name
+
+
 class User(AbstractUser, BaseModel):
     """Custom user model representing a user in the application.
 
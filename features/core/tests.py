@@ -0,0 +1,536 @@
+import json
+import queue
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime
+from unittest import mock
+from uuid import UUID, uuid4
+
+from django.core.cache import caches
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from ninja import Schema
+from ninja_extra import NinjaExtraAPI
+
+from common.cache import cache_key
+from common.models import BaseModel
+from common.routers import read_from_replicas
+from features.core.models import Company, User
+from utils.cache_backends import TwoTierRedisCache
+from utils.controller import generate_crud_controller
+from utils.test import create_basic_controller_test
+
+
+class CreateUserSchema(Schema):
+    """Create schema of the user controllers under test."""
+
+    name: str
+    email: str
+
+
+class PutUserSchema(Schema):
+    """Update schema of the user controllers under test."""
+
+    name: str = ""
+    email: str
+
+
+class GetUserResponseSchema(Schema):
+    """Response schema of the user controllers under test."""
+
+    id: UUID
+    name: str
+    email: str
+    updated_at: datetime
+
+
+# The project registers no generated CRUD controller: the tests mount a sync and an async one on users.
+api = NinjaExtraAPI(urls_namespace="core_tests")
+api.register_controllers(
+    generate_crud_controller(User, "User", "core/users", sys.modules[__name__]),
+    generate_crud_controller(User, "User", "core/async-users", sys.modules[__name__], use_async=True),
+    generate_crud_controller(User, "User", "core/users-1", sys.modules[__name__], single_statement_writes=True),
+    generate_crud_controller(
+        User,
+        "User",
+        "core/async-users-1",
+        sys.modules[__name__],
+        use_async=True,
+        single_statement_writes=True,
+    ),
+)
+urlpatterns = [path("api/", api.urls)]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class UserControllerTest(create_basic_controller_test(User, "core/users", fields=("name", "email"))):
+    """Tests for a generated CRUD controller."""
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncUserControllerTest(create_basic_controller_test(User, "core/async-users", fields=("name", "email"))):
+    """Tests for a generated async CRUD controller."""
+
+
+def create_user(**kwargs) -> User:  # noqa: ANN003
+    """Create a user with a unique email."""
+    return User.objects.create_user(email=f"test-{uuid4().hex}@example.com", **kwargs)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class SingleStatementUpdateTest(TestCase):
+    """Tests for the `update` route of controllers with `single_statement_writes`."""
+
+    def test_update_writes_submitted_fields(self) -> None:
+        """Only the submitted fields are written, not the defaults of the others."""
+        company = Company.objects.create(name="test")
+        self.client.force_login(create_user(company=company))
+        for url in ("/api/core/users-1", "/api/core/async-users-1"):
+            user = create_user(name="kept", company=company)
+            email = f"test-{uuid4().hex}@example.com"
+            response = self.client.put(f"{url}/{user.pk}", {"email": email}, "application/json")
+            self.assertEqual(response.status_code, 200)
+            user.refresh_from_db()
+            self.assertEqual((user.name, user.email), ("kept", email))
+
+
+class DirtyFieldsTest(TestCase):
+    """Tests for the dirty-field saves of `BaseModel`."""
+
+    def test_save_writes_changed_fields(self) -> None:
+        """Only the changed fields and the audit columns are written."""
+        user = User.objects.get(pk=create_user().pk)
+        user.name = "changed"
+        self.assertEqual(user.get_dirty_fields(), ["name"])
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"name"', queries[0]["sql"])
+        self.assertNotIn('"email"', queries[0]["sql"])
+        self.assertEqual(user.get_dirty_fields(), [])
+        self.assertEqual(User.objects.get(pk=user.pk).name, "changed")
+
+    def test_save_skips_unchanged_object(self) -> None:
+        """Saving an unchanged object runs no query."""
+        user = User.objects.get(pk=create_user().pk)
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(len(queries), 0)
+
+
+class SoftDeleteTest(TestCase):
+    """Tests for the soft delete and restore of `BaseModelQuerySet`."""
+
+    def test_round_trip(self) -> None:
+        """Soft-deleted objects are hidden and stamped, and restored ones are back as they were."""
+        owner = create_user()
+        users = [create_user() for _ in range(3)]
+        pks = [user.pk for user in users]
+
+        self.assertEqual(User.objects.filter(pk__in=pks).soft_delete(owner, batch_size=2), 3)
+        self.assertFalse(User.objects.filter(pk__in=pks).exists())
+        deleted = User.objects.deleted_only().filter(pk__in=pks)
+        self.assertEqual(deleted.count(), 3)
+        self.assertTrue(all(user.deleted_by_user_id == owner.pk and user.deleted_at for user in deleted))
+
+        self.assertEqual(User.objects.deleted_only().filter(pk__in=pks).restore(owner), 3)
+        restored = User.objects.filter(pk__in=pks)
+        self.assertEqual(restored.count(), 3)
+        self.assertTrue(all(user.deleted_by_user_id is None and user.deleted_at is None for user in restored))
+
+
+class BulkUpsertTest(TestCase):
+    """Tests for `BaseModelManager.bulk_upsert` on a database without COPY (the `bulk_create` fallback)."""
+
+    def test_inserts_and_updates(self) -> None:
+        """New objects are inserted and conflicting ones update the existing rows, which keep their id."""
+        owner = create_user()
+        existing = create_user(name="old")
+        new_email = f"test-{uuid4().hex}@example.com"
+
+        User.objects.bulk_upsert(
+            [User(email=existing.email, name="updated"), User(email=new_email, name="new")],
+            ["email"],
+            ["name"],
+            user=owner,
+        )
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.name, "updated")
+        self.assertEqual(existing.updated_by_user_id, owner.pk)
+        created = User.objects.get(email=new_email)
+        self.assertEqual((created.name, created.created_by_user_id), ("new", owner.pk))
+
+
+class TenantTest(TestCase):
+    """Tests for `BaseModelQuerySet.for_tenant`."""
+
+    def test_isolation(self) -> None:
+        """A tenant only sees its own rows, and no company is no tenant."""
+        company, other = Company.objects.create(name="a"), Company.objects.create(name="b")
+        user = create_user(company=company)
+        create_user(company=other)
+        create_user()
+
+        self.assertEqual(list(User.objects.for_tenant(company)), [user])
+        self.assertEqual(list(User.objects.for_tenant(str(company.pk))), [user])
+        with self.assertRaises(ValueError):
+            User.objects.for_tenant(None)
+
+
+# A replica mirroring the test database, as `DATABASE_REPLICA_HOSTS` adds on PostgreSQL. It must exist before the
+# test databases are set up, and it is only used by the tests that set `DATABASE_REPLICAS`.
+connections.settings.setdefault("replica_0", {**connections.settings["default"], "TEST": {"MIRROR": "default"}})
+
+
+@override_settings(DATABASE_REPLICAS=["replica_0"])
+class ReplicaWriteTest(TransactionTestCase):
+    """Tests for the writes of `BaseModel` managers inside `read_from_replicas()`, with a fresh replica."""
+
+    databases = frozenset({"default", "replica_0"})
+
+    def setUp(self) -> None:
+        """Report the replica as fresh."""
+        patcher = mock.patch("common.routers._is_fresh", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assert_no_replica_write(self, write: Callable[[], object]) -> None:
+        """Run a write inside a replica scope and check no statement reached the replica."""
+        with read_from_replicas(), CaptureQueriesContext(connections["replica_0"]) as queries:
+            write()
+        self.assertEqual([query["sql"] for query in queries], [])
+
+    def test_soft_delete_and_restore(self) -> None:
+        """Soft delete and restore update the primary."""
+        user = create_user()
+        with read_from_replicas():
+            self.assertEqual(User.objects.db, "replica_0")
+        self.assert_no_replica_write(lambda: User.objects.filter(pk=user.pk).soft_delete(user))
+        self.assertTrue(User.objects.deleted_only().filter(pk=user.pk).exists())
+        self.assert_no_replica_write(lambda: User.objects.deleted_only().filter(pk=user.pk).restore(user))
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
+
+    def test_bulk_writes_in_one_primary_transaction(self) -> None:
+        """`bulk_create` and `bulk_update` write every chunk in one transaction of the primary."""
+
+        def users(objs: list[User]) -> Iterator[User]:
+            for user in objs:
+                self.assertTrue(connections["default"].in_atomic_block)
+                yield user
+
+        created = [User(email=f"test-{uuid4().hex}@example.com") for _ in range(3)]
+        self.assert_no_replica_write(lambda: User.objects.bulk_create(users(created), batch_size=2))
+        for user in created:
+            user.name = "updated"
+        self.assert_no_replica_write(lambda: User.objects.bulk_update(users(created), ["name"], batch_size=2))
+        self.assertEqual(User.objects.filter(name="updated").count(), 3)
+
+    def test_bulk_upsert(self) -> None:
+        """`bulk_upsert` writes to the primary."""
+        existing = create_user(name="old")
+        self.assert_no_replica_write(
+            lambda: User.objects.bulk_upsert([User(email=existing.email, name="new")], ["email"], ["name"]),
+        )
+        existing.refresh_from_db()
+        self.assertEqual(existing.name, "new")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "object-cache"}},
+)
+class ObjectCacheTest(TransactionTestCase):
+    """Tests for the object cache of `common.cache`. Not a `TestCase`: nothing is cached inside a transaction."""
+
+    def setUp(self) -> None:
+        """Opt users in to the object cache."""
+        patcher = mock.patch.object(BaseModel.ExtraMeta, "cache_enabled", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = caches["default"]
+        self.cache.clear()
+        self.user = create_user(name="old")
+        self.key = cache_key(User, self.user.pk)
+
+    def test_save_invalidates(self) -> None:
+        """A save drops the cached object, and the next read sees the new value."""
+        user = User.objects.get_cached(self.user.pk)
+        self.assertIsNotNone(self.cache.get(self.key))
+        user.name = "new"
+        user.save()
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertEqual(User.objects.get_cached(self.user.pk).name, "new")
+
+    def test_bulk_update_invalidates(self) -> None:
+        """`bulk_update` drops the cached objects it writes."""
+        user = User.objects.get_cached(self.user.pk)
+        user.name = "new"
+        User.objects.bulk_update([user], ["name"])
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertEqual(User.objects.get_cached(self.user.pk).name, "new")
+
+    def test_soft_delete_invalidates(self) -> None:
+        """A soft-deleted object is no longer served from the cache."""
+        User.objects.get_cached(self.user.pk)
+        User.objects.filter(pk=self.user.pk).soft_delete()
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_cached(self.user.pk)
+
+    def test_atomic_write(self) -> None:
+        """Inside a transaction reads bypass the cache, and the written object is dropped again on commit."""
+        User.objects.get_cached(self.user.pk)
+        with transaction.atomic():
+            user = User.objects.get(pk=self.user.pk)
+            user.name = "new"
+            user.save()
+            self.assertEqual(User.objects.get_cached(self.user.pk).name, "new")
+            self.assertIsNone(self.cache.get(self.key))
+            # A stale value written back by another process before the commit.
+            self.cache.set(self.key, User.objects.get(pk=self.user.pk))
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertEqual(User.objects.get_cached(self.user.pk).name, "new")
+
+
+class FakeRedis:
+    """The part of a Redis client `TwoTierRedisCache` uses, in memory, with a hook run after reads."""
+
+    def __init__(self) -> None:  # noqa: D107
+        self.data: dict[str, bytes] = {}
+        # Monotonic expiry time of the keys with a lifetime.
+        self.expiries: dict[str, float] = {}
+        self.reads = 0
+        self.after_read: Callable[[], object] | None = None
+        self.published: list[dict] = []
+        self.subscribers: list[queue.Queue] = []
+
+    def get(self, key: str) -> bytes | None:  # noqa: D102
+        return self.mget([key])[0]
+
+    def mget(self, keys: list[str]) -> list[bytes | None]:  # noqa: D102
+        self.reads += 1
+        for key in keys:
+            if self.expiries.get(key, float("inf")) <= time.monotonic():
+                self.delete(key)
+        values = [self.data.get(key) for key in keys]
+        if self.after_read is not None:
+            self.after_read()
+        return values
+
+    def pttl(self, key: str) -> int:  # noqa: D102
+        if key not in self.data:
+            return -2
+        if key not in self.expiries:
+            return -1
+        return max(int((self.expiries[key] - time.monotonic()) * 1000), 0)
+
+    def set(self, key: str, value: bytes, ex: float | None = None, **kwargs) -> bool:  # noqa: ANN003, ARG002, D102
+        self.data[key] = value
+        self.expiries.pop(key, None)
+        if ex is not None:
+            self.expiries[key] = time.monotonic() + ex
+        return True
+
+    def delete(self, *keys: str) -> int:  # noqa: D102
+        for key in keys:
+            self.expiries.pop(key, None)
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, **kwargs) -> "FakePipeline":  # noqa: ANN003, ARG002, D102
+        return FakePipeline(self)
+
+    def publish(self, channel: str, message: str) -> None:  # noqa: ARG002, D102
+        self.published.append(json.loads(message))
+        for subscriber in self.subscribers:
+            subscriber.put({"type": "message", "data": message})
+
+    def pubsub(self, **kwargs) -> "FakeRedis":  # noqa: ANN003, ARG002, D102
+        return self
+
+    def subscribe(self, channel: str) -> None:  # noqa: D102
+        pass
+
+    def listen(self) -> Iterator[dict]:  # noqa: D102
+        messages: queue.Queue = queue.Queue()
+        self.subscribers.append(messages)
+        while True:
+            yield messages.get()
+
+
+class FakePipeline:
+    """A pipeline of `FakeRedis`, which runs the queued commands on `execute`."""
+
+    def __init__(self, redis: FakeRedis) -> None:  # noqa: D107
+        self.redis = redis
+        self.commands: list[Callable[[], object]] = []
+
+    def __getattr__(self, name: str) -> Callable[..., None]:  # noqa: D105
+        method = getattr(self.redis, name)
+        return lambda *args, **kwargs: self.commands.append(lambda: method(*args, **kwargs))
+
+    def execute(self) -> list:  # noqa: D102
+        return [command() for command in self.commands]
+
+
+class TwoTierRedisCacheTest(SimpleTestCase):
+    """Tests for `TwoTierRedisCache` over an in-memory Redis client."""
+
+    def create_cache(self, **options) -> TwoTierRedisCache:  # noqa: ANN003
+        """Create a cache with its own L1, whose invalidation listener is subscribed."""
+        # The L1 is per Redis location: a new one gives the test a new L1.
+        cache = TwoTierRedisCache(f"redis://test-{uuid4().hex}", {"OPTIONS": options})
+        self.redis = FakeRedis()
+        cache._cache.get_client = lambda *args, **kwargs: self.redis  # noqa: ARG005
+        self.tier = cache._tier()
+        self.wait_for(lambda: self.tier.subscribed and self.redis.subscribers)
+        return cache
+
+    def wait_for(self, condition: Callable[[], object]) -> None:
+        """Wait for a condition made true by another thread."""
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.001)
+
+    def test_l1_hit(self) -> None:
+        """A value read from Redis is then served from L1."""
+        cache = self.create_cache()
+        cache.set("a", 1)
+        self.assertEqual([cache.get("a"), cache.get("a")], [1, 1])
+        self.assertEqual(cache.get_many(["a"]), {"a": 1})
+        self.assertEqual(self.redis.reads, 1)
+
+    def test_lru_eviction(self) -> None:
+        """The least recently used entry is evicted past `L1_MAX_ENTRIES`."""
+        cache = self.create_cache(L1_MAX_ENTRIES=2)
+        for key in "abc":
+            cache.set(key, key)
+        cache.get("a")
+        cache.get("b")
+        cache.get("a")
+        cache.get("c")
+        self.assertEqual(self.redis.reads, 3)
+        cache.get("a")
+        self.assertEqual(self.redis.reads, 3)
+        cache.get("b")
+        self.assertEqual(self.redis.reads, 4)
+
+    def test_l1_expiry(self) -> None:
+        """An L1 entry is read from Redis again after `L1_TIMEOUT`."""
+        cache = self.create_cache(L1_TIMEOUT=0.05)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("a")
+        self.assertEqual(self.redis.reads, 1)
+        time.sleep(0.1)
+        cache.get("a")
+        self.assertEqual(self.redis.reads, 2)
+
+    def test_invalidated_read_is_not_cached(self) -> None:
+        """A value read from Redis before its key is written does not fill L1."""
+        cache = self.create_cache()
+        cache.set("a", 1)
+        cache.set("b", 1)
+        self.redis.after_read = lambda: cache.set("a", 2)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get_many(["b", "a"]), {"a": 2, "b": 1})
+        self.redis.after_read = None
+        self.assertEqual(cache.get_many(["a", "b"]), {"a": 2, "b": 1})
+        self.assertEqual(self.redis.reads, 3)
+
+    def test_unrelated_invalidation_keeps_read(self) -> None:
+        """A write of another key does not reject a concurrent read."""
+        cache = self.create_cache()
+        cache.set("a", 1)
+        cache.set("b", 1)
+        self.redis.after_read = lambda: cache.delete("c")
+        cache.get("a")
+        cache.get_many(["b"])
+        self.redis.after_read = None
+        cache.get_many(["a", "b"])
+        self.assertEqual(self.redis.reads, 2)
+
+    def test_singleflight(self) -> None:
+        """Concurrent misses of a key in a process make one Redis read."""
+        cache = self.create_cache()
+        cache.set("a", 1)
+        release = threading.Event()
+        self.redis.after_read = release.wait
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("a"))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        self.wait_for(lambda: self.redis.reads)
+        # Let the other threads join the read in flight.
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(self.redis.reads, 1)
+
+    def test_write_skips_read_in_flight(self) -> None:
+        """A thread reading a key it just wrote does not get the result of a read started before the write."""
+        cache = self.create_cache()
+        cache.set("a", 1)
+        release = threading.Event()
+        reader = threading.Thread(target=cache.get, args=("a",))
+        self.redis.after_read = lambda: threading.current_thread() is reader and release.wait()
+        reader.start()
+        self.wait_for(lambda: self.redis.reads)
+        cache.set("a", 2)
+        # Let the read in flight finish while this thread would be waiting for it.
+        threading.Timer(0.05, release.set).start()
+        self.assertEqual(cache.get("a"), 2)
+        reader.join()
+        self.assertEqual(cache.get("a"), 2)
+
+    def test_l1_expiry_follows_redis(self) -> None:
+        """An L1 entry does not outlive its Redis key."""
+        cache = self.create_cache(L1_TIMEOUT=60)
+        key = cache.make_and_validate_key("a")
+        cache.set("a", 1)
+        self.redis.expiries[key] = time.monotonic() + 0.05
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(self.redis.reads, 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(self.redis.reads, 2)
+
+    def test_invalidation_broadcast(self) -> None:
+        """A write is published to the other processes, and their writes drop the keys from L1."""
+        cache = self.create_cache()
+        cache.set("a", 1)
+        key = cache.make_and_validate_key("a")
+        self.assertEqual(self.redis.published, [{"origin": self.tier.origin, "keys": [key]}])
+        cache.get("a")
+        self.assertIsNotNone(self.tier.get(key))
+
+        self.redis.publish("cache-invalidation", json.dumps({"origin": "other", "keys": [key]}))
+        self.wait_for(lambda: self.tier.get(key) is None)
+        cache.get("a")
+        self.assertEqual(self.redis.reads, 2)
+
+
+class MetricsViewTest(TestCase):
+    """Tests for the `/metrics` endpoint."""
+
+    @override_settings(METRICS_TOKEN="")
+    def test_no_token(self) -> None:
+        """Without a token the endpoint does not exist, except with `DEBUG`."""
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="secret")  # noqa: S106
+    def test_token(self) -> None:
+        """The scraper must send the token."""
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code, 401)
+        response = self.client.get("/metrics", headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"http_request_duration_seconds", response.content)
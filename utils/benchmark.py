@@ -0,0 +1,90 @@
+import math
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+
+@dataclass
+class BenchmarkResult:
+    """Timings collected by a benchmark run.
+
+    Attributes:
+        name (str): The name of the benchmark.
+        durations (list[float]): The duration of every measured call, in seconds.
+        items (int): The number of items processed by all calls.
+        elapsed (float): The wall-clock time of the whole run, in seconds.
+        peak_memory (int | None): The peak Python memory allocated by a single call, in bytes, or None if
+            memory was not traced.
+    """
+
+    name: str
+    durations: list[float] = field(default_factory=list)
+    items: int = 0
+    elapsed: float = 0.0
+    peak_memory: int | None = None
+
+    def percentile(self, q: float) -> float:
+        """Get the q-th percentile (0-100) of call durations, in seconds."""
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        index = max(math.ceil(q / 100 * len(ordered)) - 1, 0)
+        return ordered[index]
+
+    @property
+    def items_per_second(self) -> float:
+        """Get the throughput of the run in items per second."""
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def calls_per_second(self) -> float:
+        """Get the throughput of the run in calls per second."""
+        return len(self.durations) / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        """Format the result as a single report line."""
+        line = (
+            f"{self.name:<32} calls={len(self.durations):<7} items={self.items:<9} "
+            f"elapsed={self.elapsed:8.3f}s items/s={self.items_per_second:12.1f} "
+            f"calls/s={self.calls_per_second:10.1f} "
+            f"p50={self.percentile(50) * 1000:8.2f}ms p99={self.percentile(99) * 1000:8.2f}ms"
+        )
+        if self.peak_memory is not None:
+            line += f" peak={self.peak_memory / 1024 / 1024:8.2f}MiB"
+        return line
+
+
+def run_benchmark(name: str, func: Callable[[], int], repeat: int, trace_memory: bool = False) -> BenchmarkResult:
+    """Call `func` `repeat` times and collect its timings.
+
+    Args:
+        name (str): The name of the benchmark.
+        func (Callable[[], int]): The function to measure, returning the number of items it processed.
+        repeat (int): The number of calls.
+        trace_memory (bool): Also record the peak memory of a call with `tracemalloc`. Tracing slows every
+            allocation down, so timings of traced runs are only comparable with each other.
+
+    Returns:
+        BenchmarkResult: The collected timings.
+    """
+    result = BenchmarkResult(name)
+    if trace_memory:
+        tracemalloc.start()
+        result.peak_memory = 0
+    try:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            if trace_memory:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+            call_started = time.perf_counter()
+            result.items += func()
+            result.durations.append(time.perf_counter() - call_started)
+            if trace_memory:
+                result.peak_memory = max(result.peak_memory, tracemalloc.get_traced_memory()[1] - baseline)
+        result.elapsed = time.perf_counter() - started
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return result
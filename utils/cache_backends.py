@@ -0,0 +1,298 @@
+"""Two-tier cache backend: a per-process LRU (L1) in front of Django's Redis cache (L2).
+
+Reads are served from L1 while its entry is fresh, so hot keys cost no network round trip. Every write of
+a process (`set`, `add`, `delete`, `incr`, ... and `clear`) drops the keys from its own L1 and is broadcast
+over Redis pub/sub so the other processes (uvicorn and celery workers) drop them too. L1 entries also
+expire after `L1_TIMEOUT` seconds, which bounds staleness if an invalidation message is lost, or when the
+Redis key expires if that is sooner. Concurrent misses of the same key in a process are coalesced: one thread
+reads Redis and the others wait for its result (singleflight), unless the key was written since the read
+started.
+
+Settings, in the `OPTIONS` of the cache next to the options of `RedisCache`:
+
+- `L1_MAX_ENTRIES`: max number of entries of the LRU of a process (default 10000).
+- `L1_TIMEOUT`: max lifetime in seconds of an L1 entry (default 5).
+- `INVALIDATION_CHANNEL`: the pub/sub channel (default `cache-invalidation`).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from uuid import uuid4
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+cache_requests_total = Counter(
+    "cache_requests_total",
+    "Number of two-tier cache lookups by tier and result. The L1 hit ratio is l1 hits over l1 lookups, "
+    "the L2 hit ratio is l2 hits over l2 lookups (the L1 misses).",
+    ["tier", "result"],
+)
+
+_FLUSH = "*"
+# Number of generation counters of an L1: an invalidation only rejects the concurrent reads of its buckets.
+_GENERATION_BUCKETS = 1024
+# Seconds a thread waits for the Redis read of another thread before reading the key itself.
+_FLIGHT_WAIT = 5.0
+
+
+class _Flight:
+    """One in-flight Redis read of a key, awaited by the other threads missing the same key."""
+
+    def __init__(self, generation: int) -> None:
+        self.done = threading.Event()
+        self.value: bytes | None = None
+        # The generation of the key when the read started: a later write makes the result stale.
+        self.generation = generation
+
+
+class _LocalTier:
+    """The L1 of a process, shared by the cache instances of all its threads.
+
+    Django creates one cache instance per thread, so the LRU, the in-flight reads and the pub/sub listener
+    live here, once per process and Redis location.
+    """
+
+    def __init__(self, max_entries: int, timeout: float) -> None:
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.origin = uuid4().hex
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.flights: dict[str, _Flight] = {}
+        self.listener: threading.Thread | None = None
+        # L1 is only filled while the listener is subscribed, else invalidations could be missed.
+        self.subscribed = False
+        # Bumped by the invalidation of a key of the bucket: a value read from Redis before it is not put in L1.
+        self.generations = [0] * _GENERATION_BUCKETS
+
+    def generation(self, key: str) -> int:
+        return self.generations[hash(key) % _GENERATION_BUCKETS]
+
+    def get(self, key: str) -> bytes | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, value: bytes, generation: int, ttl: float | None) -> None:
+        with self.lock:
+            if not self.subscribed or generation != self.generation(key):
+                return
+            timeout = self.timeout if ttl is None else min(self.timeout, ttl)
+            self.entries[key] = (time.monotonic() + timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def drop(self, keys: list[str]) -> None:
+        with self.lock:
+            if _FLUSH in keys:
+                self.generations = [generation + 1 for generation in self.generations]
+                self.entries.clear()
+                return
+            for key in keys:
+                self.generations[hash(key) % _GENERATION_BUCKETS] += 1
+                self.entries.pop(key, None)
+
+
+# The L1 of this process by (pid, Redis location, channel). The pid drops tiers inherited through fork.
+_tiers: dict[tuple[int, str, str], _LocalTier] = {}
+_tiers_lock = threading.Lock()
+
+
+class TwoTierRedisCache(RedisCache):
+    """Redis cache with a per-process LRU in front, invalidated over Redis pub/sub."""
+
+    def __init__(self, server: str | list[str], params: dict[str, Any]) -> None:  # noqa: D107
+        options = dict(params.get("OPTIONS", {}))
+        self._l1_max_entries = options.pop("L1_MAX_ENTRIES", 10000)
+        self._l1_timeout = options.pop("L1_TIMEOUT", 5)
+        self._channel = options.pop("INVALIDATION_CHANNEL", "cache-invalidation")
+        super().__init__(server, {**params, "OPTIONS": options})
+        self._location = ";".join(self._servers)
+
+    def get(self, key: str, default: Any = None, version: int | None = None) -> Any:  # noqa: ANN401, D102
+        key = self.make_and_validate_key(key, version=version)
+        value = self._get_raw(key)
+        return default if value is None else self._cache._serializer.loads(value)
+
+    def get_many(self, keys: list[str], version: int | None = None) -> dict[str, Any]:  # noqa: D102
+        tier = self._tier()
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = {}
+        missing = []
+        for key in key_map:
+            if (value := tier.get(key)) is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        self._count("l1", len(found), len(missing))
+        if missing:
+            generations = [tier.generation(key) for key in missing]
+            values, ttls = self._read(self._cache.get_client(None), missing)
+            hits = 0
+            for key, generation, value, ttl in zip(missing, generations, values, ttls, strict=True):
+                if value is not None:
+                    tier.put(key, value, generation, ttl)
+                    found[key] = value
+                    hits += 1
+            self._count("l2", hits, len(missing) - hits)
+        return {key_map[key]: self._cache._serializer.loads(value) for key, value in found.items()}
+
+    def has_key(self, key: str, version: int | None = None) -> bool:  # noqa: D102
+        key = self.make_and_validate_key(key, version=version)
+        return self._tier().get(key) is not None or self._cache.has_key(key)
+
+    def add(self, key: str, value: Any, timeout: float | None = DEFAULT_TIMEOUT, version: int | None = None) -> bool:  # noqa: ANN401, D102
+        added = super().add(key, value, timeout, version)
+        if added:
+            self._invalidate([self.make_and_validate_key(key, version=version)])
+        return added
+
+    def set(self, key: str, value: Any, timeout: float | None = DEFAULT_TIMEOUT, version: int | None = None) -> None:  # noqa: ANN401, D102
+        super().set(key, value, timeout, version)
+        self._invalidate([self.make_and_validate_key(key, version=version)])
+
+    def touch(self, key: str, timeout: float | None = DEFAULT_TIMEOUT, version: int | None = None) -> bool:  # noqa: D102
+        touched = super().touch(key, timeout, version)
+        # A new lifetime leaves the value as it is, except a zero one, which deletes the key.
+        if self.get_backend_timeout(timeout) == 0:
+            self._invalidate([self.make_and_validate_key(key, version=version)])
+        return touched
+
+    def delete(self, key: str, version: int | None = None) -> bool:  # noqa: D102
+        deleted = super().delete(key, version)
+        self._invalidate([self.make_and_validate_key(key, version=version)])
+        return deleted
+
+    def incr(self, key: str, delta: int = 1, version: int | None = None) -> int:  # noqa: D102
+        value = super().incr(key, delta, version)
+        self._invalidate([self.make_and_validate_key(key, version=version)])
+        return value
+
+    def set_many(  # noqa: D102
+        self,
+        data: dict[str, Any],
+        timeout: float | None = DEFAULT_TIMEOUT,
+        version: int | None = None,
+    ) -> list:
+        failed = super().set_many(data, timeout, version)
+        self._invalidate([self.make_and_validate_key(key, version=version) for key in data])
+        return failed
+
+    def delete_many(self, keys: list[str], version: int | None = None) -> None:  # noqa: D102
+        super().delete_many(keys, version)
+        self._invalidate([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def clear(self) -> bool:  # noqa: D102
+        cleared = super().clear()
+        self._invalidate([_FLUSH])
+        return cleared
+
+    def _get_raw(self, key: str) -> bytes | None:
+        tier = self._tier()
+        if (value := tier.get(key)) is not None:
+            self._count("l1", 1, 0)
+            return value
+        self._count("l1", 0, 1)
+
+        with tier.lock:
+            generation = tier.generation(key)
+            flight = tier.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = tier.flights[key] = _Flight(generation)
+        if not leader:
+            # Another thread of this process is reading the key from Redis: wait for its result, unless the
+            # key was written since that read started, e.g. by this thread, which must read its own write.
+            if flight.generation == generation and flight.done.wait(timeout=_FLIGHT_WAIT):
+                return flight.value
+            return self._cache.get_client(key).get(key)
+
+        try:
+            (value,), (ttl,) = self._read(self._cache.get_client(key), [key])
+            self._count("l2", value is not None, value is None)
+            if value is not None:
+                tier.put(key, value, generation, ttl)
+            flight.value = value
+        finally:
+            with tier.lock:
+                del tier.flights[key]
+            flight.done.set()
+        return value
+
+    def _read(self, client: Any, keys: list[str]) -> tuple[list[bytes | None], list[float | None]]:  # noqa: ANN401
+        """Read keys and their remaining lifetime in seconds (None for no expiry) in one round trip."""
+        pipeline = client.pipeline(transaction=False)
+        pipeline.mget(keys)
+        for key in keys:
+            pipeline.pttl(key)
+        values, *ttls = pipeline.execute()
+        return values, [ttl / 1000 if ttl >= 0 else None for ttl in ttls]
+
+    def _invalidate(self, keys: list[str]) -> None:
+        tier = self._tier()
+        tier.drop(keys)
+        message = json.dumps({"origin": tier.origin, "keys": keys})
+        try:
+            self._cache.get_client(None, write=True).publish(self._channel, message)
+        except self._cache._lib.RedisError:
+            logger.warning("Could not broadcast the invalidation of %d cache keys", len(keys), exc_info=True)
+
+    def _tier(self) -> _LocalTier:
+        tier_key = (os.getpid(), self._location, self._channel)
+        if (tier := _tiers.get(tier_key)) is not None:
+            return tier
+        with _tiers_lock:
+            if (tier := _tiers.get(tier_key)) is None:
+                tier = _tiers[tier_key] = _LocalTier(self._l1_max_entries, self._l1_timeout)
+                tier.listener = threading.Thread(
+                    target=self._listen,
+                    args=(tier,),
+                    name=f"cache-invalidation-{self._channel}",
+                    daemon=True,
+                )
+                tier.listener.start()
+        return tier
+
+    def _listen(self, tier: _LocalTier) -> None:
+        """Drop the keys invalidated by the other processes from the L1 of this one, for the process lifetime."""
+        while True:
+            try:
+                pubsub = self._cache.get_client(None).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                # Invalidations published while the listener was not subscribed are lost.
+                tier.drop([_FLUSH])
+                tier.subscribed = True
+                for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload["origin"] != tier.origin:
+                        tier.drop(payload["keys"])
+            except Exception:
+                logger.warning("Cache invalidation listener disconnected, retrying", exc_info=True)
+                # L1 stays empty until the listener is subscribed again.
+                tier.subscribed = False
+                tier.drop([_FLUSH])
+                time.sleep(1)
+
+    def _count(self, tier: str, hits: int, misses: int) -> None:
+        if hits:
+            cache_requests_total.labels(tier=tier, result="hit").inc(hits)
+        if misses:
+            cache_requests_total.labels(tier=tier, result="miss").inc(misses)
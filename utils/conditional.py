@@ -0,0 +1,65 @@
+import hashlib
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def has_conditional_headers(request: HttpRequest) -> bool:
+    """Check whether a request is a conditional GET worth a cheap validator query before the full one."""
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def make_etag(*parts: Any) -> str:  # noqa: ANN401
+    """Build a strong ETag from the values a representation depends on."""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode("utf-8"), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def page_validators(rows: Sequence[dict[str, Any]], *parts: Any) -> tuple[str, datetime | None]:  # noqa: ANN401
+    """Get the ETag and Last-Modified of a page of a list from the `id` and `updated_at` of its rows.
+
+    They are computed from the page already fetched, so a conditional request costs no extra query. Any
+    update, deletion or insertion within the range of the page changes its ids or `updated_at` values.
+
+    Args:
+        rows (Sequence[dict[str, Any]]): The `values()` rows of the page, with their `id` and `updated_at`.
+        *parts (Any): The other values the representation depends on (page size, cursors, fields...).
+
+    Returns:
+        tuple[str, datetime | None]: The ETag and the Last-Modified time, None for an empty page.
+    """
+    last_modified = max((row["updated_at"] for row in rows), default=None)
+    return make_etag(*parts, *(f"{row['id']}@{row['updated_at'].isoformat()}" for row in rows)), last_modified
+
+
+def conditional_response(request: HttpRequest, etag: str, last_modified: datetime | None) -> HttpResponse | None:
+    """Answer a conditional GET whose `If-None-Match` or `If-Modified-Since` still matches.
+
+    Args:
+        request (HttpRequest): The request.
+        etag (str): The current ETag of the resource.
+        last_modified (datetime | None): The current Last-Modified time of the resource.
+
+    Returns:
+        HttpResponse | None: A 304 response, or None if the resource has to be sent.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response: HttpResponse, etag: str, last_modified: datetime | None) -> HttpResponse:
+    """Set the ETag and Last-Modified headers of a response."""
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
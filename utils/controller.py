@@ -1,20 +1,52 @@
+from collections.abc import Sequence
 from types import ModuleType
+from typing import Any, NoReturn
 from uuid import UUID
 
+from asgiref.sync import sync_to_async
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.contrib.auth.models import AnonymousUser
+from django.core.handlers.asgi import ASGIRequest
 from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import QuerySet
 from django.db.utils import IntegrityError
+from ninja import Body
 from ninja_extra import ControllerBase, api_controller, route
 
+from common.cache import is_cached
 from common.exceptions import Http400BadRequestException, Http403ForbiddenException, Http404NotFoundException
 from common.models import BaseModel
-from common.schemas import BaseResponseSchema, Http401UnauthorizedSchema, Http404NotFoundSchema
+from common.schemas import (
+    BaseResponseSchema,
+    BatchDeleteSchema,
+    BatchResponseSchema,
+    CursorPageSchema,
+    Http400BadRequestSchema,
+    Http401UnauthorizedSchema,
+    Http404NotFoundSchema,
+)
+from utils.conditional import (
+    conditional_response,
+    has_conditional_headers,
+    make_etag,
+    page_validators,
+    set_validators,
+)
+from utils.crud_batch import batch_create, batch_delete, batch_update
+from utils.pagination import akeyset_paginate, keyset_paginate, resolve_limit
+from utils.projection import parse_fields, projected_page_response, projected_response, values_fields
 
 
-def generate_crud_controller(  # noqa: C901
+def generate_crud_controller(  # noqa: C901, PLR0913
     model: type[BaseModel],
     model_name: str,
     controller_prefix: str,
     application_schemas: ModuleType,
+    use_async: bool = False,
+    *,
+    ordering: Sequence[str] = ("id",),
+    max_page_size: int | None = None,
+    single_statement_writes: bool = False,
 ) -> type[ControllerBase]:
     """Generate a CRUD controller for a model.
 
@@ -23,7 +55,42 @@ def generate_crud_controller(  # noqa: C901
         model_name (str): The name of the model.
         controller_prefix (str): The prefix for the controller.
         application_schemas (ModuleType): The module containing the application schemas.
+        use_async (bool): Generate `async def` routes on Django's async ORM. Under ASGI they run on the
+            event loop instead of going through the `sync_to_async` thread pool.
+        ordering (Sequence[str]): The keyset ordering of `get_all`. It must end with a unique field and
+            should be backed by an index. Defaults to the primary key.
+        max_page_size (int | None): The hard max page size of `get_all`. Defaults to
+            `settings.PAGINATION_MAX_LIMIT`.
+        single_statement_writes (bool): Run `update` and `delete` as one
+            `UPDATE ... WHERE id AND company_id AND NOT is_deleted` writing only the submitted fields, instead
+            of loading the object of the company and saving every column. Model overrides of `save` and
+            `delete` are then not called.
+
+    `get` and `get_all` accept a comma-separated `fields=` query parameter (sparse fieldset): only those
+    columns are selected and the response is serialized with a schema trimmed to them.
+
+    `get` and `get_all` send an ETag and a Last-Modified derived from `updated_at` (the ids and `updated_at`
+    of the rows of the fetched page for `get_all`) and answer 304 when `If-None-Match` or `If-Modified-Since`
+    still matches.
+
+    Every route is scoped to the company of the user in SQL (`for_tenant`): objects of other companies are
+    never loaded, and users of no company are refused with 403. Models with `ExtraMeta.cache_enabled` are
+    read through the object cache of `common.cache` and checked in Python instead.
+
+    `POST`, `PUT` and `DELETE` on `/batch` create, update and soft delete many objects in one transaction
+    (`bulk_create`, `bulk_update` and a single UPDATE) and report the result of every item by index.
     """
+    get_schema = getattr(application_schemas, f"Get{model_name}ResponseSchema")
+    if use_async:
+        return _generate_async_crud_controller(
+            model,
+            model_name,
+            controller_prefix,
+            application_schemas,
+            ordering,
+            max_page_size,
+            single_statement_writes,
+        )
 
     @api_controller(
         prefix_or_class=controller_prefix,
@@ -44,7 +111,7 @@ def generate_crud_controller(  # noqa: C901
             request: WSGIRequest,
             body: getattr(application_schemas, f"Create{model_name}Schema"),  # type: ignore
         ) -> BaseModel:
-            q = self.Model(**body.dict())
+            q = self.Model(**body.dict(), company_id=_tenant_of(request.user))  # type: ignore
 
             try:
                 q.save(request.user)
@@ -56,15 +123,84 @@ def generate_crud_controller(  # noqa: C901
         @route.get(
             "",
             response={
-                200: list[getattr(application_schemas, f"Get{model_name}ResponseSchema")],
+                200: CursorPageSchema[getattr(application_schemas, f"Get{model_name}ResponseSchema")],
+                400: Http400BadRequestSchema,
                 401: Http401UnauthorizedSchema,
             },
         )
         def get_all(
             self,
             request: WSGIRequest,
-        ) -> list[BaseModel]:
-            return self.Model.objects.filter(created_by_user=request.user).values()  # type: ignore
+            limit: int | None = None,
+            cursor: str | None = None,
+            fields: str | None = None,
+        ) -> dict:
+            projection = parse_fields(fields, get_schema)
+            queryset = self.Model.objects.for_tenant(_tenant_of(request.user))  # type: ignore
+            items, next_cursor = keyset_paginate(
+                _project_values(queryset, projection, ordering),
+                ordering,
+                resolve_limit(limit, max_page_size),
+                cursor,
+            )
+            etag, last_modified = page_validators(items, limit, cursor, next_cursor, projection)
+            if (response := conditional_response(request, etag, last_modified)) is not None:
+                return response
+
+            if projection:
+                return set_validators(
+                    projected_page_response(get_schema, projection, items, next_cursor),
+                    etag,
+                    last_modified,
+                )
+            set_validators(self.context.response, etag, last_modified)
+            return {"items": items, "next_cursor": next_cursor}
+
+        @route.post(
+            "/batch",
+            response={
+                200: BatchResponseSchema,
+                400: Http400BadRequestSchema,
+                401: Http401UnauthorizedSchema,
+            },
+        )
+        def create_batch(self, request: WSGIRequest, items: Body[list[Any]]) -> dict:
+            _tenant_of(request.user)
+            return batch_create(
+                self.Model,
+                items,
+                getattr(application_schemas, f"Create{model_name}Schema"),
+                request.user,
+            )
+
+        @route.put(
+            "/batch",
+            response={
+                200: BatchResponseSchema,
+                400: Http400BadRequestSchema,
+                401: Http401UnauthorizedSchema,
+            },
+        )
+        def update_batch(self, request: WSGIRequest, items: Body[list[Any]]) -> dict:
+            _tenant_of(request.user)
+            return batch_update(
+                self.Model,
+                items,
+                getattr(application_schemas, f"Put{model_name}Schema"),
+                request.user,
+            )
+
+        @route.delete(
+            "/batch",
+            response={
+                200: BatchResponseSchema,
+                400: Http400BadRequestSchema,
+                401: Http401UnauthorizedSchema,
+            },
+        )
+        def delete_batch(self, request: WSGIRequest, body: BatchDeleteSchema) -> dict:
+            _tenant_of(request.user)
+            return batch_delete(self.Model, body.ids, request.user)
 
         @route.get(
             "/{pk}",
@@ -74,15 +210,24 @@ def generate_crud_controller(  # noqa: C901
                 404: Http404NotFoundSchema,
             },
         )
-        def get(self, request: WSGIRequest, pk: UUID) -> BaseModel:
-            try:
-                q = self.Model.objects.get(id=pk)
-            except self.Model.DoesNotExist as e:
-                raise Http404NotFoundException from e
+        def get(self, request: WSGIRequest, pk: UUID, fields: str | None = None) -> BaseModel:
+            projection = parse_fields(fields, get_schema)
+            user = request.user
+            if has_conditional_headers(request):
+                # Answer an unchanged object from its validators, without loading the full row.
+                tenant = self.Model.objects.for_tenant(_tenant_of(user))  # type: ignore
+                updated_at = tenant.filter(id=pk).values_list("updated_at", flat=True).first()
+                if updated_at is not None:
+                    etag = make_etag(pk, updated_at, projection)
+                    if (response := conditional_response(request, etag, updated_at)) is not None:
+                        return response
 
-            if q.company_id != request.user.company_id:  # type: ignore
-                raise Http403ForbiddenException("You don't have permission to get this object.")
+            q = _get_object(self.Model, pk, _tenant_of(user), "get", projection)  # type: ignore
 
+            etag = make_etag(q.pk, q.updated_at, projection)
+            if projection:
+                return set_validators(projected_response(get_schema, projection, q), etag, q.updated_at)
+            set_validators(self.context.response, etag, q.updated_at)
             return q
 
         @route.put(
@@ -99,13 +244,21 @@ def generate_crud_controller(  # noqa: C901
             pk: UUID,
             body: getattr(application_schemas, f"Put{model_name}Schema"),  # type: ignore
         ) -> dict:
-            try:
-                q = self.Model.objects.get(id=pk)
-            except self.Model.DoesNotExist as e:
-                raise Http404NotFoundException from e
+            if single_statement_writes:
+                try:
+                    updated = self.Model.objects.scoped_update(
+                        pk,
+                        body.dict(exclude_unset=True),
+                        request.user,
+                        {"company_id": _tenant_of(request.user)},  # type: ignore
+                    )
+                except IntegrityError as e:
+                    raise Http400BadRequestException("code already exists") from e
+                if not updated:
+                    _raise_out_of_scope(self.Model, pk, "update")
+                return {"msg": "success"}
 
-            if q.company_id != request.user.company_id:  # type: ignore
-                raise Http403ForbiddenException("You don't have permission to update this object.")
+            q = _get_object(self.Model, pk, _tenant_of(request.user), "update")  # type: ignore
 
             for k, v in body.dict().items():
                 setattr(q, k, v)
@@ -126,16 +279,341 @@ def generate_crud_controller(  # noqa: C901
             },
         )
         def delete(self, request: WSGIRequest, pk: UUID) -> dict:
-            try:
-                q = self.Model.objects.get(id=pk)
-            except self.Model.DoesNotExist as e:
-                raise Http404NotFoundException from e
+            if single_statement_writes:
+                deleted = (
+                    self.Model.objects.for_tenant(_tenant_of(request.user))  # type: ignore
+                    .filter(id=pk)
+                    .soft_delete(request.user)
+                )
+                if not deleted:
+                    _raise_out_of_scope(self.Model, pk, "delete")
+                return {"msg": "success"}
 
-            if q.company_id != request.user.company_id:  # type: ignore
-                raise Http403ForbiddenException("You don't have permission to delete this object.")
+            q = _get_object(self.Model, pk, _tenant_of(request.user), "delete")  # type: ignore
 
             q.delete(request.user)
 
             return {"msg": "success"}
 
     return CRUDController
+
+
+def _generate_async_crud_controller(  # noqa: C901, PLR0913, PLR0917
+    model: type[BaseModel],
+    model_name: str,
+    controller_prefix: str,
+    application_schemas: ModuleType,
+    ordering: Sequence[str],
+    max_page_size: int | None,
+    single_statement_writes: bool,
+) -> type[ControllerBase]:
+    """Generate a CRUD controller with async routes for a model. See `generate_crud_controller`."""
+    get_schema = getattr(application_schemas, f"Get{model_name}ResponseSchema")
+
+    @api_controller(
+        prefix_or_class=controller_prefix,
+        tags=[f"edit {model_name}"],
+    )
+    class AsyncCRUDController:
+        Model = model
+
+        @route.post(
+            "",
+            response={
+                200: getattr(application_schemas, f"Get{model_name}ResponseSchema"),
+                401: Http401UnauthorizedSchema,
+            },
+        )
+        async def create(
+            self,
+            request: ASGIRequest,
+            body: getattr(application_schemas, f"Create{model_name}Schema"),  # type: ignore
+        ) -> BaseModel:
+            user = await request.auser()
+            q = self.Model(**body.dict(), company_id=_tenant_of(user))  # type: ignore
+
+            try:
+                await q.asave(user)
+            except IntegrityError as e:
+                raise Http400BadRequestException("code already exists") from e
+
+            return q
+
+        @route.get(
+            "",
+            response={
+                200: CursorPageSchema[getattr(application_schemas, f"Get{model_name}ResponseSchema")],
+                400: Http400BadRequestSchema,
+                401: Http401UnauthorizedSchema,
+            },
+        )
+        async def get_all(
+            self,
+            request: ASGIRequest,
+            limit: int | None = None,
+            cursor: str | None = None,
+            fields: str | None = None,
+        ) -> dict:
+            projection = parse_fields(fields, get_schema)
+            queryset = self.Model.objects.for_tenant(_tenant_of(await request.auser()))  # type: ignore
+            items, next_cursor = await akeyset_paginate(
+                _project_values(queryset, projection, ordering),
+                ordering,
+                resolve_limit(limit, max_page_size),
+                cursor,
+            )
+            etag, last_modified = page_validators(items, limit, cursor, next_cursor, projection)
+            if (response := conditional_response(request, etag, last_modified)) is not None:
+                return response
+
+            if projection:
+                return set_validators(
+                    projected_page_response(get_schema, projection, items, next_cursor),
+                    etag,
+                    last_modified,
+                )
+            set_validators(self.context.response, etag, last_modified)
+            return {"items": items, "next_cursor": next_cursor}
+
+        @route.post(
+            "/batch",
+            response={
+                200: BatchResponseSchema,
+                400: Http400BadRequestSchema,
+                401: Http401UnauthorizedSchema,
+            },
+        )
+        async def create_batch(self, request: ASGIRequest, items: Body[list[Any]]) -> dict:
+            user = await request.auser()
+            _tenant_of(user)
+            return await sync_to_async(batch_create)(
+                self.Model,
+                items,
+                getattr(application_schemas, f"Create{model_name}Schema"),
+                user,
+            )
+
+        @route.put(
+            "/batch",
+            response={
+                200: BatchResponseSchema,
+                400: Http400BadRequestSchema,
+                401: Http401UnauthorizedSchema,
+            },
+        )
+        async def update_batch(self, request: ASGIRequest, items: Body[list[Any]]) -> dict:
+            user = await request.auser()
+            _tenant_of(user)
+            return await sync_to_async(batch_update)(
+                self.Model,
+                items,
+                getattr(application_schemas, f"Put{model_name}Schema"),
+                user,
+            )
+
+        @route.delete(
+            "/batch",
+            response={
+                200: BatchResponseSchema,
+                400: Http400BadRequestSchema,
+                401: Http401UnauthorizedSchema,
+            },
+        )
+        async def delete_batch(self, request: ASGIRequest, body: BatchDeleteSchema) -> dict:
+            user = await request.auser()
+            _tenant_of(user)
+            return await sync_to_async(batch_delete)(self.Model, body.ids, user)
+
+        @route.get(
+            "/{pk}",
+            response={
+                200: getattr(application_schemas, f"Get{model_name}ResponseSchema"),
+                401: Http401UnauthorizedSchema,
+                404: Http404NotFoundSchema,
+            },
+        )
+        async def get(self, request: ASGIRequest, pk: UUID, fields: str | None = None) -> BaseModel:
+            projection = parse_fields(fields, get_schema)
+            user = await request.auser()
+            if has_conditional_headers(request):
+                # Answer an unchanged object from its validators, without loading the full row.
+                tenant = self.Model.objects.for_tenant(_tenant_of(user))  # type: ignore
+                updated_at = await tenant.filter(id=pk).values_list("updated_at", flat=True).afirst()
+                if updated_at is not None:
+                    etag = make_etag(pk, updated_at, projection)
+                    if (response := conditional_response(request, etag, updated_at)) is not None:
+                        return response
+
+            q = await _aget_object(self.Model, pk, _tenant_of(user), "get", projection)  # type: ignore
+
+            etag = make_etag(q.pk, q.updated_at, projection)
+            if projection:
+                return set_validators(projected_response(get_schema, projection, q), etag, q.updated_at)
+            set_validators(self.context.response, etag, q.updated_at)
+            return q
+
+        @route.put(
+            "/{pk}",
+            response={
+                200: BaseResponseSchema,
+                401: Http401UnauthorizedSchema,
+                404: Http404NotFoundSchema,
+            },
+        )
+        async def update(
+            self,
+            request: ASGIRequest,
+            pk: UUID,
+            body: getattr(application_schemas, f"Put{model_name}Schema"),  # type: ignore
+        ) -> dict:
+            user = await request.auser()
+            if single_statement_writes:
+                try:
+                    updated = await sync_to_async(self.Model.objects.scoped_update)(
+                        pk,
+                        body.dict(exclude_unset=True),
+                        user,
+                        {"company_id": _tenant_of(user)},  # type: ignore
+                    )
+                except IntegrityError as e:
+                    raise Http400BadRequestException("code already exists") from e
+                if not updated:
+                    await _araise_out_of_scope(self.Model, pk, "update")
+                return {"msg": "success"}
+
+            q = await _aget_object(self.Model, pk, _tenant_of(user), "update")  # type: ignore
+
+            for k, v in body.dict().items():
+                setattr(q, k, v)
+
+            try:
+                await q.asave(user)
+            except IntegrityError as e:
+                raise Http400BadRequestException("code already exists") from e
+
+            return {"msg": "success"}
+
+        @route.delete(
+            "/{pk}",
+            response={
+                200: BaseResponseSchema,
+                401: Http401UnauthorizedSchema,
+                404: Http404NotFoundSchema,
+            },
+        )
+        async def delete(self, request: ASGIRequest, pk: UUID) -> dict:
+            user = await request.auser()
+            if single_statement_writes:
+                deleted = await sync_to_async(
+                    self.Model.objects.for_tenant(_tenant_of(user)).filter(id=pk).soft_delete,  # type: ignore
+                )(user)
+                if not deleted:
+                    await _araise_out_of_scope(self.Model, pk, "delete")
+                return {"msg": "success"}
+
+            q = await _aget_object(self.Model, pk, _tenant_of(user), "delete")  # type: ignore
+
+            await q.adelete(user)
+
+            return {"msg": "success"}
+
+    return AsyncCRUDController
+
+
+def _tenant_of(user: AbstractBaseUser | AnonymousUser) -> UUID:
+    """Get the company every route of a user is scoped to.
+
+    Raises:
+        Http403ForbiddenException: The user belongs to no company. Users of no company share no tenant.
+    """
+    company_id = getattr(user, "company_id", None)
+    if company_id is None:
+        raise Http403ForbiddenException("You don't belong to a company.")
+    return company_id
+
+
+def _project_values(queryset: QuerySet, projection: tuple[str, ...] | None, ordering: Sequence[str]) -> QuerySet:
+    """Select the projected columns (and the ones the cursor and the validators need) as `values()` dicts."""
+    if projection is None:
+        return queryset.values()
+    names = [
+        *values_fields(queryset.model, projection),
+        *(field.removeprefix("-") for field in ordering),
+        "id",
+        "updated_at",
+    ]
+    return queryset.values(*dict.fromkeys(names))
+
+
+def _project_only(queryset: QuerySet, projection: tuple[str, ...] | None) -> QuerySet:
+    """Defer the columns out of the projection, keeping the one the ETag reads."""
+    if projection is None:
+        return queryset
+    concrete = {field.name for field in queryset.model._meta.concrete_fields}
+    return queryset.only(*(name for name in (*projection, "updated_at") if name in concrete))
+
+
+def _get_object(
+    model: type[BaseModel],
+    pk: UUID,
+    company_id: UUID,
+    action: str,
+    projection: tuple[str, ...] | None = None,
+) -> BaseModel:
+    """Get an object of a company: from the object cache if the model uses it, else with one tenant-scoped query.
+
+    Raises:
+        Http403ForbiddenException: The object belongs to another company.
+        Http404NotFoundException: The object does not exist.
+    """
+    if is_cached(model):
+        try:
+            obj = model.objects.get_cached(pk)
+        except model.DoesNotExist as e:
+            raise Http404NotFoundException from e
+        if obj.company_id != company_id:
+            raise Http403ForbiddenException(f"You don't have permission to {action} this object.")
+        return obj
+    try:
+        return _project_only(model.objects.for_tenant(company_id), projection).get(id=pk)
+    except model.DoesNotExist:
+        _raise_out_of_scope(model, pk, action)
+
+
+async def _aget_object(
+    model: type[BaseModel],
+    pk: UUID,
+    company_id: UUID,
+    action: str,
+    projection: tuple[str, ...] | None = None,
+) -> BaseModel:
+    """Async version of `_get_object`."""
+    if is_cached(model):
+        try:
+            obj = await model.objects.aget_cached(pk)
+        except model.DoesNotExist as e:
+            raise Http404NotFoundException from e
+        if obj.company_id != company_id:
+            raise Http403ForbiddenException(f"You don't have permission to {action} this object.")
+        return obj
+    try:
+        return await _project_only(model.objects.for_tenant(company_id), projection).aget(id=pk)
+    except model.DoesNotExist:
+        await _araise_out_of_scope(model, pk, action)
+
+
+def _raise_out_of_scope(model: type[BaseModel], pk: UUID, action: str) -> NoReturn:
+    """Tell a missing object (404) from one of another company (403) after a tenant-scoped query found no row.
+
+    Only requests for objects out of the tenant pay this second query.
+    """
+    if model.objects.filter(id=pk).exists():
+        raise Http403ForbiddenException(f"You don't have permission to {action} this object.")
+    raise Http404NotFoundException
+
+
+async def _araise_out_of_scope(model: type[BaseModel], pk: UUID, action: str) -> NoReturn:
+    """Async version of `_raise_out_of_scope`."""
+    if await model.objects.filter(id=pk).aexists():
+        raise Http403ForbiddenException(f"You don't have permission to {action} this object.")
+    raise Http404NotFoundException
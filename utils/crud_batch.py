@@ -0,0 +1,178 @@
+from collections.abc import Container, Sequence
+from functools import cache
+from typing import Any
+from uuid import UUID
+
+from django.conf import settings
+from django.contrib.auth.models import AbstractBaseUser
+from django.db import transaction
+from django.db.utils import IntegrityError
+from ninja import Schema
+from pydantic import ValidationError, create_model
+
+from common.exceptions import Http400BadRequestException
+from common.models import BaseModel
+
+_SUCCEEDED = frozenset(("created", "updated", "deleted"))
+
+
+def batch_create(model: type[BaseModel], items: list[Any], schema: type[Schema], user: AbstractBaseUser) -> dict:
+    """Create objects in one transaction with the user-stamping `bulk_create`.
+
+    Every item is validated first; invalid items are reported by index and the valid ones are written.
+
+    Args:
+        model (type[BaseModel]): The model of the objects.
+        items (list[Any]): The decoded items of the request body.
+        schema (type[Schema]): The create schema of an item.
+        user (AbstractBaseUser): The user creating the objects.
+
+    Raises:
+        Http400BadRequestException: The batch is too large or violates a unique constraint.
+
+    Returns:
+        dict: The `BatchResponseSchema` of the batch.
+    """
+    _check_size(items)
+    objs = []
+    results = []
+    for index, item in enumerate(items):
+        try:
+            data = schema.model_validate(item)
+        except ValidationError as e:
+            results.append({"index": index, "status": "invalid", "errors": _format_errors(e)})
+            continue
+        obj = model(**data.dict(), company_id=user.company_id)  # type: ignore
+        objs.append(obj)
+        results.append({"index": index, "id": obj.pk, "status": "created"})
+
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(objs, user=user)
+    except IntegrityError as e:
+        raise Http400BadRequestException("code already exists") from e
+    return _summarize(results)
+
+
+def batch_update(model: type[BaseModel], items: list[Any], schema: type[Schema], user: AbstractBaseUser) -> dict:
+    """Update objects in one transaction with the user-stamping `bulk_update`.
+
+    Every item is the update schema plus the `id` of the object. Invalid items, unknown ids and objects
+    of another company are reported by index; the other objects are written.
+
+    Args:
+        model (type[BaseModel]): The model of the objects.
+        items (list[Any]): The decoded items of the request body.
+        schema (type[Schema]): The update schema of an item.
+        user (AbstractBaseUser): The user updating the objects.
+
+    Raises:
+        Http400BadRequestException: The batch is too large or violates a unique constraint.
+
+    Returns:
+        dict: The `BatchResponseSchema` of the batch.
+    """
+    _check_size(items)
+    item_schema = _with_id(schema)
+    updates = []
+    results = []
+    for index, item in enumerate(items):
+        try:
+            data = item_schema.model_validate(item).dict()
+        except ValidationError as e:
+            results.append({"index": index, "status": "invalid", "errors": _format_errors(e)})
+            continue
+        updates.append((index, data.pop("id"), data))
+        results.append(None)
+
+    pks = [pk for _, pk, _ in updates]
+    objs = model.objects.for_tenant(user.company_id).in_bulk(pks)  # type: ignore
+    foreign = _out_of_tenant(model, pks, objs)
+    changed = {}
+    fields = set()
+    for index, pk, data in updates:
+        obj = objs.get(pk)
+        if pk in foreign:
+            results[index] = {"index": index, "id": pk, "status": "forbidden"}
+        elif obj is None:
+            results[index] = {"index": index, "id": pk, "status": "not_found"}
+        else:
+            for k, v in data.items():
+                setattr(obj, k, v)
+            changed[pk] = obj
+            fields.update(data)
+            results[index] = {"index": index, "id": pk, "status": "updated"}
+
+    try:
+        with transaction.atomic():
+            if changed:
+                model.objects.bulk_update(list(changed.values()), sorted(fields), user=user)
+    except IntegrityError as e:
+        raise Http400BadRequestException("code already exists") from e
+    return _summarize(results)
+
+
+def batch_delete(model: type[BaseModel], ids: Sequence[UUID], user: AbstractBaseUser) -> dict:
+    """Soft delete objects with one UPDATE statement.
+
+    Unknown ids and objects of another company are reported by index; the other objects are deleted.
+
+    Args:
+        model (type[BaseModel]): The model of the objects.
+        ids (Sequence[UUID]): The ids of the objects.
+        user (AbstractBaseUser): The user deleting the objects.
+
+    Raises:
+        Http400BadRequestException: The batch is too large.
+
+    Returns:
+        dict: The `BatchResponseSchema` of the batch.
+    """
+    _check_size(ids)
+    tenant = model.objects.for_tenant(user.company_id)  # type: ignore
+    found = set(tenant.filter(pk__in=ids).values_list("pk", flat=True))
+    foreign = _out_of_tenant(model, ids, found)
+    allowed = set()
+    results = []
+    for index, pk in enumerate(ids):
+        if pk in foreign:
+            results.append({"index": index, "id": pk, "status": "forbidden"})
+        elif pk not in found:
+            results.append({"index": index, "id": pk, "status": "not_found"})
+        else:
+            allowed.add(pk)
+            results.append({"index": index, "id": pk, "status": "deleted"})
+
+    with transaction.atomic():
+        tenant.filter(pk__in=allowed).soft_delete(user)
+    return _summarize(results)
+
+
+def _check_size(items: Sequence[Any]) -> None:
+    if len(items) > settings.CRUD_BATCH_MAX_ITEMS:
+        raise Http400BadRequestException(f"a batch holds at most {settings.CRUD_BATCH_MAX_ITEMS} items")
+
+
+def _out_of_tenant(model: type[BaseModel], pks: Sequence[UUID], found: Container[UUID]) -> set[UUID]:
+    """Get the ids the tenant-scoped query did not find that exist in another company.
+
+    Only batches with ids out of the tenant pay this second query.
+    """
+    missing = [pk for pk in pks if pk not in found]
+    if not missing:
+        return set()
+    return set(model.objects.filter(pk__in=missing).values_list("pk", flat=True))
+
+
+@cache
+def _with_id(schema: type[Schema]) -> type[Schema]:
+    return create_model(f"Batch{schema.__name__}", __base__=schema, id=(UUID, ...))
+
+
+def _format_errors(e: ValidationError) -> list[str]:
+    return [f"{'.'.join(str(loc) for loc in error['loc']) or 'item'}: {error['msg']}" for error in e.errors()]
+
+
+def _summarize(results: list[dict]) -> dict:
+    succeeded = sum(result["status"] in _SUCCEEDED for result in results)
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
@@ -0,0 +1,150 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import date, datetime
+from typing import Any
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Field, Model, Q, QuerySet
+
+from common.exceptions import Http400BadRequestException
+
+
+def resolve_limit(limit: int | None, max_limit: int | None = None) -> int:
+    """Resolve the page size requested by a client.
+
+    Args:
+        limit (int | None): The requested page size, or None for the default one.
+        max_limit (int | None): The hard max page size. Defaults to `settings.PAGINATION_MAX_LIMIT`.
+
+    Raises:
+        Http400BadRequestException: The requested page size is out of range.
+
+    Returns:
+        int: The page size.
+    """
+    max_limit = max_limit or settings.PAGINATION_MAX_LIMIT
+    if limit is None:
+        return min(settings.PAGINATION_DEFAULT_LIMIT, max_limit)
+    if not 0 < limit <= max_limit:
+        raise Http400BadRequestException(f"limit must be between 1 and {max_limit}")
+    return limit
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the ordering values of a row into an opaque cursor.
+
+    Args:
+        values (Sequence[Any]): The values of the ordering fields of the last row of a page.
+
+    Returns:
+        str: The cursor.
+    """
+    serialized = [value.isoformat() if isinstance(value, date | datetime) else value for value in values]
+    serialized = [str(value) if isinstance(value, UUID) else value for value in serialized]
+    return base64.urlsafe_b64encode(json.dumps(serialized).encode("utf-8")).decode("utf-8").rstrip("=")
+
+
+def decode_cursor(cursor: str, fields: Sequence[Field]) -> list[Any]:
+    """Decode a cursor made by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor.
+        fields (Sequence[Field]): The ordering fields, whose values the cursor must contain.
+
+    Raises:
+        Http400BadRequestException: The cursor is malformed or a value is not valid for its field.
+
+    Returns:
+        list[Any]: The ordering values, converted with the `to_python` of their field.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise Http400BadRequestException("invalid cursor") from e
+    if not isinstance(values, list) or len(values) != len(fields) or None in values:
+        raise Http400BadRequestException("invalid cursor")
+    try:
+        return [field.to_python(value) for field, value in zip(fields, values, strict=True)]
+    except (ValidationError, TypeError, ValueError, AttributeError) as e:
+        raise Http400BadRequestException("invalid cursor") from e
+
+
+def _ordering_field(model: type[Model], name: str) -> Field:
+    """Get the model field of an ordering name, following `__` relations."""
+    *relations, name = name.split("__")
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.pk if name == "pk" else model._meta.get_field(name)
+
+
+def _keyset_filter(ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    """Build the lexicographic "after this row" filter for an ordering.
+
+    For `("-timestamp", "-id")` this is `timestamp <= ts AND (timestamp < ts OR (timestamp = ts AND id < id))`.
+    The leading non-strict bound lets the database turn the filter into an index range scan.
+    """
+    names = [field.removeprefix("-") for field in ordering]
+    lookups = ["lt" if field.startswith("-") else "gt" for field in ordering]
+
+    after = Q()
+    for i, (name, lookup) in enumerate(zip(names, lookups, strict=True)):
+        after |= Q(**dict(zip(names[:i], values[:i], strict=True)), **{f"{name}__{lookup}": values[i]})
+    return Q(**{f"{names[0]}__{lookups[0]}e": values[0]}) & after
+
+
+def keyset_paginate(
+    queryset: QuerySet,
+    ordering: Sequence[str],
+    limit: int,
+    cursor: str | None = None,
+) -> tuple[list[Any], str | None]:
+    """Get one page of a queryset with keyset (cursor) pagination.
+
+    The ordering must be unique (end with the primary key) and should be backed by an index, so every page
+    costs one index range scan whatever its depth, unlike OFFSET paging.
+
+    Args:
+        queryset (QuerySet): The queryset to paginate. Rows may be model instances or `values()` dicts,
+            which must then contain the ordering fields.
+        ordering (Sequence[str]): The ordering fields, `-` prefixed for descending order.
+        limit (int): The page size.
+        cursor (str | None): The cursor returned with the previous page, or None for the first page.
+
+    Returns:
+        tuple[list[Any], str | None]: The rows of the page and the cursor of the next page, or None on the last page.
+    """
+    rows = list(_page_queryset(queryset, ordering, limit, cursor))
+    return _split_page(rows, ordering, limit)
+
+
+async def akeyset_paginate(
+    queryset: QuerySet,
+    ordering: Sequence[str],
+    limit: int,
+    cursor: str | None = None,
+) -> tuple[list[Any], str | None]:
+    """Async version of `keyset_paginate`."""
+    rows = [row async for row in _page_queryset(queryset, ordering, limit, cursor)]
+    return _split_page(rows, ordering, limit)
+
+
+def _page_queryset(queryset: QuerySet, ordering: Sequence[str], limit: int, cursor: str | None) -> QuerySet:
+    if cursor:
+        fields = [_ordering_field(queryset.model, field.removeprefix("-")) for field in ordering]
+        queryset = queryset.filter(_keyset_filter(ordering, decode_cursor(cursor, fields)))
+    return queryset.order_by(*ordering)[: limit + 1]
+
+
+def _split_page(rows: list[Any], ordering: Sequence[str], limit: int) -> tuple[list[Any], str | None]:
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    names = [field.removeprefix("-") for field in ordering]
+    values = [getattr(last, name) if isinstance(last, Model) else last[name] for name in names]
+    return rows, encode_cursor(values)
@@ -0,0 +1,97 @@
+from collections.abc import Iterable, Sequence
+
+from django.db import connections, models
+
+
+def get_copy_fields(model: type[models.Model], exclude_auto: bool = True) -> list[models.Field]:
+    """Get the concrete fields of a model that should be written by COPY.
+
+    Args:
+        model (type[models.Model]): The model to get the fields of.
+        exclude_auto (bool): Whether to skip auto-incremented primary keys.
+
+    Returns:
+        list[models.Field]: The fields to write, in column order.
+    """
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if not (exclude_auto and isinstance(field, models.AutoField | models.BigAutoField | models.SmallAutoField))
+    ]
+
+
+def prepare_copy_row(
+    obj: models.Model,
+    fields: Sequence[models.Field],
+    using: str = "default",
+    add: bool = True,
+) -> tuple:
+    """Convert a model instance into a tuple of database values for COPY.
+
+    Args:
+        obj (models.Model): The model instance.
+        fields (Sequence[models.Field]): The fields to convert, in column order.
+        using (str): The database alias the row will be written to.
+        add (bool): Whether the row is being inserted (drives `auto_now_add` fields).
+
+    Returns:
+        tuple: The database values of the row.
+    """
+    connection = connections[using]
+    return tuple(field.get_db_prep_save(field.pre_save(obj, add), connection) for field in fields)
+
+
+def copy_rows(
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[tuple],
+    using: str = "default",
+) -> int:
+    """Stream rows into a PostgreSQL table with `COPY ... FROM STDIN`.
+
+    Requires the psycopg 3 backend. The caller is responsible for the surrounding transaction.
+
+    Args:
+        table (str): The target table name.
+        columns (Sequence[str]): The target column names, in row order.
+        rows (Iterable[tuple]): The rows to write. Consumed lazily.
+        using (str): The database alias to write to.
+
+    Returns:
+        int: The number of rows written.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    statement = f"COPY {quote_name(table)} ({', '.join(quote_name(column) for column in columns)}) FROM STDIN"
+    count = 0
+    with connection.cursor() as cursor, cursor.copy(statement) as copy:
+        for row in rows:
+            copy.write_row(row)
+            count += 1
+    return count
+
+
+def copy_models(
+    model: type[models.Model],
+    objs: Iterable[models.Model],
+    using: str = "default",
+) -> int:
+    """Insert model instances into their table with `COPY ... FROM STDIN`.
+
+    Unlike `bulk_create`, primary keys generated by the database are not set back on the instances.
+
+    Args:
+        model (type[models.Model]): The model of the instances.
+        objs (Iterable[models.Model]): The instances to insert. Consumed lazily.
+        using (str): The database alias to write to.
+
+    Returns:
+        int: The number of rows written.
+    """
+    fields = get_copy_fields(model)
+    return copy_rows(
+        model._meta.db_table,
+        [field.column for field in fields],
+        (prepare_copy_row(obj, fields, using) for obj in objs),
+        using,
+    )
@@ -0,0 +1,78 @@
+from collections.abc import Sequence
+from functools import cache
+from typing import Any
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model
+from django.http import JsonResponse
+from ninja import Schema
+from pydantic import create_model
+
+from common.exceptions import Http400BadRequestException
+from common.schemas import CursorPageSchema
+
+
+def parse_fields(fields: str | None, schema: type[Schema]) -> tuple[str, ...] | None:
+    """Parse the comma-separated `fields=` query parameter of a sparse fieldset request.
+
+    Args:
+        fields (str | None): The requested fields, e.g. `id,name`, or None for every field.
+        schema (type[Schema]): The full response schema the fields are picked from.
+
+    Raises:
+        Http400BadRequestException: A requested field is not in the response schema.
+
+    Returns:
+        tuple[str, ...] | None: The requested fields in schema order, or None for every field.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if unknown := requested - schema.model_fields.keys():
+        raise Http400BadRequestException(f"unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in schema.model_fields if name in requested)
+
+
+def values_fields(model: type[Model], fields: Sequence[str]) -> list[str]:
+    """Get the `values()` names of schema fields: the column attribute (e.g. `company_id`) of relations."""
+    names = []
+    for name in fields:
+        try:
+            names.append(model._meta.get_field(name).attname)
+        except (FieldDoesNotExist, AttributeError):
+            names.append(name)
+    return names
+
+
+@cache
+def project_schema(schema: type[Schema], fields: tuple[str, ...]) -> type[Schema]:
+    """Build the schema made of only some fields of a response schema.
+
+    Args:
+        schema (type[Schema]): The full response schema.
+        fields (tuple[str, ...]): The fields to keep.
+
+    Returns:
+        type[Schema]: The trimmed schema. It is built once per schema and set of fields.
+    """
+    return create_model(
+        f"{schema.__name__}_{'_'.join(fields)}",
+        __base__=Schema,
+        **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in fields},
+    )
+
+
+def projected_response(schema: type[Schema], fields: tuple[str, ...], data: Any) -> JsonResponse:  # noqa: ANN401
+    """Serialize an object (model instance or `values()` dict) with a trimmed response schema."""
+    return JsonResponse(project_schema(schema, fields).model_validate(data).model_dump(mode="json"))
+
+
+def projected_page_response(
+    schema: type[Schema],
+    fields: tuple[str, ...],
+    items: list[Any],
+    next_cursor: str | None,
+) -> JsonResponse:
+    """Serialize a keyset-paginated page with a trimmed response schema."""
+    page = CursorPageSchema[project_schema(schema, fields)](items=items, next_cursor=next_cursor)
+    return JsonResponse(page.model_dump(mode="json"))
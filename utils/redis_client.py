@@ -0,0 +1,16 @@
+from functools import cache
+
+from django.conf import settings
+from redis import Redis
+
+
+@cache
+def get_redis_client() -> Redis:
+    """Get the Redis client of this process, connected to `settings.REDIS_URL`.
+
+    The client holds a connection pool, so it is created once per process and shared.
+
+    Returns:
+        Redis: The Redis client.
+    """
+    return Redis.from_url(settings.REDIS_URL)
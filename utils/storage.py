@@ -27,6 +27,12 @@ class MediaS3Storage(S3Storage):  # noqa: D101
     file_overwrite = False
 
 
+class ProfileS3Storage(S3Storage):  # noqa: D101
+    location = "profiles"
+    default_acl = "private"
+    file_overwrite = False
+
+
 class MediaS3Boto3Storage(MediaS3Storage):  # noqa: D101
     default_acl = "public-read"
     config = Config(signature_version="s3v4")
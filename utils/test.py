@@ -1,15 +1,33 @@
-import json
-from datetime import datetime, timedelta
+from collections.abc import Sequence
+from datetime import timedelta
+from uuid import uuid4
 
-from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.db import models
-from django.test import Client, TestCase
+from django.test import TestCase
+from django.utils import timezone
 
 from common.models import BaseModel
+from features.core.models import Company
 
 
-def create_basic_controller_test(model: type[BaseModel], url: str):  # noqa: C901
-    """Create a basic controller test for a model."""
+def create_basic_controller_test(model: type[BaseModel], url: str, fields: Sequence[str] | None = None):  # noqa: C901
+    """Create a basic controller test for a model.
+
+    Args:
+        model (type[BaseModel]): The model of the controller.
+        url (str): The prefix of the controller under `/api/`.
+        fields (Sequence[str] | None): The fields the tests fill in create and update requests. Defaults to
+            the concrete fields the model adds to `BaseModel`.
+
+    Returns:
+        type[TestCase]: The test case, authenticated as a user of a company with one object of the model.
+    """
+    base_fields = {field.name for field in BaseModel._meta.fields}
+    if fields is None:
+        test_fields = [field for field in model._meta.concrete_fields if field.name not in base_fields]
+    else:
+        test_fields = [model._meta.get_field(name) for name in fields]
 
     def create_test_object(fields: list[models.Field]) -> dict:
         """Create a test object for a model."""
@@ -17,6 +35,8 @@ def create_basic_controller_test(model: type[BaseModel], url: str):  # noqa: C90
 
         for field in fields:
             match type(field):
+                case models.EmailField:
+                    test_data[field.name] = f"test-{uuid4().hex}@example.com"
                 case models.CharField:
                     test_data[field.name] = "test"
                 case models.TextField:
@@ -26,7 +46,7 @@ def create_basic_controller_test(model: type[BaseModel], url: str):  # noqa: C90
                 case models.BooleanField:
                     test_data[field.name] = True
                 case models.DateField:
-                    test_data[field.name] = datetime.now(tz=settings.TIME_ZONE).date()
+                    test_data[field.name] = timezone.localdate()
                 case models.DecimalField:
                     test_data[field.name] = 1.0
 
@@ -38,6 +58,8 @@ def create_basic_controller_test(model: type[BaseModel], url: str):  # noqa: C90
 
         for field in fields:
             match type(field):
+                case models.EmailField:
+                    update_fields[field.name] = f"upload-{uuid4().hex}@example.com"
                 case models.CharField:
                     update_fields[field.name] = "upload"
                 case models.TextField:
@@ -47,7 +69,7 @@ def create_basic_controller_test(model: type[BaseModel], url: str):  # noqa: C90
                 case models.BooleanField:
                     update_fields[field.name] = False
                 case models.DateField:
-                    update_fields[field.name] = datetime.now(tz=settings.TIME_ZONE).date() + timedelta(days=1)
+                    update_fields[field.name] = timezone.localdate() + timedelta(days=1)
                 case models.DecimalField:
                     update_fields[field.name] = 2.00
 
@@ -56,38 +78,86 @@ def create_basic_controller_test(model: type[BaseModel], url: str):  # noqa: C90
     class ControllerTest(TestCase):
         def setUp(self) -> None:
             self.url = f"/api/{url}"
-            client = Client()
-            response = client.post(
-                "/api/auth/obtain",
-                data=json.dumps({"email": settings.TEST_ACCOUNT_EMAIL, "password": settings.TEST_ACCOUNT_PASSWORD}),
-                content_type="application/json",
-            )
-            jwt = response.json().get("access")
-            self.client = Client(headers={"Authorization": f"Bearer {jwt}"})
-            self.fields = model._meta.get_fields()[9:]
-            self.instance = model.objects.get()
+            self.client.force_login(self.user)
+            self.fields = test_fields
+            self.instance = model.objects.get(pk=self.instance_pk)
 
         @classmethod
         def setUpTestData(cls) -> None:
-            user = models.User.objects.create_user(  # type: ignore
-                username="test_account",
-                email=settings.TEST_ACCOUNT_EMAIL,
-                password=settings.TEST_ACCOUNT_PASSWORD,
+            cls.company = Company.objects.create(name="test")
+            cls.user = get_user_model().objects.create_user(
+                email=f"test-account-{uuid4().hex}@example.com",
+                company=cls.company,
             )
-            fields = model._meta.get_fields()[9:]
-            instance = model(**create_test_object(fields))  # type: ignore
-            instance.save(user)
+            instance = model(**create_test_object(test_fields), company=cls.company)  # type: ignore
+            instance.save(cls.user)
+            cls.instance_pk = instance.pk
+
+        def create_other_company_object(self) -> BaseModel:
+            """Create an object of another company."""
+            other = Company.objects.create(name="other")
+            instance = model(**create_test_object(self.fields), company=other)  # type: ignore
+            instance.save(self.user)
+            return instance
 
         def test_get(self) -> None:
-            get_id = model.objects.get().id
-            response = self.client.get(self.url + f"/{get_id}")
+            response = self.client.get(self.url + f"/{self.instance.id}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json().get("id"), str(self.instance.id))
+
+        def test_get_other_company(self) -> None:
+            other = self.create_other_company_object()
+            response = self.client.get(self.url + f"/{other.id}")
+            self.assertEqual(response.status_code, 403)
+
+        def test_get_without_company(self) -> None:
+            self.client.force_login(get_user_model().objects.create_user(email=f"test-{uuid4().hex}@example.com"))
+            self.assertEqual(self.client.get(self.url + f"/{self.instance.id}").status_code, 403)
+            self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        def test_get_not_modified(self) -> None:
+            etag = self.client.get(self.url + f"/{self.instance.id}").headers["ETag"]
+            response = self.client.get(self.url + f"/{self.instance.id}", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+
+        def test_get_sparse_fields(self) -> None:
+            response = self.client.get(self.url + f"/{self.instance.id}", {"fields": "id"})
             self.assertEqual(response.status_code, 200)
-            self.assertEqual(response.json().get("id"), str(get_id))
+            self.assertEqual(response.json(), {"id": str(self.instance.id)})
 
         def test_get_all(self) -> None:
+            self.create_other_company_object()
             response = self.client.get(self.url)
             self.assertEqual(response.status_code, 200)
-            self.assertEqual(len(response.json()), 1)
+            ids = {item["id"] for item in response.json()["items"]}
+            expected = model.objects.for_tenant(self.company).values_list("pk", flat=True)
+            self.assertEqual(ids, {str(pk) for pk in expected})
+            self.assertIsNone(response.json()["next_cursor"])
+
+        def test_get_all_pages(self) -> None:
+            expected = {str(pk) for pk in model.objects.for_tenant(self.company).values_list("pk", flat=True)}
+            seen = []
+            cursor = None
+            while True:
+                response = self.client.get(self.url, {"limit": 1, **({"cursor": cursor} if cursor else {})})
+                self.assertEqual(response.status_code, 200)
+                seen += [item["id"] for item in response.json()["items"]]
+                if (cursor := response.json()["next_cursor"]) is None:
+                    break
+            self.assertEqual(sorted(seen), sorted(expected))
+
+        def test_get_all_not_modified(self) -> None:
+            etag = self.client.get(self.url).headers["ETag"]
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+
+            self.client.put(
+                f"{self.url}/{self.instance.id}",
+                create_update_fields(self.fields),  # type: ignore
+                "application/json",
+            )
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 200)
 
         def test_create(self) -> None:
             data = create_test_object(self.fields)  # type: ignore
@@ -95,6 +165,16 @@ def create_basic_controller_test(model: type[BaseModel], url: str):  # noqa: C90
             self.assertEqual(response.status_code, 200)
             for field_name, field_value in data.items():
                 self.assertEqual(str(response.json().get(field_name)), str(field_value))
+            self.assertEqual(model.objects.get(pk=response.json()["id"]).company_id, self.company.pk)
+
+        def test_create_batch(self) -> None:
+            data = create_test_object(self.fields)  # type: ignore
+            response = self.client.post(f"{self.url}/batch", [data, None], "application/json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["succeeded"], 1)
+            self.assertEqual(response.json()["results"][1]["status"], "invalid")
+            created = response.json()["results"][0]["id"]
+            self.assertEqual(self.client.get(f"{self.url}/{created}").status_code, 200)
 
         def test_update(self) -> None:
             update_data = create_update_fields(self.fields)  # type: ignore
@@ -110,9 +190,28 @@ def create_basic_controller_test(model: type[BaseModel], url: str):  # noqa: C90
                 else:
                     self.assertEqual(str(current_value), str(update_value))
 
+        def test_update_batch(self) -> None:
+            other = self.create_other_company_object()
+            update_data = create_update_fields(self.fields)  # type: ignore
+            items = [{"id": str(pk), **update_data} for pk in (self.instance.id, other.id, uuid4())]
+            response = self.client.put(f"{self.url}/batch", items, "application/json")
+            self.assertEqual(response.status_code, 200)
+            statuses = [result["status"] for result in response.json()["results"]]
+            self.assertEqual(statuses, ["updated", "forbidden", "not_found"])
+
         def test_delete(self) -> None:
             response = self.client.delete(f"{self.url}/{self.instance.id}")
             self.assertEqual(response.status_code, 200)
-            self.assertEqual(model.objects.count(), 0)
+            self.assertFalse(model.objects.filter(pk=self.instance.id).exists())
+
+        def test_delete_batch(self) -> None:
+            other = self.create_other_company_object()
+            ids = [str(self.instance.id), str(other.id), str(uuid4())]
+            response = self.client.delete(f"{self.url}/batch", {"ids": ids}, "application/json")
+            self.assertEqual(response.status_code, 200)
+            statuses = [result["status"] for result in response.json()["results"]]
+            self.assertEqual(statuses, ["deleted", "forbidden", "not_found"])
+            self.assertFalse(model.objects.filter(pk=self.instance.id).exists())
+            self.assertTrue(model.objects.filter(pk=other.id).exists())
 
     return ControllerTest